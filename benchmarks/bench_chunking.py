@@ -0,0 +1,144 @@
+# benchmarks/bench_chunking.py
+"""
+Chunk count, index size, embedding cost and retrieval hit rate per chunk profile.
+
+    python -m benchmarks.bench_chunking [--profiles legacy,small,standard,large] [--k 3] [--offline]
+
+Corpus: every PDF in pdf_files/, split with each profile (services/chunker.py)
+and deduplicated as a build would. Questions: the "Q12. ...?" FAQ entries of the
+same PDFs; a question is a hit when one of the k retrieved chunks contains the
+first ANSWER_KEY_WORDS words of its answer, i.e. the chunk that answers it came
+back whole. Retrieval embeds chunks and questions with the production model
+through the embedding cache (an API key is needed once); --offline ranks with
+BM25 (services/lexical_index.py) instead. index_mb counts float32 vectors at
+the configured embedding size plus chunk text.
+"""
+import argparse
+import math
+import os
+import re
+import tempfile
+from benchmarks.common import bench_env, print_table
+
+ANSWER_KEY_WORDS = 8
+_QUESTION_RE = re.compile(r"^\s*q\s*\d+\s*[.):]\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def load_pages() -> dict:
+    from services.document_parser import iter_raw_pages
+    base = "pdf_files"
+    pages = {}
+    for org in sorted(os.listdir(base)):
+        org_dir = os.path.join(base, org)
+        if not os.path.isdir(org_dir):
+            continue
+        for name in sorted(os.listdir(org_dir)):
+            if name.lower().endswith(".pdf"):
+                pages[os.path.join(org, name)] = list(iter_raw_pages(os.path.join(org_dir, name)))
+    return pages
+
+
+def faq_pairs(pages: dict) -> list:
+    """[(question, answer key)] of the FAQ entries in the corpus."""
+    pairs = []
+    for file_pages in pages.values():
+        text = "\n".join(page.page_content for page in file_pages)
+        matches = list(_QUESTION_RE.finditer(text))
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            answer = re.sub(r"^\s*answer\s*:?", "", text[match.end():end].strip(), flags=re.IGNORECASE)
+            key = _words(answer).split()[:ANSWER_KEY_WORDS]
+            if len(key) >= 4:
+                pairs.append((match.group(1), " ".join(key)))
+    return pairs
+
+
+def chunk_corpus(pages: dict, profile) -> list:
+    from services.chunk_dedupe import ChunkDeduper
+    from services.document_parser import lowercase_pages, split_pages
+    deduper = ChunkDeduper()
+    return [
+        chunk
+        for name, file_pages in pages.items()
+        for chunk in deduper.filter(split_pages(lowercase_pages(file_pages), os.path.basename(name), profile))
+    ]
+
+
+def rank_lexical(texts: list, questions: list, k: int) -> list:
+    from services.lexical_index import LexicalIndex, write_lexical_index
+    with tempfile.TemporaryDirectory() as tmp:
+        write_lexical_index(tmp, texts)
+        index = LexicalIndex(tmp)
+        return [[row for row, _, _ in index.search(q, k)] for q in questions]
+
+
+def rank_vectors(texts: list, question_vectors, embeddings, k: int) -> list:
+    import numpy as np
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = question_vectors @ vectors.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", default="", help="comma-separated profiles (default: all)")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--offline", action="store_true", help="BM25 ranking instead of the embedding model")
+    args = parser.parse_args()
+
+    bench_env()
+    import numpy as np
+    from utils.constants import EMBED_BATCH_SIZE, EMBEDDING_DIMS
+    from services.chunker import CHUNK_PROFILES, count_tokens, tokenizer_name
+
+    profiles = [CHUNK_PROFILES[p] for p in args.profiles.split(",") if p] or list(CHUNK_PROFILES.values())
+    pages = load_pages()
+    pairs = faq_pairs(pages)
+    questions = [q.lower() for q, _ in pairs]
+    dims = EMBEDDING_DIMS or 1536
+
+    embeddings = question_vectors = None
+    if not args.offline:
+        from services.vectorstore_loader import get_indexing_embeddings
+        embeddings = get_indexing_embeddings(EMBEDDING_DIMS or None)
+        question_vectors = np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+        question_vectors /= np.linalg.norm(question_vectors, axis=1, keepdims=True)
+        dims = question_vectors.shape[1]
+    print(f"{sum(map(len, pages.values()))} pages in {len(pages)} PDFs; {len(pairs)} FAQ questions; "
+          f"tokens counted with {tokenizer_name()}; ranking: {'BM25' if args.offline else 'embeddings'}")
+
+    rows = []
+    for profile in profiles:
+        chunks = chunk_corpus(pages, profile)
+        texts = [c.page_content for c in chunks]
+        tokens = [count_tokens(t) for t in texts]
+        if args.offline:
+            ranked = rank_lexical(texts, questions, args.k)
+        else:
+            ranked = rank_vectors(texts, question_vectors, embeddings, args.k)
+        normalised = [_words(t) for t in texts]
+        hits = sum(any(key in normalised[row] for row in rows_) for (_, key), rows_ in zip(pairs, ranked))
+        text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+        rows.append({
+            "profile": profile.name,
+            "size": f"{profile.size} {profile.unit}",
+            "overlap": profile.overlap,
+            "chunks": len(chunks),
+            "avg_tokens": round(sum(tokens) / len(tokens), 1),
+            "embed_tokens": sum(tokens),
+            "embed_calls": math.ceil(len(chunks) / EMBED_BATCH_SIZE),
+            "index_mb": round((len(chunks) * dims * 4 + text_bytes) / 1024 / 1024, 2),
+            f"hit@{args.k}": f"{hits / len(pairs):.1%}" if pairs else "-",
+        })
+    print_table(rows, ["profile", "size", "overlap", "chunks", "avg_tokens", "embed_tokens", "embed_calls",
+                       "index_mb", f"hit@{args.k}"])
+
+
+if __name__ == "__main__":
+    main()
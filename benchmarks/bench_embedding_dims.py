@@ -0,0 +1,79 @@
+# benchmarks/bench_embedding_dims.py
+"""
+Recall@k, latency and size of indexes stored at reduced embedding dimensions
+(EMBEDDING_DIMS / the per-org `embedding_dims` setting) against the full-size index.
+
+    python -m benchmarks.bench_embedding_dims [--dims 1536,1024,768,512,256] [--sizes 5000,20000] [--k 3] [--offline]
+
+Corpus and queries as in bench_index_types: the chunk vectors of every org
+index in vectorstores/ (grown with jittered copies), and the logged questions
+embedded with the production model, or jittered corpus vectors with --offline.
+Both sides are cut with truncate_vectors, exactly as builds and queries are.
+Ground truth is exact search at full size; every variant is an exact Flat
+index, so recall loss comes from the dimensions alone. --offline numbers
+are a lower bound: the jitter is spread evenly over all dimensions, while
+text-embedding-3 packs most of the signal into the leading ones.
+"""
+import argparse
+import time
+from benchmarks.common import bench_env, print_table
+from benchmarks.bench_index_types import LOG_PATH, load_questions, load_corpus, grow, measure, _normalise
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dims", default="1536,1024,768,512,256")
+    parser.add_argument("--sizes", default="5000,20000")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--offline", action="store_true", help="jittered corpus vectors instead of logged questions")
+    args = parser.parse_args()
+
+    bench_env()
+    import faiss
+    import numpy as np
+    from services.embedding_cache import truncate_vectors
+
+    rng = np.random.default_rng(0)
+    base = load_corpus()
+    full = base.shape[1]
+    if args.offline:
+        picks = base[rng.integers(0, base.shape[0], 200)]
+        queries = _normalise(picks + rng.normal(0, 0.05, picks.shape).astype("float32"))
+        source = "offline (jittered corpus vectors)"
+    else:
+        from services.vectorstore_singleton import get_embedding_model
+        questions = load_questions()
+        model = get_embedding_model()
+        embedded = [v for i in range(0, len(questions), 256) for v in model.embed_documents(questions[i:i + 256])]
+        queries = np.asarray(embedded, dtype="float32")
+        source = f"{len(questions)} questions from {LOG_PATH}"
+    print(f"corpus: {base.shape[0]} real vectors (dim {full}); queries: {source}")
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        corpus = grow(base, size, rng)
+        exact = faiss.IndexFlatL2(full)
+        exact.add(corpus)
+        truth = measure(exact, queries, args.k)["ids"]
+        for dims in sorted((int(d) for d in args.dims.split(",") if int(d) <= full), reverse=True):
+            vectors = truncate_vectors(corpus, dims)
+            t = time.perf_counter()
+            index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(vectors)
+            build_s = time.perf_counter() - t
+            result = measure(index, truncate_vectors(queries, dims), args.k)
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(result["ids"], truth)])
+            rows.append({
+                "size": size,
+                "dims": vectors.shape[1],
+                f"recall@{args.k}": round(float(recall), 3),
+                "p50_ms": round(result["p50_ms"], 3),
+                "p95_ms": round(result["p95_ms"], 3),
+                "build_s": round(build_s, 2),
+                "index_mb": round(faiss.serialize_index(index).nbytes / 1024 / 1024, 1),
+            })
+    print_table(rows, ["size", "dims", f"recall@{args.k}", "p50_ms", "p95_ms", "build_s", "index_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_index_types.py
+"""
+Recall@k and latency of Flat / HNSW / IVF-SQ8 / IVF-PQ across corpus sizes,
+to justify the FAISS_FLAT_MAX_VECTORS / FAISS_HNSW_MAX_VECTORS defaults.
+
+    python -m benchmarks.bench_index_types [--sizes 5000,20000,100000] [--k 3] [--offline]
+
+Corpus: the chunk vectors of every org index in vectorstores/, grown to each
+size with jittered copies (unit-normalised, like OpenAI embeddings).
+Queries: the distinct questions in logs/rag.log, embedded with the production
+model (one OpenAI call per 256 questions). --offline replaces them with
+jittered corpus vectors so no API key is needed. Ground truth is exact Flat search.
+"""
+import argparse
+import json
+import os
+import time
+from benchmarks.common import bench_env, list_index_orgs, print_table
+
+LOG_PATH = "logs/rag.log"
+
+
+def load_questions(path: str = LOG_PATH) -> list:
+    questions, seen = [], set()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            _, sep, payload = line.partition(" - INFO - ")
+            if not sep:
+                continue
+            try:
+                question = json.loads(payload).get("question")
+            except (ValueError, AttributeError):
+                continue
+            key = (question or "").strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                questions.append(question.strip())
+    return questions
+
+
+def load_corpus():
+    import faiss
+    from services.index_io import resolve_index_dir
+    import numpy as np
+    vectors = []
+    for org_id in list_index_orgs():
+        index = faiss.read_index(os.path.join(resolve_index_dir(f"vectorstores/org_{org_id}"), "index.faiss"))
+        vectors.append(index.reconstruct_n(0, index.ntotal))
+    dims = {v.shape[1] for v in vectors}
+    if len(dims) != 1:
+        raise SystemExit(f"Org indexes have mixed dimensions {dims}; nothing to benchmark")
+    return np.vstack(vectors).astype("float32")
+
+
+def _normalise(x):
+    import numpy as np
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def grow(base, size: int, rng):
+    """Real vectors first, then jittered copies of random real vectors."""
+    import numpy as np
+    if size <= base.shape[0]:
+        return _normalise(base[:size].copy())
+    extra = base[rng.integers(0, base.shape[0], size - base.shape[0])]
+    extra = extra + rng.normal(0, 0.02, extra.shape).astype("float32")
+    return _normalise(np.vstack([base, extra]).astype("float32"))
+
+
+def measure(index, queries, k: int) -> dict:
+    import faiss
+    import numpy as np
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)  # one query at a time, like a request handler
+    latencies = []
+    found = []
+    for q in queries:
+        t = time.perf_counter()
+        _, ids = index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - t) * 1000)
+        found.append(ids[0])
+    faiss.omp_set_num_threads(threads)
+    return {"ids": np.array(found), "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="5000,20000,100000")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--offline", action="store_true", help="jittered corpus vectors instead of logged questions")
+    args = parser.parse_args()
+
+    bench_env()
+    import faiss
+    import numpy as np
+    from services.index_builder import choose_index_factory, build_faiss_index, search_params, auto_factory
+    from services.index_io import apply_search_params
+
+    rng = np.random.default_rng(0)
+    base = load_corpus()
+    dim = base.shape[1]
+
+    if args.offline:
+        picks = base[rng.integers(0, base.shape[0], 200)]
+        queries = _normalise(picks + rng.normal(0, 0.05, picks.shape).astype("float32"))
+        source = "offline (jittered corpus vectors)"
+    else:
+        from services.vectorstore_singleton import get_embedding_model
+        questions = load_questions()
+        model = get_embedding_model()
+        embedded = [v for i in range(0, len(questions), 256) for v in model.embed_documents(questions[i:i + 256])]
+        queries = np.asarray(embedded, dtype="float32")
+        if queries.shape[1] != dim:
+            raise SystemExit(f"Query dim {queries.shape[1]} != index dim {dim}; rebuild the indexes or use --offline")
+        source = f"{len(questions)} questions from {LOG_PATH}"
+    print(f"corpus: {base.shape[0]} real vectors (dim {dim}); queries: {source}")
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        corpus = grow(base, size, rng)
+        exact = faiss.IndexFlatL2(dim)
+        exact.add(corpus)
+        truth = measure(exact, queries, args.k)["ids"]
+        for template in ("Flat", "HNSW32", "IVF{nlist},SQ8", "IVF{nlist},PQ{pq_m}"):
+            factory = choose_index_factory(size, dim, {"index_factory": template})
+            t = time.perf_counter()
+            index = build_faiss_index(corpus, factory)
+            build_s = time.perf_counter() - t
+            apply_search_params(index, search_params(index))
+            result = measure(index, queries, args.k)
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(result["ids"], truth)])
+            rows.append({
+                "size": size,
+                "factory": factory,
+                "auto": "*" if auto_factory(size) == template else "",
+                f"recall@{args.k}": round(float(recall), 3),
+                "p50_ms": round(result["p50_ms"], 3),
+                "p95_ms": round(result["p95_ms"], 3),
+                "build_s": round(build_s, 2),
+                "index_mb": round(faiss.serialize_index(index).nbytes / 1024 / 1024, 1),
+            })
+    print_table(rows, ["size", "factory", "auto", f"recall@{args.k}", "p50_ms", "p95_ms", "build_s", "index_mb"])
+
+
+if __name__ == "__main__":
+    main()
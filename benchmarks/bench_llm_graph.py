@@ -0,0 +1,78 @@
+# benchmarks/bench_llm_graph.py
+"""
+Per-request overhead of the /rag/ask-robot agent graph, before and after
+compiling it once per process (services/llm/graph.get_llm_graph).
+
+    python -m benchmarks.bench_llm_graph [--requests 200]
+
+    setup   what robot_ask_llm does before the first model call: per request
+            ChatOpenAI + bind_tools(TOOLS) + compile ("before"), or the cached
+            graph and tool-bound model of the request's key ("after")
+    turn    setup plus one graph turn (stream + get_state) with a fake chat
+            model answering instantly, i.e. everything but the OpenAI round trip
+
+No request leaves the process; the OpenAI key is a placeholder.
+"""
+import argparse
+import itertools
+import time
+from benchmarks.common import bench_env, print_table
+
+KEY = "sk-benchmark-unused"
+
+
+def per_request(fn, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        fn(i)
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    bench_env()
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_openai import ChatOpenAI
+    from services.llm.graph import build_llm_graph, get_llm_graph, tool_model
+    from services.llm.runtime_state import set_runtime
+    from services.llm.tools import TOOLS
+
+    set_runtime(session_id="bench", org_id=None, openai_key=KEY, user_info=None)
+    fake = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="Your SIP is active.")))
+
+    def setup_before(_):
+        llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0, api_key=KEY, output_version="responses/v1")
+        return build_llm_graph(llm.bind_tools(TOOLS))
+
+    def setup_after(_):
+        tool_model(KEY)
+        return get_llm_graph()
+
+    def turn(graph, i):
+        config = {"configurable": {"thread_id": f"bench-{i}"}}
+        graph.get_state(config)
+        for _ in graph.stream({"messages": [HumanMessage(content="Is my SIP active?")]}, config, stream_mode="values"):
+            pass
+        return graph.get_state(config)
+
+    cached_fake_graph = build_llm_graph(fake)
+    setup_after(0)  # first request of the process builds the caches
+    rows = [
+        {"step": "setup", "before_ms": per_request(setup_before, args.requests),
+         "after_ms": per_request(setup_after, args.requests)},
+        {"step": "turn", "before_ms": per_request(lambda i: setup_before(i) and turn(build_llm_graph(fake), i), args.requests),
+         "after_ms": per_request(lambda i: setup_after(i) and turn(cached_fake_graph, args.requests + i), args.requests)},
+    ]
+    for row in rows:
+        row["saved_ms"] = round(row["before_ms"] - row["after_ms"], 3)
+        row["before_ms"], row["after_ms"] = round(row["before_ms"], 3), round(row["after_ms"], 3)
+    print(f"{args.requests} requests per measurement")
+    print_table(rows, ["step", "before_ms", "after_ms", "saved_ms"])
+
+
+if __name__ == "__main__":
+    main()
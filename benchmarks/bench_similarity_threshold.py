@@ -0,0 +1,91 @@
+# benchmarks/bench_similarity_threshold.py
+"""
+Calibrate SIMILARITY_THRESHOLD for the centroid similarity score.
+
+    python -m benchmarks.bench_similarity_threshold [--orgs id1,id2] [--questions 50]
+
+/rag/ask saves a question to unique_question when its similarity score is below
+SIMILARITY_THRESHOLD. The score used to be the cosine between the question and
+the embedding of the joined context; it is now the cosine between the question
+and the centroid of the retrieved chunks' stored vectors (utils/helpers.
+similarity_score), which is distributed differently. For the FAQ questions of
+the PDFs in pdf_files/ (see bench_chunking) and some off-topic questions, this
+computes both scores for the top RETRIEVAL_K chunks and reports the
+centroid-score threshold that gates the same share of questions as the old
+score did at the current threshold. Calls the embeddings API (EMBEDDING key).
+"""
+import argparse
+from benchmarks.common import bench_env, list_index_orgs, print_table
+
+OFF_TOPIC = [
+    "what is the capital of australia",
+    "how do i bake sourdough bread",
+    "who won the football world cup in 2018",
+    "what is the boiling point of water on mount everest",
+    "recommend a good science fiction novel",
+    "how many moons does jupiter have",
+    "what is the best way to learn the guitar",
+    "how do i change a flat tyre",
+    "translate good morning into japanese",
+    "what time zone is new york in",
+]
+
+
+def faq_questions(limit: int) -> list:
+    from benchmarks.bench_chunking import faq_pairs, load_pages
+    return list(dict.fromkeys(q.lower() for q, _ in faq_pairs(load_pages())))[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", default="", help="comma-separated org ids (default: every index)")
+    parser.add_argument("--questions", type=int, default=50, help="FAQ questions asked of each org")
+    args = parser.parse_args()
+
+    bench_env()
+    import numpy as np
+    from utils.constants import RETRIEVAL_K, SIMILARITY_THRESHOLD
+    from utils.helpers import similarity_score
+    from services.embedding_cache import truncate_vectors
+    from services.vectorstore_singleton import get_embedding_model, load_org_indexes
+
+    embeddings = get_embedding_model()
+    questions = [("faq", q) for q in faq_questions(args.questions)] + [("off_topic", q) for q in OFF_TOPIC]
+    scores = {"faq": [], "off_topic": []}  # group -> [(old score, new score)]
+    for org_id in [o for o in args.orgs.split(",") if o] or list_index_orgs():
+        store, _ = load_org_indexes(org_id)
+        for group, question in questions:
+            full = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+            query = truncate_vectors(full, store.index.d)
+            _, rows = store.index.search(query.reshape(1, -1), RETRIEVAL_K)
+            rows = [int(r) for r in rows[0] if r >= 0]
+            if not rows:
+                continue
+            context = "\n".join(store.docstore.search(store.index_to_docstore_id[r]).page_content for r in rows)
+            context_vector = np.asarray(embeddings.embed_query(context), dtype=np.float32)
+            old = float(full @ context_vector / (np.linalg.norm(full) * np.linalg.norm(context_vector)))
+            new = similarity_score(query, store.index.reconstruct_batch(np.asarray(rows, dtype=np.int64)))
+            scores[group].append((old, new))
+
+    pairs = np.asarray(scores["faq"] + scores["off_topic"], dtype=np.float32)
+    gated = float(np.mean(pairs[:, 0] < SIMILARITY_THRESHOLD))
+    matched = float(np.quantile(pairs[:, 1], gated))
+    rows = []
+    for group, values in scores.items():
+        values = np.asarray(values, dtype=np.float32).reshape(-1, 2)
+        rows.append({
+            "questions": group,
+            "n": len(values),
+            "old_mean": round(float(values[:, 0].mean()), 3) if len(values) else "-",
+            "new_mean": round(float(values[:, 1].mean()), 3) if len(values) else "-",
+            "old_gated": f"{np.mean(values[:, 0] < SIMILARITY_THRESHOLD):.0%}" if len(values) else "-",
+            "new_gated_now": f"{np.mean(values[:, 1] < SIMILARITY_THRESHOLD):.0%}" if len(values) else "-",
+            "new_gated_matched": f"{np.mean(values[:, 1] < matched):.0%}" if len(values) else "-",
+        })
+    print_table(rows, ["questions", "n", "old_mean", "new_mean", "old_gated", "new_gated_now", "new_gated_matched"])
+    print(f"SIMILARITY_THRESHOLD={SIMILARITY_THRESHOLD} gated {gated:.0%} of questions with the old score; "
+          f"the centroid score gates the same share at SIMILARITY_THRESHOLD={matched:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_text_cache.py
+"""
+Full-org rebuild time with a cold and a warm extracted-text cache.
+
+    python -m benchmarks.bench_text_cache [--orgs id1,id2] [--workers 1] [--repeat 3]
+
+Each org folder in pdf_files/ is copied to a temporary directory and measured
+there, cold (empty .text_cache) and warm (best of --repeat runs):
+    parse_*    extract + split only, the part the cache removes
+    rebuild_*  the whole rebuild pipeline: extract -> split -> embed -> FAISS index
+Embeddings are deterministic fakes (no API key needed); generating them takes
+about as long as a lookup in a warm production embedding cache would. Nothing
+under vectorstores/ is touched.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from benchmarks.common import bench_env, print_table
+
+
+def source_chunks(upload_dir: str, pool):
+    from services.document_parser import list_source_files
+    from services.index_manifest import file_sha256
+    from services.ingest_pipeline import iter_source_chunks
+    names = list_source_files(upload_dir)
+    # a real rebuild takes hashes from the manifest when size and mtime are unchanged;
+    # here every file is hashed on each run, the worst case
+    hashes = {name: file_sha256(os.path.join(upload_dir, name)) for name in names}
+    return iter_source_chunks(upload_dir, names, pool, hashes=hashes)
+
+
+def parse(upload_dir: str, pool, embeddings) -> int:
+    return sum(1 for _ in source_chunks(upload_dir, pool))
+
+
+def rebuild(upload_dir: str, pool, embeddings) -> int:
+    from services.index_builder import choose_index_factory, build_faiss_index
+    from services.ingest_pipeline import embed_chunk_stream
+    docs, vectors = embed_chunk_stream(source_chunks(upload_dir, pool), embeddings)
+    if docs:
+        build_faiss_index(vectors, choose_index_factory(vectors.shape[0], vectors.shape[1], {}))
+    return len(docs)
+
+
+def cold_and_warm(fn, upload_dir: str, pool, embeddings, repeat: int):
+    from services.text_cache import TEXT_CACHE_DIR
+    shutil.rmtree(os.path.join(upload_dir, TEXT_CACHE_DIR), ignore_errors=True)
+    t = time.perf_counter()
+    count = fn(upload_dir, pool, embeddings)
+    cold_s = time.perf_counter() - t
+    warm = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(upload_dir, pool, embeddings)
+        warm.append(time.perf_counter() - t)
+    return count, cold_s, min(warm)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", default="", help="comma-separated org ids (default: every org in pdf_files/)")
+    parser.add_argument("--workers", type=int, default=1, help="page extraction processes (1 = inline)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench_env()
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from services.document_parser import list_source_files
+    from services.text_cache import TEXT_CACHE_DIR
+
+    base = "pdf_files"
+    orgs = [o for o in args.orgs.split(",") if o] or sorted(
+        name.replace("org_", "", 1) for name in os.listdir(base) if name.startswith("org_")
+    )
+    embeddings = DeterministicFakeEmbedding(size=1536)
+    pool = None
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for org_id in orgs:
+            src = os.path.join(base, f"org_{org_id}")
+            if not list_source_files(src):
+                continue
+            upload_dir = os.path.join(tmp, f"org_{org_id}")
+            shutil.copytree(src, upload_dir, ignore=shutil.ignore_patterns(TEXT_CACHE_DIR))
+
+            chunks, parse_cold, parse_warm = cold_and_warm(parse, upload_dir, pool, embeddings, args.repeat)
+            _, rebuild_cold, rebuild_warm = cold_and_warm(rebuild, upload_dir, pool, embeddings, args.repeat)
+
+            cache_dir = os.path.join(upload_dir, TEXT_CACHE_DIR)
+            cache_bytes = sum(os.path.getsize(os.path.join(cache_dir, n)) for n in os.listdir(cache_dir))
+            source_bytes = sum(os.path.getsize(os.path.join(upload_dir, n)) for n in list_source_files(upload_dir))
+            rows.append({
+                "org": org_id,
+                "files": len(list_source_files(upload_dir)),
+                "chunks": chunks,
+                "parse_cold_s": round(parse_cold, 2),
+                "parse_warm_s": round(parse_warm, 2),
+                "rebuild_cold_s": round(rebuild_cold, 2),
+                "rebuild_warm_s": round(rebuild_warm, 2),
+                "rebuild_speedup": f"{rebuild_cold / rebuild_warm:.1f}x",
+                "source_mb": round(source_bytes / 1024 / 1024, 1),
+                "cache_mb": round(cache_bytes / 1024 / 1024, 2),
+            })
+    if pool is not None:
+        pool.shutdown()
+    print_table(rows, ["org", "files", "chunks", "parse_cold_s", "parse_warm_s", "rebuild_cold_s",
+                       "rebuild_warm_s", "rebuild_speedup", "source_mb", "cache_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_tiny_index.py
+"""
+Per-query latency of FAISS IndexFlat vs the NumPy TinyIndex, and whether
+they return the same rows, to pick TINY_INDEX_MAX_VECTORS.
+    faiss_us     index.search called directly
+    executor_us  index.search through the search executor, as retrieval runs it
+    tiny_us      TinyIndex.search, which retrieval calls in place
+
+    python -m benchmarks.bench_tiny_index [--sizes 100,300,1000,3000] [--k 3] [--queries 2000]
+
+Corpus: the chunk vectors of every org index in vectorstores/, cut or grown to
+each size with jittered copies (unit-normalised, like OpenAI embeddings); a
+real org at its own size is measured too. Queries are jittered corpus vectors,
+so no API key is needed. Times are one query per call, as retrieval searches.
+"""
+import argparse
+import time
+from benchmarks.common import bench_env, list_index_orgs, print_table
+
+
+def corpus(size: int, base, rng):
+    import numpy as np
+    picks = base[rng.integers(0, len(base), size)] if size > len(base) else base[:size]
+    vectors = picks + (rng.standard_normal(picks.shape).astype(np.float32) * 0.01 if size > len(base) else 0)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def per_query_us(search, queries, k: int) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        search(q[None, :], k)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def measure(label: str, vectors, queries, k: int) -> dict:
+    import faiss
+    import numpy as np
+    from services.search_executor import get_search_executor
+    from services.tiny_index import TinyIndex
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    start = time.perf_counter()
+    tiny = TinyIndex.from_faiss(flat)
+    build_ms = (time.perf_counter() - start) * 1000
+    same = np.mean([
+        np.array_equal(flat.search(q[None, :], k)[1], tiny.search(q, k)[1]) for q in queries[:500]
+    ])
+    executor = get_search_executor()
+    faiss_us = per_query_us(flat.search, queries, k)
+    executor_us = per_query_us(lambda q, k: executor.search(flat, q, k), queries, k)
+    tiny_us = per_query_us(tiny.search, queries, k)
+    return {
+        "corpus": label,
+        "vectors": vectors.shape[0],
+        "dim": vectors.shape[1],
+        "tiny_build_ms": round(build_ms, 2),
+        "faiss_us": round(faiss_us, 1),
+        "executor_us": round(executor_us, 1),
+        "tiny_us": round(tiny_us, 1),
+        "tiny_speedup": f"{executor_us / tiny_us:.1f}x",
+        "same_topk_pct": round(100 * same, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,300,1000,3000")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    bench_env()
+    import numpy as np
+    from services.vectorstore_singleton import get_vectorstore_for_org
+
+    rng = np.random.default_rng(0)
+    stores = {org_id: get_vectorstore_for_org(org_id) for org_id in list_index_orgs()}
+    base = np.concatenate([s.index.reconstruct_n(0, s.index.ntotal) for s in stores.values()]).astype(np.float32)
+    base = np.unique(base, axis=0)  # the same chunk in several orgs: ties would be ordered arbitrarily
+    base = base[rng.permutation(len(base))]
+
+    def queries_for(vectors):
+        q = vectors[rng.integers(0, len(vectors), args.queries)]
+        q = q + rng.standard_normal(q.shape).astype(np.float32) * 0.05
+        return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+    rows = []
+    smallest = min(stores, key=lambda o: stores[o].index.ntotal)
+    org_vectors = stores[smallest].index.reconstruct_n(0, stores[smallest].index.ntotal).astype(np.float32)
+    rows.append(measure(f"org {smallest}", org_vectors, queries_for(org_vectors), args.k))
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        vectors = corpus(size, base, rng)
+        rows.append(measure("synthetic", vectors, queries_for(vectors), args.k))
+    print_table(rows, ["corpus", "vectors", "dim", "tiny_build_ms", "faiss_us", "executor_us", "tiny_us", "tiny_speedup", "same_topk_pct"])
+
+
+if __name__ == "__main__":
+    main()
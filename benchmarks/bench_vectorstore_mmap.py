@@ -0,0 +1,96 @@
+# benchmarks/bench_vectorstore_mmap.py
+"""
+RSS and first-query latency of loading index.faiss into memory vs read-only memory-mapped.
+
+    python -m benchmarks.bench_vectorstore_mmap [--workers 4]
+
+Each mode starts `--workers` processes that all load every org index in
+vectorstores/ the way the service does (load_org_indexes, so orgs of up to
+TINY_INDEX_MAX_VECTORS rows get a NumPy copy in both modes) and run one search
+per org with a random unit vector (no OpenAI calls). PSS shows how much of the
+RSS is really private: with mmap the vector pages are shared between the
+workers through the page cache.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from benchmarks.common import bench_env, memory_kb, list_index_orgs, timed, print_table
+
+
+def child(mode: str):
+    bench_env()
+    import os
+    import pickle
+    import numpy as np
+    from services.vectorstore_singleton import load_org_indexes, get_embedding_model
+
+    orgs = list_index_orgs()
+    # pay one-off costs (embeddings client, pickle class imports) outside the measurement
+    get_embedding_model()
+    legacy = os.path.join("vectorstores", f"org_{orgs[0]}", "index.pkl") if orgs else None
+    if legacy and os.path.exists(legacy):
+        with open(legacy, "rb") as f:
+            pickle.load(f)
+    before = memory_kb()
+    stores, load_s = {}, 0.0
+    for org_id in orgs:
+        (stores[org_id], _), dt = timed(load_org_indexes, org_id, mmap=(mode == "mmap"))
+        load_s += dt
+
+    rng = np.random.default_rng(0)
+    first_query_ms = []
+    for store in stores.values():
+        q = rng.standard_normal(store.index.d).astype("float32")
+        q /= np.linalg.norm(q)
+        _, dt = timed(store.similarity_search_with_score_by_vector, q.tolist(), k=3)
+        first_query_ms.append(dt * 1000)
+
+    after = memory_kb()
+    print(json.dumps({
+        "mode": mode,
+        "orgs": len(orgs),
+        "load_ms": round(load_s * 1000, 1),
+        "first_query_ms_avg": round(sum(first_query_ms) / max(len(first_query_ms), 1), 2),
+        "rss_delta_mb": round((after["rss_kb"] - before["rss_kb"]) / 1024, 1) if after["rss_kb"] else None,
+        "pss_mb": round(after["pss_kb"] / 1024, 1) if after["pss_kb"] else None,
+    }), flush=True)
+    sys.stdin.read()  # stay alive until the parent has sampled every worker
+
+
+def run_mode(mode: str, workers: int) -> list:
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_vectorstore_mmap", "--child", mode],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    rows = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", choices=["heap", "mmap"])
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    bench_env()
+    rows = []
+    for mode in ("heap", "mmap"):
+        results = run_mode(mode, args.workers)
+        for i, r in enumerate(results):
+            rows.append({**r, "worker": i})
+        pss_total = sum(r["pss_mb"] or 0 for r in results)
+        rows.append({"mode": mode, "worker": "total", "pss_mb": round(pss_total, 1)})
+    print_table(rows, ["mode", "worker", "orgs", "load_ms", "first_query_ms_avg", "rss_delta_mb", "pss_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/common.py
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_env():
+    """
+    Make the service modules importable from a benchmark. Benchmarks never talk
+    to Mongo, and only call OpenAI when they say so, so placeholders are enough.
+    """
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017")
+    os.environ.setdefault("MONGO_DB", "benchmark")
+    os.environ.setdefault("EMBEDDING", "sk-benchmark-unused")
+    os.environ.setdefault("WEALTH_ELITE_URL", "http://127.0.0.1/")
+    # errors a benchmark provokes (no network, no Mongo) stay out of the service's logs/
+    os.environ.setdefault("LOG_DIR", os.path.join(tempfile.gettempdir(), "nyla-benchmark-logs"))
+
+
+def memory_kb() -> dict:
+    """Current RSS and PSS (proportional share of shared pages) in KB, Linux only."""
+    out = {"rss_kb": None, "pss_kb": None}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_kb"] = int(line.split()[1])
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    out["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return out
+
+
+def list_index_orgs() -> list:
+    """Orgs under vectorstores/ that have index.faiss and a docstore."""
+    from services.index_io import index_files_present
+    base = os.path.join(ROOT, "vectorstores")
+    orgs = []
+    for name in sorted(os.listdir(base)):
+        d = os.path.join(base, name)
+        if name.startswith("org_") and index_files_present(d):
+            orgs.append(name.replace("org_", "", 1))
+    return orgs
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_table(rows: list, columns: list):
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
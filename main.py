@@ -4,13 +4,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from utils.logger import log_error
 from fastapi.responses import JSONResponse
-from routers import admin_dedupe_auto
+from routers import admin_dedupe_auto, admin_vectorstore, health
 import os
-from utils.constants import IMAGE_STORAGE_BASE_PATH
+from utils.constants import IMAGE_STORAGE_BASE_PATH, INDEX_WARMUP_ENABLED
+from services.index_warmup import start_warmup
 from fastapi.staticfiles import StaticFiles 
 
 app = FastAPI(title="Redvision AI Agent")
 
+@app.on_event("startup")
+async def warm_vectorstores():
+    # No indexing on the import path: changed orgs are rebuilt and indexes pre-loaded in the background
+    if INDEX_WARMUP_ENABLED:
+        start_warmup()
+
 @app.exception_handler(Exception)
 
 async def global_exception_handler(request: Request, exc: Exception):
@@ -43,6 +50,8 @@ app.include_router(feedback.router)
 app.include_router(file_system.router, prefix="/file_system")
 app.include_router(report.router, prefix="/report")
 app.include_router(admin_dedupe_auto.router)
+app.include_router(admin_vectorstore.router)
+app.include_router(health.router)
 
 
 Instrumentator().instrument(app).expose(app)
\ No newline at end of file
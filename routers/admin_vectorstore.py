@@ -0,0 +1,157 @@
+# routers/admin_vectorstore.py
+import os
+from fastapi import APIRouter, Query
+from pydantic import BaseModel
+from typing import Optional, List
+from utils.helpers import api_response
+from utils.constants import HTTP_STATUS, VECTORSTORE_BASE
+from services.embedding_cache import get_embedding_cache
+from services.retrieval_cache import get_retrieval_cache
+from services.vectorstore_loader import batch_retrain_all_orgs, list_vectorstore_generations, rollback_vectorstore
+from services.vectorstore_singleton import reload_vectorstore
+from services.retrain_engine import retrain_orgs
+from services.org_settings import get_vector_settings, set_vector_settings
+from services.index_io import read_build_info
+from services.index_inventory import get_inventory, scan_inventory
+from services.index_jobs import queue_repairs
+from services.global_kb import duplicate_uploads
+router = APIRouter()
+
+
+class VectorSettingsRequest(BaseModel):
+    # omitted fields are left alone; null removes the override
+    index_factory: Optional[str] = None
+    hnsw_ef_search: Optional[int] = None
+    ivf_nprobe: Optional[int] = None
+    retrieval_k: Optional[int] = None
+    rerank: Optional[str] = None
+    mmr_lambda: Optional[float] = None
+    merge_adjacent: Optional[bool] = None
+    embedding_dims: Optional[int] = None
+    use_global_kb: Optional[bool] = None
+    chunk_profile: Optional[str] = None
+    chunk_tokens: Optional[int] = None
+    chunk_overlap_tokens: Optional[int] = None
+
+
+@router.get("/admin/embedding-cache/stats")
+def admin_embedding_cache_stats():
+    try:
+        return api_response(code=HTTP_STATUS.OK, data=get_embedding_cache().stats())
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.post("/admin/embedding-cache/compact")
+def admin_embedding_cache_compact(
+    max_mb: Optional[int] = Query(None, description="Optional: evict down to this size first (default: configured budget)"),
+):
+    try:
+        max_bytes = max_mb * 1024 * 1024 if max_mb is not None else None
+        report = get_embedding_cache().compact(max_bytes=max_bytes)
+        return api_response(code=HTTP_STATUS.OK, data=report, message="Embedding cache compacted.")
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed to compact: {e}")
+
+
+@router.get("/admin/retrieval-cache/stats")
+async def admin_retrieval_cache_stats():
+    try:
+        return api_response(code=HTTP_STATUS.OK, data=get_retrieval_cache().stats())
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.post("/admin/vectorstores/retrain")
+def admin_retrain_vectorstores(
+    org_ids: Optional[List[str]] = Query(None, description="Optional: orgs to rebuild (default: every org in pdf_files)"),
+):
+    # sync handler: FastAPI runs it in the threadpool, so the event loop stays free
+    try:
+        summary = retrain_orgs(org_ids) if org_ids else batch_retrain_all_orgs()
+        msg = f"Retrained {len(summary['succeeded'])} org(s), {len(summary['failed'])} failed."
+        return api_response(code=HTTP_STATUS.OK, data=summary, message=msg)
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed to retrain: {e}")
+
+
+@router.get("/admin/vectorstores/inventory")
+def admin_vectorstore_inventory(
+    rescan: bool = Query(False, description="Re-check every org on disk first (default: the last scan)"),
+):
+    try:
+        return api_response(code=HTTP_STATUS.OK, data=scan_inventory() if rescan else get_inventory())
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.post("/admin/vectorstores/inventory/repair")
+def admin_repair_vectorstores(
+    include_stale: bool = Query(True, description="Also rebuild orgs that are served but out of date"),
+):
+    # rescans, then queues index jobs; follow them with GET /file_system/index-jobs/{job_id}
+    try:
+        scan_inventory()
+        jobs = queue_repairs(include_stale=include_stale)
+        return api_response(code=HTTP_STATUS.OK, data=jobs, message=f"Queued {len(jobs)} repair job(s).")
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed to queue repairs: {e}")
+
+
+@router.get("/admin/global-kb/duplicates")
+def admin_global_kb_duplicates():
+    # org uploads whose content the shared knowledge base already holds; deleting them shrinks the org index
+    try:
+        return api_response(code=HTTP_STATUS.OK, data=duplicate_uploads())
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.get("/admin/vectorstores/{org_id}/settings")
+def admin_get_vector_settings(org_id: str):
+    try:
+        data = {
+            "settings": get_vector_settings(org_id),
+            "build": read_build_info(os.path.join(VECTORSTORE_BASE, f"org_{org_id}")),
+        }
+        return api_response(code=HTTP_STATUS.OK, data=data)
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.put("/admin/vectorstores/{org_id}/settings")
+def admin_set_vector_settings(org_id: str, request: VectorSettingsRequest):
+    # index type, embedding_dims and chunking changes apply on the org's next full rebuild (POST /admin/vectorstores/retrain);
+    # retrieval settings within ORG_SETTINGS_TTL_S
+    try:
+        settings = set_vector_settings(org_id, request.model_dump(exclude_unset=True))
+        return api_response(code=HTTP_STATUS.OK, data=settings, message="Vector settings updated.")
+    except ValueError as e:
+        return api_response(code=HTTP_STATUS.BAD_REQUEST, message=str(e))
+    except LookupError as e:
+        return api_response(code=HTTP_STATUS.NOT_FOUND, message=str(e))
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.get("/admin/vectorstores/{org_id}/generations")
+def admin_list_generations(org_id: str):
+    try:
+        return api_response(code=HTTP_STATUS.OK, data=list_vectorstore_generations(org_id))
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed: {e}")
+
+
+@router.post("/admin/vectorstores/{org_id}/rollback")
+def admin_rollback_vectorstore(
+    org_id: str,
+    generation: Optional[str] = Query(None, description="Optional: generation to serve (default: the previous one)"),
+):
+    try:
+        served = rollback_vectorstore(org_id, generation)
+        reload_vectorstore(org_id)
+        return api_response(code=HTTP_STATUS.OK, data={"current": served}, message="Vectorstore rolled back.")
+    except LookupError as e:
+        return api_response(code=HTTP_STATUS.NOT_FOUND, message=str(e))
+    except Exception as e:
+        return api_response(code=HTTP_STATUS.INTERNAL_SERVER_ERROR, message=f"Failed to roll back: {e}")
@@ -8,11 +8,9 @@ from services.file_service import (
     get_unique_question_metadata,
     get_pdf_files_info_from_disk,
     delete_single_uploaded_file,
-    remove_vectorstore_dir
 )
 import os
-from services.vectorstore_loader import retrain_and_replace_vectorstore
-from services.vectorstore_singleton import reload_vectorstore
+from services.index_jobs import enqueue_index_job, enqueue_delete_job, get_index_job
 from utils.constants import MAX_FILE_SIZE_BYTES,HTTP_STATUS,MESSAGE
 from utils.helpers import api_response
 from utils.deps import jwt_required
@@ -138,22 +136,17 @@ async def delete_files(request: DeleteRequest):
 
     # After delete, check if any files remain for this org
     remaining = rag_files.count_documents({"org_id": org_id})
-    if remaining > 0:
-        created = retrain_and_replace_vectorstore(org_id)
-        print(created)
-        if created:
-            reload_vectorstore(org_id)
-            msg = f"File deleted, retrained index. Remaining files: {remaining}."
-        else:
-            # No valid docs got indexed (e.g., all files unsupported/empty)
-            remove_vectorstore_dir(org_id)  # ensure no stale index dir
-            msg = "File deleted. No valid documents to index; index cleared."
-    else:
-        # No files left → ensure the index dir is removed and skip reload
-        remove_vectorstore_dir(org_id)
-        msg = "File deleted. No files remain; index cleared."
-
-    return api_response(code=HTTP_STATUS.OK, data={"deleted": request.file_id}, message=msg)
+    # The index is updated on a background worker, queued behind the org's uploads;
+    # poll /file_system/index-jobs/{index_job_id}
+    job = enqueue_delete_job(org_id, result["stored_filename"], result["chunk_ids"], files_left=remaining > 0)
+
+    data = {
+        "deleted": request.file_id,
+        "remaining_files": remaining,
+        "index_job_id": job["job_id"],
+        "index_job_state": job["state"],
+    }
+    return api_response(code=HTTP_STATUS.OK, data=data, message=MESSAGE.DELETE_INDEX_JOB_QUEUED)
     
 
 
@@ -177,15 +170,28 @@ async def upload_file(org_id: str = File(...), file: UploadFile = File(...)):
         buffer.write(file_bytes)
 
     file_service.save_file_metadata(new_filename, original_filename, org_id)
-    retrain_and_replace_vectorstore(org_id)
-    reload_vectorstore(org_id)
+    # Indexing runs on a background worker; poll /file_system/index-jobs/{index_job_id}
+    job = enqueue_index_job(org_id, new_filename)
 
     data = {
         "original_filename": original_filename,
         "stored_filename": new_filename,
         "org_id": org_id,
+        "index_job_id": job["job_id"],
+        "index_job_state": job["state"],
     }
-    return api_response(code=HTTP_STATUS.OK, data=data)
+    return api_response(code=HTTP_STATUS.OK, data=data, message=MESSAGE.INDEX_JOB_QUEUED)
+
+
+# ----------------------
+# Indexing job status endpoint
+# ----------------------
+@router.get("/index-jobs/{job_id}")
+async def index_job_status(job_id: str):
+    job = get_index_job(job_id)
+    if not job:
+        return api_response(code=HTTP_STATUS.NOT_FOUND, message=MESSAGE.INDEX_JOB_NOT_FOUND)
+    return api_response(code=HTTP_STATUS.OK, data=job)
 
 # ----------------------
 # List uploaded files endpoint
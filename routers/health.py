@@ -0,0 +1,20 @@
+# routers/health.py
+from fastapi import APIRouter
+from utils.helpers import api_response
+from utils.constants import HTTP_STATUS, MESSAGE
+from services.index_warmup import get_warmup_state, is_ready
+router = APIRouter()
+
+
+@router.get("/health/live")
+async def health_live():
+    return api_response(code=HTTP_STATUS.OK, message="alive")
+
+
+@router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 503 until the vectorstore warm-up has finished."""
+    state = get_warmup_state()
+    if is_ready():
+        return api_response(code=HTTP_STATUS.OK, data=state, message=MESSAGE.READY)
+    return api_response(code=HTTP_STATUS.SERVICE_UNAVAILABLE, data=state, message=MESSAGE.WARMING_UP)
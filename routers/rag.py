@@ -27,6 +27,7 @@ import time
 from typing import Optional
 from services.org_service import get_pin_and_auth_by_user_id,get_last_auth_time,update_last_auth_time,utcnow
 from services.feedback_service import get_user_id_by_session
+from services.vectorstore_singleton import get_vectorstore_cache_stats
 
 router = APIRouter()
 
@@ -259,3 +260,12 @@ def debug_key_usage():
     """
     data = get_key_usage_stats()
     return api_response(code=HTTP_STATUS.OK, data=data)
+
+
+@router.get("/debug/vectorstore-cache")
+def debug_vectorstore_cache():
+    """
+    Shows which org vectorstores are loaded in this worker and their memory footprint.
+    """
+    data = get_vectorstore_cache_stats()
+    return api_response(code=HTTP_STATUS.OK, data=data)
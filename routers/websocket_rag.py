@@ -1,5 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from services.rag_services import get_buffer, buffer_as_history, get_retriever, update_buffer
+from services.rag_services import get_buffer, buffer_as_history, update_buffer
+from services.vectorstore_singleton import get_retriever
 from services.llm_streaming import ask_llm_stream
 from utils.logger import log_error
 from utils.metrics import ask_from_rag_websocket
@@ -0,0 +1,118 @@
+# services/chunk_dedupe.py
+"""
+Drop exact and near-duplicate chunks before they are embedded.
+
+Repeated uploads of the same brochure produce identical chunks, and small
+edits between versions produce near-identical ones; both waste index space and
+crowd the top-k with copies. Each chunk gets a 64-bit SimHash over word
+3-shingles. A chunk whose normalised text was already seen (exact), or whose
+SimHash is within CHUNK_DEDUPE_MAX_HAMMING bits of a kept chunk (near), is
+dropped. The kept chunk records every file the text appeared in, in its
+`sources` metadata.
+
+Candidates are found with banded lookup: the 64 bits are split into
+MAX_HAMMING + 1 bands, and two signatures within MAX_HAMMING bits share at least
+one band exactly (pigeonhole), so only chunks sharing a band are compared.
+"""
+import re
+from hashlib import blake2b, sha1
+import numpy as np
+from utils.constants import CHUNK_DEDUPE_ENABLED, CHUNK_DEDUPE_MAX_HAMMING
+
+SHINGLE_WORDS = 3
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def simhash(text: str) -> int:
+    words = _WORD_RE.findall(text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))]
+    hashes = np.array(
+        [int.from_bytes(blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def _bands(signature: int, n_bands: int) -> list:
+    width = 64 // n_bands
+    return [(b, (signature >> (b * width)) & ((1 << width) - 1)) for b in range(n_bands)]
+
+
+class ChunkDeduper:
+    """
+    Stateful filter over one org's chunk stream. Seed it with the chunks already
+    in the index (`add_existing`) to dedupe an incremental add against them.
+    """
+
+    def __init__(self, max_hamming: int = CHUNK_DEDUPE_MAX_HAMMING, enabled: bool = CHUNK_DEDUPE_ENABLED):
+        self.enabled = enabled
+        self.max_hamming = max_hamming
+        self.n_bands = max_hamming + 1
+        self._exact = {}   # sha1 of normalised text -> kept doc
+        self._buckets = {}  # (band, value) -> [(signature, kept doc)]
+        self.merged = {}   # chunk_id -> kept doc that gained a source since seeding
+        self.stats = {"chunks_in": 0, "kept": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    def _find(self, text: str):
+        key = sha1(_normalise(text).encode("utf-8")).digest()
+        if key in self._exact:
+            return key, None, self._exact[key], "exact_duplicates"
+        signature = simhash(text)
+        if self.max_hamming > 0:
+            for band in _bands(signature, self.n_bands):
+                for other, doc in self._buckets.get(band, ()):
+                    if bin(signature ^ other).count("1") <= self.max_hamming:
+                        return key, signature, doc, "near_duplicates"
+        return key, signature, None, None
+
+    def _keep(self, key, signature: int, doc) -> None:
+        doc.metadata.setdefault("sources", [doc.metadata["source_file"]])
+        self._exact[key] = doc
+        for band in _bands(signature, self.n_bands):
+            self._buckets.setdefault(band, []).append((signature, doc))
+
+    def add_existing(self, doc) -> None:
+        key, signature, _, _ = self._find(doc.page_content)
+        if signature is None:
+            signature = simhash(doc.page_content)
+        self._keep(key, signature, doc)
+
+    def filter(self, chunks):
+        """Yield the chunks worth embedding; duplicates are folded into the chunk they repeat."""
+        for chunk in chunks:
+            self.stats["chunks_in"] += 1
+            if not self.enabled:
+                self.stats["kept"] += 1
+                yield chunk
+                continue
+            key, signature, kept, kind = self._find(chunk.page_content)
+            if kept is None:
+                self.stats["kept"] += 1
+                self._keep(key, signature, chunk)
+                yield chunk
+                continue
+            self.stats[kind] += 1
+            sources = kept.metadata.setdefault("sources", [kept.metadata["source_file"]])
+            if chunk.metadata["source_file"] not in sources:
+                sources.append(chunk.metadata["source_file"])
+                self.merged[kept.metadata["chunk_id"]] = kept
+
+    def summary(self) -> dict:
+        dropped = self.stats["exact_duplicates"] + self.stats["near_duplicates"]
+        return {
+            **self.stats,
+            "dropped": dropped,
+            "reduction_pct": round(100 * dropped / self.stats["chunks_in"], 1) if self.stats["chunks_in"] else 0.0,
+        }
+
+
+def foreign_sources(docs, stored_filenames) -> bool:
+    """True if any of `docs` also stands in for a file other than `stored_filenames` (removing it loses text)."""
+    names = set(stored_filenames)
+    return any(set(doc.metadata.get("sources", ())) - names for doc in docs)
@@ -0,0 +1,284 @@
+# services/chunker.py
+"""
+Chunk profiles, and token-budgeted chunking that follows the document's structure.
+
+A profile (CHUNK_PROFILES; per org via `vector_settings.chunk_profile`) sets
+chunk size and overlap. "legacy" is the original 300 / 50 character
+RecursiveCharacterTextSplitter. The others count tokens with the embedding
+model's tokenizer and pack whole structural pieces:
+
+    section   a heading line (bold or larger than the page's body text, or a
+              "Q12." FAQ question) and everything up to the next heading
+    block     a PyMuPDF text block, or a blank-line separated paragraph
+
+Sections are packed greedily into chunks of up to `size` tokens, and a section
+that fits in one chunk is never split across two. A section larger than `size`
+is split at block, then sentence, then line, then word boundaries; only these
+continuation chunks repeat up to `overlap` tokens of the previous chunk (whole
+pieces). How many characters repeat is kept in the chunk's `overlap` metadata,
+so merge_adjacent (services/rerank.py) can drop them again.
+
+Heading and block boundaries come from the `layout` metadata the PDF extractor
+writes (pdf_page_layout); pages without it (Word and text files) are split on
+blank lines.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import NamedTuple
+import tiktoken
+from langchain.docstore.document import Document
+from utils.constants import EMBEDDING_MODEL, CHUNK_PROFILE
+from utils.logger import log_error
+
+CHUNKER_VERSION = 1  # bump when packing rules change; part of the manifest config
+LAYOUT_KEY = "layout"  # page metadata: [[offset into page_content, BLOCK | HEADING], ...]
+BLOCK, HEADING = 0, 1
+HEADING_SIZE_RATIO = 1.15  # font size over the page's body text that makes a line a heading
+HEADING_MAX_CHARS = 120
+_BOLD = 16  # PyMuPDF span flag
+_FAQ_QUESTION_RE = re.compile(r"^\s*q\s*\d+\s*[.):]", re.IGNORECASE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# ways to cut an oversized piece, coarsest first, and what joins the parts again
+_SPLITS = (
+    (_PARAGRAPH_RE, "\n"),
+    (re.compile(r"(?<=[.!?])\s+"), " "),
+    (re.compile(r"\n"), "\n"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+class ChunkProfile(NamedTuple):
+    name: str
+    unit: str     # "chars" (legacy splitter) or "tokens"
+    size: int
+    overlap: int
+
+
+CHUNK_PROFILES = {
+    "legacy": ChunkProfile("legacy", "chars", 300, 50),
+    "small": ChunkProfile("small", "tokens", 128, 16),
+    "standard": ChunkProfile("standard", "tokens", 256, 32),
+    "large": ChunkProfile("large", "tokens", 512, 64),
+}
+
+
+def chunk_profile(settings: dict = None) -> ChunkProfile:
+    """
+    The profile org `settings` select (CHUNK_PROFILE by default), with their
+    `chunk_tokens` / `chunk_overlap_tokens` overrides for token profiles.
+    """
+    settings = settings or {}
+    profile = CHUNK_PROFILES.get(settings.get("chunk_profile") or CHUNK_PROFILE, CHUNK_PROFILES["legacy"])
+    if profile.unit != "tokens":
+        return profile
+    size = settings.get("chunk_tokens") or profile.size
+    overlap = settings.get("chunk_overlap_tokens")
+    return profile._replace(size=size, overlap=min(profile.overlap if overlap is None else overlap, size // 2))
+
+
+def profile_config(profile: ChunkProfile) -> dict:
+    """Manifest config entries of a profile; a change forces a rebuild."""
+    if profile.unit == "chars":
+        # the keys manifests had before profiles existed
+        return {"chunk_size": profile.size, "chunk_overlap": profile.overlap}
+    return {
+        "chunk_size": profile.size,
+        "chunk_overlap": profile.overlap,
+        "chunk_unit": f"tokens:{tokenizer_name()}",
+        "chunker": CHUNKER_VERSION,
+    }
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.encoding_for_model(EMBEDDING_MODEL)
+    except Exception as e:
+        # tiktoken downloads its tables on first use; without network, estimate
+        log_error(f"Tokenizer for {EMBEDDING_MODEL} unavailable, counting tokens as characters / 4: {e}")
+        return None
+
+
+def tokenizer_name() -> str:
+    encoding = _encoding()
+    return encoding.name if encoding is not None else "chars/4"
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# ----------------------
+# PDF page structure
+# ----------------------
+
+
+def _is_heading(spans: list, line: str, body_size: float) -> bool:
+    text = line.strip()
+    if not text or len(text) > HEADING_MAX_CHARS:
+        return False
+    if _FAQ_QUESTION_RE.match(text):
+        return True
+    visible = [s for s in spans if s["text"].strip()]
+    if all(s["flags"] & _BOLD for s in visible):
+        return True
+    return body_size > 0 and max(s["size"] for s in visible) >= body_size * HEADING_SIZE_RATIO
+
+
+def pdf_page_layout(page_dict: dict, text: str):
+    """
+    Block and heading boundaries of a PDF page, as offsets into text.strip(),
+    from page.get_text("dict"); `text` is the page's plain get_text() output.
+    None when the dict's blocks don't add up to `text`.
+    """
+    blocks = [b for b in page_dict.get("blocks", ()) if b.get("type") == 0]
+    sizes = Counter()
+    for block in blocks:
+        for line in block["lines"]:
+            for span in line["spans"]:
+                sizes[round(span["size"], 1)] += len(span["text"].strip())
+    body_size = sizes.most_common(1)[0][0] if sizes else 0
+
+    bounds, parts, offset, in_heading = {}, [], 0, False
+    for block in blocks:
+        bounds[offset] = BLOCK
+        for line in block["lines"]:
+            line_text = "".join(span["text"] for span in line["spans"])
+            if _is_heading(line["spans"], line_text, body_size):
+                if not in_heading:  # a heading wrapped over several lines starts one section
+                    bounds[offset] = HEADING
+                in_heading = True
+            elif line_text.strip():
+                in_heading = False
+            parts.append(line_text + "\n")
+            offset += len(line_text) + 1
+    if "".join(parts) != text:
+        return None
+    lead = len(text) - len(text.lstrip())
+    end = len(text.strip())
+    layout = {}
+    for offset, kind in bounds.items():
+        offset = max(offset - lead, 0)  # boundaries inside leading whitespace move to the start
+        if offset < end:
+            layout[offset] = max(layout.get(offset, BLOCK), kind)
+    return [[offset, kind] for offset, kind in sorted(layout.items())]
+
+
+# ----------------------
+# Token chunking
+# ----------------------
+
+
+def _page_units(page):
+    # (text, starts a section) of one page, in order
+    text = page.page_content
+    layout = page.metadata.get(LAYOUT_KEY)
+    if not layout:
+        for paragraph in _PARAGRAPH_RE.split(text):
+            if paragraph.strip():
+                yield paragraph.strip(), False
+        return
+    offsets = [o for o, _ in layout] + [len(text)]
+    if text[:offsets[0]].strip():
+        yield text[:offsets[0]].strip(), False
+    for (start, kind), end in zip(layout, offsets[1:]):
+        unit = text[start:end].strip()
+        if unit:
+            yield unit, kind == HEADING
+
+
+def _pieces(text: str, size: int, joiner: str, level: int = 0):
+    # (text, joiner before it, tokens) parts of `text` of at most `size` tokens where possible
+    tokens = count_tokens(text)
+    if tokens <= size or level == len(_SPLITS):
+        yield text, joiner, tokens
+        return
+    pattern, inner = _SPLITS[level]
+    parts = [p.strip() for p in pattern.split(text) if p.strip()]
+    for i, part in enumerate(parts):
+        yield from _pieces(part, size, joiner if i == 0 else inner, level + 1)
+
+
+class _Packer:
+    """Greedy packing of sections into chunks; see the module docstring."""
+
+    def __init__(self, profile: ChunkProfile):
+        self.size, self.overlap = profile.size, profile.overlap
+        self.chunk, self.chunk_tokens = [], 0   # [(text, joiner, tokens, page metadata)]
+        self.overlap_chars = 0                  # leading characters repeated from the previous chunk
+        self.section, self.section_tokens = [], 0
+        self.splitting = False                  # the current section did not fit in one chunk
+
+    def _emit(self, carry: bool = False):
+        if not self.chunk:
+            return
+        first = self.chunk[0]
+        text = first[0] + "".join(joiner + piece for piece, joiner, _, _ in self.chunk[1:])
+        metadata = {k: v for k, v in first[3].items() if k != LAYOUT_KEY}
+        metadata["overlap"] = self.overlap_chars
+        yield Document(page_content=text, metadata=metadata)
+        kept, kept_tokens = [], 0
+        if carry and self.overlap:
+            for piece in reversed(self.chunk):
+                if kept_tokens + piece[2] > self.overlap:
+                    break
+                kept.insert(0, piece)
+                kept_tokens += piece[2]
+        if kept:
+            self.overlap_chars = len(kept[0][0] + "".join(joiner + piece for piece, joiner, _, _ in kept[1:]))
+        else:
+            self.overlap_chars = 0
+        self.chunk, self.chunk_tokens = kept, kept_tokens
+
+    def _add_split(self, text: str, metadata: dict):
+        for piece, joiner, tokens in _pieces(text, self.size, "\n"):
+            if self.chunk and self.chunk_tokens + tokens > self.size:
+                yield from self._emit(carry=True)
+                if self.chunk and self.chunk_tokens + tokens > self.size:
+                    self.chunk, self.chunk_tokens, self.overlap_chars = [], 0, 0
+            self.chunk.append((piece, joiner, tokens, metadata))
+            self.chunk_tokens += tokens
+
+    def end_section(self):
+        if self.section and not self.splitting:
+            if self.chunk and self.chunk_tokens + self.section_tokens > self.size:
+                yield from self._emit()
+            for text, tokens, metadata in self.section:
+                self.chunk.append((text, "\n", tokens, metadata))
+                self.chunk_tokens += tokens
+        self.section, self.section_tokens, self.splitting = [], 0, False
+
+    def add(self, text: str, starts_section: bool, metadata: dict):
+        if starts_section:
+            yield from self.end_section()
+        if self.splitting:
+            yield from self._add_split(text, metadata)
+            return
+        tokens = count_tokens(text)
+        self.section.append((text, tokens, metadata))
+        self.section_tokens += tokens
+        if self.section_tokens > self.size:
+            # too big for any chunk: start it in a chunk of its own and split as needed
+            yield from self._emit()
+            self.splitting = True
+            pending, self.section, self.section_tokens = self.section, [], 0
+            for pending_text, _, pending_metadata in pending:
+                yield from self._add_split(pending_text, pending_metadata)
+
+    def finish(self):
+        yield from self.end_section()
+        yield from self._emit()
+
+
+def split_structured(pages, profile: ChunkProfile):
+    """Token chunks of one file's pages (in order); each chunk has the metadata of the page it starts on."""
+    packer = _Packer(profile)
+    for page in pages:
+        for text, starts_section in _page_units(page):
+            yield from packer.add(text, starts_section, page.metadata)
+    yield from packer.finish()
@@ -0,0 +1,269 @@
+# services/columnar_docstore.py
+"""
+Compact, memory-mappable replacement for the pickled LangChain docstore (index.pkl).
+
+Layout of <vectorstore_dir>/docstore/ (row i == FAISS position i):
+    header.json          version, row count, per-file metadata (written last)
+    texts.bin            all chunk texts, UTF-8, back to back
+    text_offsets.npy     int64[n + 1] byte offsets into texts.bin
+    ids.bin              docstore ids (chunk ids), UTF-8, back to back
+    id_offsets.npy       int64[n + 1]
+    file_idx.npy         int32[n]  index into header["files"]
+    page.npy             int32[n]  page number, -1 if none
+    chunk_index.npy      int32[n]  chunk number within its file, -1 if none
+    extra.bin            JSON of any remaining per-row metadata ("" if none)
+    extra_offsets.npy    int64[n + 1]
+
+Everything is opened with mmap / np.load(mmap_mode="r"), so loading copies no
+chunk data; a Document is only materialised when a search returns its row.
+"""
+import json
+import mmap
+import os
+import sys
+from collections.abc import Mapping
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore
+
+DOCSTORE_DIR = "docstore"
+HEADER_FILE = "header.json"
+FORMAT_VERSION = 1
+
+# metadata kept in fixed columns; "chunk_id" is dropped when it equals the row id
+_COLUMN_KEYS = ("source_file", "page", "chunk_index")
+_ID_KEY = "chunk_id"
+
+
+def _open_blob(path: str):
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_blob(path: str, values: list) -> np.ndarray:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        pos = 0
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            f.write(data)
+            pos += len(data)
+            offsets[i + 1] = pos
+    return offsets
+
+
+class RowIdMap(Mapping):
+    """index_to_docstore_id for a columnar store: FAISS position i maps to row i."""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0 or i >= self.n:
+            raise KeyError(i)
+        return i
+
+    def __iter__(self):
+        return iter(range(self.n))
+
+    def __len__(self):
+        return self.n
+
+
+class ColumnarDocstore(Docstore):
+    """Read-only docstore over the columnar files; search() takes a row number or a chunk id."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.count = self.header["count"]
+        self.files = self.header["files"]
+        self._texts = _open_blob(os.path.join(directory, "texts.bin"))
+        self._text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode="r")
+        self._ids = _open_blob(os.path.join(directory, "ids.bin"))
+        self._id_offsets = np.load(os.path.join(directory, "id_offsets.npy"), mmap_mode="r")
+        self._file_idx = np.load(os.path.join(directory, "file_idx.npy"), mmap_mode="r")
+        self._page = np.load(os.path.join(directory, "page.npy"), mmap_mode="r")
+        self._chunk_index = np.load(os.path.join(directory, "chunk_index.npy"), mmap_mode="r")
+        self._extra = _open_blob(os.path.join(directory, "extra.bin"))
+        self._extra_offsets = np.load(os.path.join(directory, "extra_offsets.npy"), mmap_mode="r")
+        self._row_by_id = None
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _slice(blob, offsets, row: int) -> str:
+        return bytes(blob[int(offsets[row]):int(offsets[row + 1])]).decode("utf-8")
+
+    def doc_id(self, row: int) -> str:
+        return self._slice(self._ids, self._id_offsets, row)
+
+    def text(self, row: int) -> str:
+        return self._slice(self._texts, self._text_offsets, row)
+
+    def metadata(self, row: int) -> dict:
+        file_info = self.files[int(self._file_idx[row])]
+        metadata = dict(file_info["metadata"])
+        if file_info["source_file"] is not None:
+            metadata["source_file"] = file_info["source_file"]
+        page = int(self._page[row])
+        if page >= 0:
+            metadata["page"] = page
+        chunk_index = int(self._chunk_index[row])
+        if chunk_index >= 0:
+            metadata["chunk_index"] = chunk_index
+        extra = self._slice(self._extra, self._extra_offsets, row)
+        if extra:
+            metadata.update(json.loads(extra))
+        if file_info.get("ids_are_chunk_ids"):
+            metadata[_ID_KEY] = self.doc_id(row)
+        # restore the original key order so documents compare equal to the pickled store
+        order = file_info.get("key_order")
+        if order:
+            metadata = {k: metadata[k] for k in order if k in metadata} | {
+                k: v for k, v in metadata.items() if k not in order
+            }
+        return metadata
+
+    def document(self, row: int) -> Document:
+        return Document(id=self.doc_id(row), page_content=self.text(row), metadata=self.metadata(row))
+
+    def row_for_id(self, doc_id: str):
+        if self._row_by_id is None:
+            self._row_by_id = {self.doc_id(i): i for i in range(self.count)}
+        return self._row_by_id.get(doc_id)
+
+    def search(self, search):
+        row = search if isinstance(search, (int, np.integer)) else self.row_for_id(search)
+        if row is None or not 0 <= int(row) < self.count:
+            return f"ID {search} not found."
+        return self.document(int(row))
+
+    def add(self, texts):
+        raise NotImplementedError("ColumnarDocstore is read-only; load a writable copy to modify the index")
+
+    def delete(self, ids):
+        raise NotImplementedError("ColumnarDocstore is read-only; load a writable copy to modify the index")
+
+
+def _split_file_level(docs: list) -> tuple:
+    """Group rows by source file and find metadata that is identical for every row of a file."""
+    files, file_idx_of = [], {}
+    row_file = []
+    for doc in docs:
+        key = doc.metadata.get("source_file")
+        if key not in file_idx_of:
+            file_idx_of[key] = len(files)
+            files.append({"source_file": key, "metadata": None, "ids_are_chunk_ids": True, "key_order": None})
+        idx = file_idx_of[key]
+        row_file.append(idx)
+        meta = {k: v for k, v in doc.metadata.items() if k not in _COLUMN_KEYS and k != _ID_KEY}
+        common = files[idx]["metadata"]
+        files[idx]["metadata"] = meta if common is None else {
+            k: v for k, v in common.items() if k in meta and meta[k] == v
+        }
+        if files[idx]["key_order"] is None:
+            files[idx]["key_order"] = list(doc.metadata.keys())
+    for f in files:
+        f["metadata"] = f["metadata"] or {}
+    return files, row_file
+
+
+def write_columnar_docstore(directory: str, ids: list, docs: list) -> None:
+    """Write rows in FAISS order; `ids[i]` / `docs[i]` belong to FAISS position i."""
+    os.makedirs(directory, exist_ok=True)
+    files, row_file = _split_file_level(docs)
+
+    n = len(docs)
+    page = np.full(n, -1, dtype=np.int32)
+    chunk_index = np.full(n, -1, dtype=np.int32)
+    extras = []
+    for i, (doc_id, doc) in enumerate(zip(ids, docs)):
+        file_info = files[row_file[i]]
+        meta = doc.metadata
+        if isinstance(meta.get("page"), int):
+            page[i] = meta["page"]
+        if isinstance(meta.get("chunk_index"), int):
+            chunk_index[i] = meta["chunk_index"]
+        if meta.get(_ID_KEY) != doc_id:
+            file_info["ids_are_chunk_ids"] = False
+        extra = {
+            k: v for k, v in meta.items()
+            if k not in file_info["metadata"]
+            and not (k == "source_file")
+            and not (k == "page" and page[i] >= 0)
+            and not (k == "chunk_index" and chunk_index[i] >= 0)
+            and not (k == _ID_KEY and v == doc_id)
+        }
+        extras.append(extra)
+
+    # rows whose chunk_id differs from the row id keep it in `extra`
+    for i, (doc_id, doc) in enumerate(zip(ids, docs)):
+        if not files[row_file[i]]["ids_are_chunk_ids"] and _ID_KEY in doc.metadata:
+            extras[i][_ID_KEY] = doc.metadata[_ID_KEY]
+
+    text_offsets = _write_blob(os.path.join(directory, "texts.bin"), [d.page_content for d in docs])
+    id_offsets = _write_blob(os.path.join(directory, "ids.bin"), [str(i) for i in ids])
+    extra_offsets = _write_blob(
+        os.path.join(directory, "extra.bin"),
+        [json.dumps(e, ensure_ascii=False) if e else "" for e in extras],
+    )
+    np.save(os.path.join(directory, "text_offsets.npy"), text_offsets)
+    np.save(os.path.join(directory, "id_offsets.npy"), id_offsets)
+    np.save(os.path.join(directory, "extra_offsets.npy"), extra_offsets)
+    np.save(os.path.join(directory, "file_idx.npy"), np.asarray(row_file, dtype=np.int32))
+    np.save(os.path.join(directory, "page.npy"), page)
+    np.save(os.path.join(directory, "chunk_index.npy"), chunk_index)
+
+    # header last: its presence marks a complete docstore
+    with open(os.path.join(directory, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": FORMAT_VERSION, "count": n, "files": files}, f, ensure_ascii=False)
+
+
+def export_rows(vectorstore) -> tuple:
+    """(ids, docs) of a LangChain FAISS store in FAISS position order."""
+    ids, docs = [], []
+    for i in range(vectorstore.index.ntotal):
+        doc_id = vectorstore.index_to_docstore_id[i]
+        doc = vectorstore.docstore.search(doc_id)
+        if isinstance(doc, Document) and doc.id is not None and isinstance(doc_id, (int, np.integer)):
+            doc_id = doc.id  # columnar source: the row key is a position, the real id is on the document
+        ids.append(doc_id)
+        docs.append(doc)
+    return ids, docs
+
+
+def _migrate(paths: list, keep_pkl: bool) -> None:
+    """Convert legacy vectorstores/org_* directories (index.faiss + index.pkl) in place."""
+    from services.index_io import read_vectorstore, verify_same_results, write_docstore_for
+    from langchain_core.embeddings import FakeEmbeddings
+
+    for vectorstore_dir in paths:
+        if not (os.path.exists(os.path.join(vectorstore_dir, "index.faiss"))
+                and os.path.exists(os.path.join(vectorstore_dir, "index.pkl"))):
+            print(f"skip {vectorstore_dir}: no index.faiss + index.pkl")
+            continue
+        legacy = read_vectorstore(vectorstore_dir, FakeEmbeddings(size=1), prefer_columnar=False)
+        write_docstore_for(legacy, vectorstore_dir)
+        columnar = read_vectorstore(vectorstore_dir, FakeEmbeddings(size=1))
+        if not verify_same_results(legacy, columnar):
+            raise SystemExit(f"{vectorstore_dir}: columnar docstore returned different results; index.pkl kept")
+        if not keep_pkl:
+            os.remove(os.path.join(vectorstore_dir, "index.pkl"))
+        print(f"migrated {vectorstore_dir}: {len(columnar.docstore)} rows")
+
+
+if __name__ == "__main__":
+    # python -m services.columnar_docstore [--keep-pkl] vectorstores/org_*
+    args = sys.argv[1:]
+    keep = "--keep-pkl" in args
+    targets = [a for a in args if a != "--keep-pkl"]
+    if not targets:
+        base = "vectorstores"
+        targets = [os.path.join(base, d) for d in sorted(os.listdir(base)) if d.startswith("org_")]
+    _migrate(targets, keep)
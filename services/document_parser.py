@@ -0,0 +1,157 @@
+# services/document_parser.py
+import os
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, Docx2txtLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain.docstore.document import Document
+from utils.constants import INGEST_PAGE_WORKERS, INGEST_PAGES_PER_TASK
+from services.chunker import CHUNK_PROFILES, LAYOUT_KEY, chunk_profile, pdf_page_layout, split_structured
+
+LOADERS = {
+    ".pdf": PyMuPDFLoader,
+    ".txt": TextLoader,
+    ".docx": Docx2txtLoader,
+}
+
+CHUNK_SIZE = CHUNK_PROFILES["legacy"].size  # characters, for the legacy splitter
+CHUNK_OVERLAP = CHUNK_PROFILES["legacy"].overlap
+PAGE_TASKS_IN_FLIGHT = 2 * INGEST_PAGE_WORKERS  # bounds pages extracted but not yet split
+
+
+def list_source_files(upload_dir: str) -> list:
+    """Indexable files in an org upload folder (hidden files and sub-folders skipped)."""
+    if not os.path.isdir(upload_dir):
+        return []
+    names = []
+    for filename in sorted(os.listdir(upload_dir)):
+        if filename.startswith("."):
+            continue
+        if os.path.isdir(os.path.join(upload_dir, filename)):
+            continue
+        if os.path.splitext(filename)[1].lower() in LOADERS:
+            names.append(filename)
+    return names
+
+
+def _pdf_date(value: str) -> str:
+    # PDF dates look like D:20250813132352+05'30'
+    try:
+        return datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+    except ValueError:
+        return value
+
+
+def _pdf_metadata(doc, file_path: str) -> dict:
+    """Document metadata of every page, with the keys PyMuPDFLoader has always given chunks."""
+    metadata = {
+        "producer": "PyMuPDF",
+        "creator": "PyMuPDF",
+        "creationdate": "",
+        "source": file_path,
+        "file_path": file_path,
+        "total_pages": len(doc),
+    }
+    for key, value in doc.metadata.items():
+        if not isinstance(value, (str, int)):
+            continue
+        if key.lower() in ("creationdate", "moddate"):
+            metadata[key.lower()] = _pdf_date(value)
+            metadata[key] = value  # the raw PDF date as well
+        else:
+            metadata[key.lower()] = value.strip() if isinstance(value, str) else value
+    return metadata
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list:
+    """
+    Pages [start, stop) of a PDF, read with PyMuPDF, plus the page's block and
+    heading boundaries in `layout` metadata (for the token chunker). Module-level
+    so page ranges of one file can be extracted in worker processes.
+    """
+    import pymupdf
+    with pymupdf.open(file_path) as doc:
+        doc_metadata = _pdf_metadata(doc, file_path)
+        pages = []
+        for n in range(start, min(stop, len(doc))):
+            text = doc[n].get_text()
+            metadata = doc_metadata | {"page": n}
+            layout = pdf_page_layout(doc[n].get_text("dict"), text)
+            if layout:
+                metadata[LAYOUT_KEY] = layout
+            pages.append(Document(page_content=text.strip(), metadata=metadata))
+        return pages
+
+
+def _pdf_page_count(file_path: str) -> int:
+    import pymupdf
+    with pymupdf.open(file_path) as doc:
+        return len(doc)
+
+
+def iter_raw_pages(file_path: str, pool=None):
+    """Page documents of one file as the loader returns them (not lowercased); PDF pages also carry `layout`."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext != ".pdf":
+        yield from LOADERS[ext](file_path).lazy_load()
+        return
+    n_pages = _pdf_page_count(file_path)
+    if pool is None:
+        for start in range(0, n_pages, INGEST_PAGES_PER_TASK):
+            yield from _extract_pdf_pages(file_path, start, start + INGEST_PAGES_PER_TASK)
+        return
+    # page ranges go to the process pool (PyMuPDF is not thread-safe); at most
+    # PAGE_TASKS_IN_FLIGHT ranges are pending, and pages come back in order
+    ranges = iter(range(0, n_pages, INGEST_PAGES_PER_TASK))
+    pending = deque()
+    for start in islice(ranges, PAGE_TASKS_IN_FLIGHT):
+        pending.append(pool.submit(_extract_pdf_pages, file_path, start, start + INGEST_PAGES_PER_TASK))
+    while pending:
+        pages = pending.popleft().result()
+        for start in islice(ranges, 1):
+            pending.append(pool.submit(_extract_pdf_pages, file_path, start, start + INGEST_PAGES_PER_TASK))
+        yield from pages
+
+
+def lowercase_pages(pages):
+    for doc in pages:
+        text = doc.page_content.lower()
+        metadata = doc.metadata
+        if len(text) != len(doc.page_content) and LAYOUT_KEY in metadata:
+            # a few characters lowercase to two; layout offsets no longer fit
+            metadata = {k: v for k, v in metadata.items() if k != LAYOUT_KEY}
+        yield Document(page_content=text, metadata=metadata)
+
+
+def make_chunk_id(stored_filename: str, n: int) -> str:
+    return f"{stored_filename}:{n}"
+
+
+def _split_by_characters(pages, profile):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=profile.size, chunk_overlap=profile.overlap)
+    for page in pages:
+        for chunk in splitter.split_documents([page]):
+            chunk.metadata.pop(LAYOUT_KEY, None)
+            yield chunk
+
+
+def split_pages(pages, stored_filename: str, profile=None):
+    """
+    Chunks of one file's pages, split as pages arrive, with chunk `profile`
+    (services/chunker.py; CHUNK_PROFILE by default). Every chunk carries its
+    owning file and a stable id (`<stored_filename>:<n>`) so it can later be
+    removed on its own; ids match splitting the whole file at once.
+    """
+    profile = profile or chunk_profile()
+    if profile.unit == "tokens":
+        chunks = split_structured(pages, profile)
+    else:
+        chunks = _split_by_characters(pages, profile)
+    n = 0
+    for chunk in chunks:
+        chunk.metadata["source_file"] = stored_filename
+        chunk.metadata["chunk_index"] = n
+        chunk.metadata["chunk_id"] = make_chunk_id(stored_filename, n)
+        n += 1
+        yield chunk
@@ -0,0 +1,253 @@
+# services/embedding_cache.py
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from hashlib import sha256
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.constants import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+from utils.logger import log_error
+from utils.metrics import (
+    embedding_cache_hits,
+    embedding_cache_misses,
+    embedding_cache_hit_ratio,
+    embedding_cache_bytes,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dim       INTEGER NOT NULL,
+    vector    BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+EVICT_BATCH = 1000  # least recently used rows read per eviction step
+EVICT_TO = 0.9  # eviction frees down to this share of the budget, so it doesn't run on every write
+SQLITE_MAX_VARS = 500  # stay well below SQLite's bound-parameter limit
+
+
+def text_hash(text: str) -> str:
+    return sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of embedding vectors, keyed by (model, sha256(text)).
+    Vectors are float32 blobs in a local SQLite file shared by every org, retrain
+    and uvicorn worker on the host. Least recently used rows are evicted once the
+    vectors grow past `max_bytes`. The size is a running count per process,
+    re-read from the file (other workers write to it too) each time that count
+    crosses the budget, not on every write.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._vector_bytes = None  # running SUM(LENGTH(vector)); None until first read
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get_many(self, model: str, hashes: list) -> dict:
+        """Return {text_hash: vector(list[float])} for every hash already cached."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), SQLITE_MAX_VARS):
+                batch = hashes[start:start + SQLITE_MAX_VARS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        self._record(hits=len(found), misses=len(hashes) - len(found))
+        return found
+
+    def put_many(self, model: str, items: list) -> None:
+        """Store [(text_hash, vector)] and evict old rows if over budget."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for h, vector in items:
+            arr = np.asarray(vector, dtype=np.float32)
+            rows.append((model, h, int(arr.shape[0]), arr.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            if self._vector_bytes is not None:
+                self._vector_bytes += sum(len(row[3]) for row in rows)
+            self._evict_locked(self.max_bytes)
+
+    def _vector_bytes_locked(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _evict_locked(self, max_bytes: int) -> int:
+        if self._vector_bytes is None or self._vector_bytes > max_bytes:
+            self._vector_bytes = self._vector_bytes_locked()
+        evicted = 0
+        if self._vector_bytes > max_bytes:
+            target = int(max_bytes * EVICT_TO)
+            while self._vector_bytes > target:
+                victims, freed = [], 0
+                for model, h, n in self._conn.execute(
+                    "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?",
+                    (EVICT_BATCH,),
+                ):
+                    victims.append((model, h))
+                    freed += n
+                    if self._vector_bytes - freed <= target:
+                        break
+                if not victims:
+                    break
+                self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+                self._conn.commit()
+                self._vector_bytes -= freed
+                evicted += len(victims)
+        embedding_cache_bytes.set(self._vector_bytes)
+        return evicted
+
+    def compact(self, max_bytes: int = None) -> dict:
+        """Evict down to `max_bytes` (default: configured budget) and VACUUM the file."""
+        with self._lock:
+            before = self._file_bytes()
+            self._vector_bytes = None  # count what every worker wrote
+            evicted = self._evict_locked(self.max_bytes if max_bytes is None else max_bytes)
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            after = self._file_bytes()
+        return {"evicted_rows": evicted, "file_bytes_before": before, "file_bytes_after": after}
+
+    def _file_bytes(self) -> int:
+        return sum(
+            os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, COUNT(*), SUM(LENGTH(vector)) FROM embeddings GROUP BY model"
+            ).fetchall()
+            vector_bytes = self._vector_bytes_locked()
+        total = self._hits + self._misses
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "vector_bytes": vector_bytes,
+            "models": [{"model": m, "rows": n, "vector_bytes": b or 0} for m, n, b in rows],
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": (self._hits / total) if total else 0.0,
+        }
+
+    def _record(self, hits: int, misses: int) -> None:
+        self._hits += hits
+        self._misses += misses
+        embedding_cache_hits.inc(hits)
+        embedding_cache_misses.inc(misses)
+        total = self._hits + self._misses
+        if total:
+            embedding_cache_hit_ratio.set(self._hits / total)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so embed_documents only calls the API for chunk
+    texts the cache has never seen under `model_key`. Queries pass straight through.
+    """
+
+    def __init__(self, underlying: Embeddings, model_key: str, cache: EmbeddingCache = None):
+        self.underlying = underlying
+        self.model_key = model_key
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts: list) -> list:
+        hashes = [text_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        try:
+            found = self.cache.get_many(self.model_key, list(unique))
+        except sqlite3.Error as e:
+            log_error(f"Embedding cache read failed, embedding everything: {e}")
+            found = {}
+
+        missing = [h for h in unique if h not in found]
+        if missing:
+            vectors = self.underlying.embed_documents([unique[h] for h in missing])
+            # round through float32 so results are identical whether or not they were cached
+            vectors = np.asarray(vectors, dtype=np.float32).tolist()
+            new_items = list(zip(missing, vectors))
+            found.update(new_items)
+            try:
+                self.cache.put_many(self.model_key, new_items)
+            except sqlite3.Error as e:
+                log_error(f"Embedding cache write failed: {e}")
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> list:
+        return self.underlying.embed_query(text)
+
+
+def truncate_vectors(vectors, dims: int) -> np.ndarray:
+    """
+    First `dims` components of each vector, renormalised to unit length. For
+    text-embedding-3 models this equals asking the API for `dimensions=dims`.
+    Vectors no longer than `dims` are returned as they are.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[-1] <= dims:
+        return vectors
+    cut = vectors[..., :dims]
+    norms = np.linalg.norm(cut, axis=-1, keepdims=True)
+    return cut / np.where(norms == 0, 1, norms)
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Reduced-dimension view of an embeddings client. Vectors are cut locally,
+    so the embedding cache keeps one full-size copy per text whatever the
+    orgs' dimensions, and a dimension change never re-embeds anything.
+    """
+
+    def __init__(self, underlying: Embeddings, dims: int):
+        self.underlying = underlying
+        self.dims = dims
+
+    def embed_documents(self, texts: list) -> list:
+        return truncate_vectors(self.underlying.embed_documents(texts), self.dims).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return truncate_vectors(self.underlying.embed_query(text), self.dims).tolist()
+
+    async def aembed_query(self, text: str) -> list:
+        return truncate_vectors(await self.underlying.aembed_query(text), self.dims).tolist()
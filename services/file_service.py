@@ -233,6 +233,17 @@ def save_file_metadata(stored_filename: str, original_filename: str, org_id: str
         "uploaded_at": datetime.now()
     })
 
+def set_file_chunk_ids(org_id: str, stored_filename: str, chunk_ids: list) -> None:
+    """Record which vectorstore chunks belong to an uploaded file."""
+    rag_files.update_one(
+        {"org_id": org_id, "stored_filename": stored_filename},
+        {"$set": {
+            "chunk_ids": chunk_ids,
+            "chunk_count": len(chunk_ids),
+            "indexed_at": datetime.now()
+        }}
+    )
+
 def get_uploaded_file_metadata() -> list:
     return [
         {
@@ -375,7 +386,11 @@ def delete_single_uploaded_file(org_id: str, file_id: str) -> dict:
                 return {"ok": False, "reason": f"Disk delete error: {e}"}
         # Delete metadata regardless (so the DB stays consistent)
         rag_files.delete_one({"_id": oid, "org_id": org_id})
-        return {"ok": True}
+        return {
+            "ok": True,
+            "stored_filename": stored_filename,
+            "chunk_ids": file_doc.get("chunk_ids") or [],
+        }
     except Exception as e:
         log_error(f"Delete file error (org={org_id}, id={file_id}): {e}")
         return {"ok": False, "reason": str(e)}
@@ -0,0 +1,52 @@
+# services/global_kb.py
+"""
+Shared product knowledge base, searched together with every org's own index.
+
+It is stored and built like an org whose id is GLOBAL_KB_ORG_ID: source files
+in pdf_files/org_<GLOBAL_KB_ORG_ID>/, index in vectorstores/org_<GLOBAL_KB_ORG_ID>/,
+rebuilt by warm-up or POST /admin/vectorstores/retrain?org_ids=<GLOBAL_KB_ORG_ID>.
+Product brochures and FAQs then live in one index instead of one copy per org;
+duplicate_uploads() lists the org files that can go.
+"""
+import os
+from utils.constants import GLOBAL_KB_ORG_ID, GLOBAL_KB_ENABLED, UPLOAD_BASE
+from services.index_inventory import IndexUnavailable, check_servable, list_known_orgs
+from services.index_manifest import compute_source_files, read_manifest
+from services.org_settings import get_vector_settings
+
+
+def is_global_kb(org_id: str) -> bool:
+    return org_id == GLOBAL_KB_ORG_ID
+
+
+def uses_global_kb(org_id: str) -> bool:
+    """True if the org's questions also search the shared index (per-org `use_global_kb` overrides)."""
+    if is_global_kb(org_id):
+        return False
+    use = get_vector_settings(org_id).get("use_global_kb")
+    return GLOBAL_KB_ENABLED if use is None else use
+
+
+def global_kb_available() -> bool:
+    """False once the inventory knows there is no servable shared index (checked from memory)."""
+    try:
+        check_servable(GLOBAL_KB_ORG_ID)
+    except IndexUnavailable:
+        return False
+    return True
+
+
+def duplicate_uploads() -> dict:
+    """{org_id: [stored filenames]} of org files whose content is already in the shared knowledge base."""
+    shared = {entry["sha256"] for entry in compute_source_files(GLOBAL_KB_ORG_ID).values()}
+    if not shared:
+        return {}
+    duplicates = {}
+    for org_id in list_known_orgs():
+        if is_global_kb(org_id) or not os.path.isdir(os.path.join(UPLOAD_BASE, f"org_{org_id}")):
+            continue
+        files = compute_source_files(org_id, read_manifest(org_id))
+        names = sorted(name for name, entry in files.items() if entry["sha256"] in shared)
+        if names:
+            duplicates[org_id] = names
+    return duplicates
@@ -0,0 +1,139 @@
+# services/index_builder.py
+import math
+import re
+import time
+from datetime import datetime
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from utils.constants import (
+    FAISS_INDEX_FACTORY,
+    FAISS_FLAT_MAX_VECTORS,
+    FAISS_HNSW_MAX_VECTORS,
+    FAISS_HNSW_FACTORY,
+    FAISS_IVF_FACTORY,
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_IVF_NPROBE,
+)
+from services.org_settings import get_vector_settings
+from services.index_io import apply_search_params
+
+IVF_MIN_VECTORS = 10000  # PQ needs ~39 x 256 training points; below this Flat is as fast anyway
+IVF_POINTS_PER_LIST = 39  # faiss warns when training with fewer points per centroid
+IVF_TRAIN_SAMPLE = 256    # training points per list; more adds build time, not recall
+
+
+def auto_factory(n_vectors: int) -> str:
+    if n_vectors <= FAISS_FLAT_MAX_VECTORS:
+        return "Flat"
+    if n_vectors <= FAISS_HNSW_MAX_VECTORS:
+        return FAISS_HNSW_FACTORY
+    return FAISS_IVF_FACTORY
+
+
+def _pq_m(dim: int) -> int:
+    # ~32 dimensions per 8-bit sub-quantizer, and it has to divide dim
+    m = max(1, dim // 32)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def requested_factory(settings: dict = None) -> str:
+    """The org's `index_factory` setting, else FAISS_INDEX_FACTORY; may be "auto" or an IVF template."""
+    return (settings or {}).get("index_factory") or FAISS_INDEX_FACTORY
+
+
+def choose_index_factory(n_vectors: int, dim: int, settings: dict = None) -> str:
+    """
+    Concrete faiss.index_factory string for an org with `n_vectors` vectors.
+    The org override (settings["index_factory"]) beats FAISS_INDEX_FACTORY; either
+    may be "auto". IVF templates get {nlist} / {pq_m} filled in for this size.
+    """
+    requested = requested_factory(settings)
+    factory = auto_factory(n_vectors) if requested == "auto" else requested
+    if factory.startswith("IVF"):
+        if n_vectors < IVF_MIN_VECTORS:
+            return "Flat"
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // IVF_POINTS_PER_LIST))
+        factory = factory.format(nlist=nlist, pq_m=_pq_m(dim))
+    return factory
+
+
+def search_params(index, settings: dict = None) -> dict:
+    """Query-time knobs for the index type, e.g. {"efSearch": 64} or {"nprobe": 16}."""
+    settings = settings or {}
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return {"efSearch": int(settings.get("hnsw_ef_search") or FAISS_HNSW_EF_SEARCH)}
+    try:
+        faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return {}
+    return {"nprobe": int(settings.get("ivf_nprobe") or FAISS_IVF_NPROBE)}
+
+
+def build_faiss_index(vectors: np.ndarray, factory: str):
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if not index.is_trained:
+        n_train = vectors.shape[0]
+        try:
+            n_train = min(n_train, faiss.extract_index_ivf(index).nlist * IVF_TRAIN_SAMPLE)
+        except RuntimeError:
+            pass
+        sample = vectors
+        if n_train < vectors.shape[0]:
+            rows = np.random.default_rng(0).choice(vectors.shape[0], n_train, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    try:
+        # keeps reconstruct() and remove_ids() working on IVF indexes
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    except RuntimeError:
+        pass
+    index.add(vectors)
+    return index
+
+
+def build_vectorstore(org_id: str, docs: list, vectors: list, embeddings):
+    """
+    Build the org's FAISS store with the index type chosen for its size and
+    settings. Returns (vectorstore, build_info); build_info is saved as build.json.
+    """
+    start = time.perf_counter()
+    settings = get_vector_settings(org_id)
+    arr = np.asarray(vectors, dtype=np.float32)
+    factory = choose_index_factory(arr.shape[0], arr.shape[1], settings)
+    index = build_faiss_index(arr, factory)
+    params = search_params(index, settings)
+    apply_search_params(index, params)
+
+    ids = [doc.metadata["chunk_id"] for doc in docs]
+    docstore = InMemoryDocstore({
+        doc_id: Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata)
+        for doc_id, doc in zip(ids, docs)
+    })
+    vectorstore = FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+    build_info = {
+        "factory": factory,
+        "requested": requested_factory(settings),
+        "n_vectors": int(index.ntotal),
+        "dim": int(arr.shape[1]),
+        "search_params": params,
+        "build_s": round(time.perf_counter() - start, 3),
+        "built_at": datetime.now().isoformat(),
+    }
+    return vectorstore, build_info
+
+
+def needs_full_rebuild(build_info: dict, org_id: str, n_vectors: int) -> bool:
+    """After an incremental change: True if the org's size now calls for a different index type."""
+    build_info = build_info or {"factory": "Flat"}  # indexes built before build.json were always Flat
+    built = build_info.get("factory", "")
+    wanted = choose_index_factory(n_vectors, build_info.get("dim", 0), get_vector_settings(org_id))
+    # compare index families ("IVF,SQ" == "IVF,SQ"), not sizes; IVF lists are re-planned after 4x growth
+    if re.sub(r"\d+", "", wanted) != re.sub(r"\d+", "", built):
+        return True
+    return built.startswith("IVF") and n_vectors >= 4 * build_info.get("n_vectors", n_vectors)
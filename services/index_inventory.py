@@ -0,0 +1,232 @@
+# services/index_inventory.py
+"""
+State of every org's index, classified from vectorstores/ and pdf_files/ and
+kept in memory:
+
+    healthy    complete, readable index built from the current upload folder
+    stale      served, but source files or build settings changed since the build
+    orphaned   served, but there is no upload folder to rebuild it from
+    missing    no index (source files may be waiting to be indexed)
+    corrupt    the index directory is incomplete or unreadable, e.g. index.pkl
+               without index.faiss, or a docstore whose row count differs
+               from the number of vectors
+
+scan_inventory() runs at warm-up and on demand (/admin/vectorstores/inventory);
+an org's entry is refreshed after each publish, rollback and clear, and when
+loading its index fails. Requests for a missing or corrupt org then fail in
+check_servable() from memory instead of probing the directory and raising on
+every request; such an entry is re-checked on disk at most every
+INDEX_INVENTORY_RECHECK_S. Repairs (rebuild from the upload folder, or roll
+back to an older good generation) run as index jobs, see
+services/index_jobs.enqueue_repair_job.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import faiss
+from utils.constants import UPLOAD_BASE, VECTORSTORE_BASE, INDEX_INVENTORY_RECHECK_S
+from utils.logger import log_error
+from utils.metrics import index_inventory_orgs, index_unavailable_requests
+from services.columnar_docstore import HEADER_FILE
+from services.document_parser import list_source_files
+from services.index_io import (
+    INDEX_FILE,
+    MMAP_IO_FLAGS,
+    current_generation,
+    docstore_marker,
+    list_generations,
+    resolve_index_dir,
+)
+from services.index_manifest import org_needs_rebuild
+
+STATUSES = ("healthy", "stale", "orphaned", "missing", "corrupt")
+SERVABLE = frozenset(("healthy", "stale", "orphaned"))
+
+_inventory = {}  # org_id -> (time.monotonic() of the check, entry)
+_scanned_at = None
+_lock = threading.Lock()
+
+
+class IndexUnavailable(FileNotFoundError):
+    """The org has no servable index (a FileNotFoundError, so "no index" handling applies)."""
+
+
+def list_known_orgs() -> list:
+    """Org ids that have an upload folder or a vectorstore folder."""
+    orgs = set()
+    for base in (UPLOAD_BASE, VECTORSTORE_BASE):
+        if not os.path.isdir(base):
+            continue
+        for name in os.listdir(base):
+            if name.startswith("org_") and os.path.isdir(os.path.join(base, name)):
+                orgs.add(name.replace("org_", "", 1))
+    return sorted(orgs)
+
+
+def index_problem(index_dir: str, verify: bool = True):
+    """
+    None if `index_dir` holds a complete index, otherwise what is wrong with it.
+    With `verify`, index.faiss is also opened (memory-mapped, so vectors are not
+    read) and its size checked against the columnar docstore.
+    """
+    if not os.path.isdir(index_dir):
+        return "directory missing"
+    if not os.path.exists(os.path.join(index_dir, INDEX_FILE)):
+        return f"no {INDEX_FILE}"
+    marker = docstore_marker(index_dir)
+    if marker is None:
+        return "no docstore"
+    if not verify:
+        return None
+    try:
+        ntotal = faiss.read_index(os.path.join(index_dir, INDEX_FILE), MMAP_IO_FLAGS).ntotal
+    except Exception as e:
+        return f"{INDEX_FILE} unreadable: {e}"
+    if os.path.basename(marker) == HEADER_FILE:
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                count = json.load(f)["count"]
+        except (OSError, ValueError, KeyError) as e:
+            return f"docstore header unreadable: {e}"
+        if count != ntotal:
+            return f"docstore has {count} rows but {INDEX_FILE} has {ntotal} vectors"
+    return None
+
+
+def _rollback_target(org_dir: str, current, verify: bool):
+    # newest complete generation older than the broken one
+    for generation in reversed(list_generations(org_dir)):
+        if current and generation >= current:
+            continue
+        if index_problem(os.path.join(org_dir, generation), verify) is None:
+            return generation
+    return None
+
+
+def inspect_org(org_id: str, verify: bool = True) -> dict:
+    """Classify one org from disk (see the module docstring) and propose a repair."""
+    org_dir = os.path.join(VECTORSTORE_BASE, f"org_{org_id}")
+    upload_dir = os.path.join(UPLOAD_BASE, f"org_{org_id}")
+    sources = list_source_files(upload_dir)
+    generation = current_generation(org_dir)
+    repair, rollback_to = None, None
+
+    if not os.path.isdir(org_dir) or not os.listdir(org_dir):
+        status = "missing"
+        if sources:
+            reason, repair = f"{len(sources)} source file(s) and no index", "rebuild"
+        else:
+            reason = "no index and no source files"
+    else:
+        problem = index_problem(resolve_index_dir(org_dir), verify)
+        if problem:
+            status, reason = "corrupt", f"{generation}: {problem}" if generation else problem
+            if sources:
+                repair = "rebuild"
+            else:
+                rollback_to = _rollback_target(org_dir, generation, verify)
+                repair = "rollback" if rollback_to else None
+        elif not os.path.isdir(upload_dir):
+            status, reason = "orphaned", "no upload folder to rebuild from"
+        else:
+            try:
+                changed = org_needs_rebuild(org_id)
+            except Exception as e:
+                log_error(f"Index manifest check failed for org {org_id}: {e}")
+                changed = True
+            if changed:
+                status, reason, repair = "stale", "source files or build settings changed since the build", "rebuild"
+            else:
+                status, reason = "healthy", None
+
+    return {
+        "org_id": org_id,
+        "status": status,
+        "servable": status in SERVABLE,
+        "reason": reason,
+        "repair": repair,
+        "rollback_to": rollback_to,
+        "generation": generation,
+        "source_files": len(sources),
+        "checked_at": datetime.now().isoformat(),
+    }
+
+
+def _update_gauge() -> None:
+    # caller holds _lock
+    counts = dict.fromkeys(STATUSES, 0)
+    for _, entry in _inventory.values():
+        counts[entry["status"]] += 1
+    for status, n in counts.items():
+        index_inventory_orgs.labels(status=status).set(n)
+
+
+def refresh_org(org_id: str, verify: bool = True):
+    """Re-inspect one org and store the result; returns the entry (None if inspection failed)."""
+    try:
+        entry = inspect_org(org_id, verify)
+    except Exception as e:
+        log_error(f"Index inventory check failed for org {org_id}: {e}")
+        return None
+    with _lock:
+        _inventory[org_id] = (time.monotonic(), entry)
+        _update_gauge()
+    return entry
+
+
+def scan_inventory(verify: bool = True) -> dict:
+    """Inspect every known org, replace the inventory and return it (see get_inventory)."""
+    global _scanned_at
+    scanned = {}
+    for org_id in list_known_orgs():
+        try:
+            scanned[org_id] = (time.monotonic(), inspect_org(org_id, verify))
+        except Exception as e:
+            log_error(f"Index inventory check failed for org {org_id}: {e}")
+    with _lock:
+        _inventory.clear()
+        _inventory.update(scanned)
+        _scanned_at = datetime.now().isoformat()
+        _update_gauge()
+    inventory = get_inventory()
+    print(f"Index inventory: {inventory['counts']}")
+    return inventory
+
+
+def get_inventory() -> dict:
+    with _lock:
+        entries = [dict(entry) for _, entry in _inventory.values()]
+        scanned_at = _scanned_at
+    counts = dict.fromkeys(STATUSES, 0)
+    for entry in entries:
+        counts[entry["status"]] += 1
+    return {
+        "scanned_at": scanned_at,
+        "counts": counts,
+        "orgs": sorted(entries, key=lambda e: e["org_id"]),
+    }
+
+
+def repairable_orgs() -> list:
+    """Entries of the inventory that have a repair proposed."""
+    return [e for e in get_inventory()["orgs"] if e["repair"]]
+
+
+def check_servable(org_id: str) -> None:
+    """
+    Raise IndexUnavailable if the inventory knows the org has no servable index.
+    Orgs not in the inventory pass; loading them decides (and records a failure).
+    """
+    with _lock:
+        item = _inventory.get(org_id)
+    if item is None:
+        return
+    checked, entry = item
+    if not entry["servable"] and time.monotonic() - checked >= INDEX_INVENTORY_RECHECK_S:
+        entry = refresh_org(org_id) or entry
+    if entry["servable"]:
+        return
+    index_unavailable_requests.labels(status=entry["status"]).inc()
+    raise IndexUnavailable(f"No servable index for org {org_id} ({entry['status']}: {entry['reason']})")
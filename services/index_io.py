@@ -0,0 +1,317 @@
+# services/index_io.py
+"""
+Reading and writing one org's index directory, vectorstores/org_<id>/:
+    CURRENT            name of the generation being served
+    gen-<timestamp>/   one immutable build:
+        index.faiss    the FAISS index
+        docstore/      columnar docstore (services/columnar_docstore.py)
+        lexical/       BM25 inverted index of the same rows (services/lexical_index.py)
+        build.json     index type, size and query-time parameters of the build
+        manifest.json  source files the build was made from
+
+A new build is written into a fresh generation directory and published by
+atomically replacing CURRENT, so readers see either the old index or the new
+one, never a half-written directory. Older generations stay for rollback.
+Directories without CURRENT (the previous flat layout, possibly with a legacy
+pickled index.pkl) are still read in place.
+"""
+import json
+import os
+import pickle
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from services.columnar_docstore import (
+    DOCSTORE_DIR,
+    HEADER_FILE,
+    ColumnarDocstore,
+    RowIdMap,
+    export_rows,
+    write_columnar_docstore,
+)
+from services.lexical_index import LEXICAL_DIR, LexicalIndex, write_lexical_index
+
+try:
+    import fcntl
+except ImportError:  # Windows: file_lock only has the in-process locks of its callers behind it
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+STALE_PARTIAL_GENERATION_S = 3600  # unfinished generation dirs older than this are crash leftovers
+INDEX_FILE = "index.faiss"
+BUILD_INFO_FILE = "build.json"
+MANIFEST_FILE = "manifest.json"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+LOCK_DIR = ".locks"  # vectorstores/.locks/: outside the org dirs, which clear_vectorstore deletes
+
+# IO_FLAG_MMAP_IFC maps flat vector storage (faiss >= 1.10); older builds only map IVF lists
+MMAP_IO_FLAGS = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def current_generation(org_dir: str):
+    try:
+        with open(os.path.join(org_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def resolve_index_dir(org_dir: str) -> str:
+    """Directory holding the served index files: the CURRENT generation, or org_dir itself (flat layout)."""
+    generation = current_generation(org_dir)
+    return os.path.join(org_dir, generation) if generation else org_dir
+
+
+def _columnar_header(vectorstore_dir: str) -> str:
+    return os.path.join(vectorstore_dir, DOCSTORE_DIR, HEADER_FILE)
+
+
+def docstore_marker(vectorstore_dir: str):
+    """File whose presence marks a complete docstore (columnar preferred), or None."""
+    for path in (_columnar_header(vectorstore_dir), os.path.join(vectorstore_dir, LEGACY_DOCSTORE_FILE)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def index_files_present(vectorstore_dir: str) -> bool:
+    vectorstore_dir = resolve_index_dir(vectorstore_dir)
+    return os.path.exists(os.path.join(vectorstore_dir, INDEX_FILE)) and docstore_marker(vectorstore_dir) is not None
+
+
+def index_fingerprint(vectorstore_dir: str, mmap: bool):
+    """
+    (generation, resident_bytes) of the index on disk. The generation changes
+    whenever a new build is published. Memory-mapped files live in the shared
+    page cache and are not counted. Raises FileNotFoundError if incomplete.
+    """
+    generation = current_generation(vectorstore_dir)
+    vectorstore_dir = resolve_index_dir(vectorstore_dir)
+    marker = docstore_marker(vectorstore_dir)
+    if marker is None:
+        raise FileNotFoundError(f"No docstore in {vectorstore_dir}")
+    parts, size = [], 0
+    for path in (os.path.join(vectorstore_dir, INDEX_FILE), marker):
+        st = os.stat(path)
+        parts.append(f"{st.st_mtime_ns}-{st.st_size}")
+        if path.endswith(INDEX_FILE) and mmap:
+            continue
+        size += st.st_size
+    # generations are immutable, so their name identifies the content
+    return generation or ":".join(parts), size
+
+
+def read_build_info(vectorstore_dir: str):
+    try:
+        with open(os.path.join(resolve_index_dir(vectorstore_dir), BUILD_INFO_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # built before build.json existed: plain Flat index
+
+
+def apply_search_params(index, params: dict) -> None:
+    """Set query-time parameters such as efSearch (HNSW) or nprobe (IVF)."""
+    if params:
+        space = faiss.ParameterSpace()
+        for name, value in params.items():
+            space.set_index_parameter(index, name, value)
+
+
+def _to_writable(docstore: ColumnarDocstore):
+    ids, docs = [], {}
+    for row in range(len(docstore)):
+        doc = docstore.document(row)
+        ids.append(doc.id)
+        docs[doc.id] = doc
+    return InMemoryDocstore(docs), dict(enumerate(ids))
+
+
+def read_vectorstore(vectorstore_dir: str, embeddings, mmap: bool = False, writable: bool = False,
+                     prefer_columnar: bool = True):
+    """
+    Open an org index. With `mmap` index.faiss is mapped read-only; the columnar
+    docstore is always mapped unless `writable` asks for a mutable in-memory copy
+    (incremental updates). Legacy directories load the pickled index.pkl.
+    """
+    vectorstore_dir = resolve_index_dir(vectorstore_dir)
+    if mmap and not writable:
+        index = faiss.read_index(os.path.join(vectorstore_dir, INDEX_FILE), MMAP_IO_FLAGS)
+    else:
+        index = faiss.read_index(os.path.join(vectorstore_dir, INDEX_FILE))
+    apply_search_params(index, (read_build_info(vectorstore_dir) or {}).get("search_params"))
+
+    if prefer_columnar and os.path.exists(_columnar_header(vectorstore_dir)):
+        docstore = ColumnarDocstore(os.path.join(vectorstore_dir, DOCSTORE_DIR))
+        if docstore.count != index.ntotal:
+            raise ValueError(
+                f"{vectorstore_dir}: docstore has {docstore.count} rows, index has {index.ntotal} vectors"
+            )
+        if writable:
+            docstore, index_to_docstore_id = _to_writable(docstore)
+        else:
+            index_to_docstore_id = RowIdMap(docstore.count)
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    # our own files, written by FAISS.save_local before the columnar format existed
+    with open(os.path.join(vectorstore_dir, LEGACY_DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def write_docstore_for(vectorstore, vectorstore_dir: str) -> None:
+    """Write (or replace) only the columnar docstore of `vectorstore` into `vectorstore_dir`."""
+    tmp = os.path.join(vectorstore_dir, f".{DOCSTORE_DIR}-{os.getpid()}-{threading.get_ident()}")
+    ids, docs = export_rows(vectorstore)
+    write_columnar_docstore(tmp, ids, docs)
+    _swap_dir(tmp, os.path.join(vectorstore_dir, DOCSTORE_DIR))
+
+
+def _swap_dir(new_dir: str, target: str) -> None:
+    # two renames keep the window without a docstore tiny; open maps of the old
+    # files stay valid because unlinked inodes live until the last reader closes them
+    trash = f"{target}.old-{os.getpid()}-{threading.get_ident()}"
+    if os.path.exists(target):
+        os.replace(target, trash)
+    os.replace(new_dir, target)
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def write_vectorstore(vectorstore, vectorstore_dir: str, build_info: dict = None) -> None:
+    """Write index.faiss, the columnar docstore and (if given) build.json into a new, empty directory."""
+    os.makedirs(vectorstore_dir, exist_ok=False)
+    faiss.write_index(vectorstore.index, os.path.join(vectorstore_dir, INDEX_FILE))
+    ids, docs = export_rows(vectorstore)
+    write_columnar_docstore(os.path.join(vectorstore_dir, DOCSTORE_DIR), ids, docs)
+    write_lexical_index(os.path.join(vectorstore_dir, LEXICAL_DIR), [doc.page_content for doc in docs])
+    if build_info is not None:
+        with open(os.path.join(vectorstore_dir, BUILD_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump(build_info, f, indent=2)
+
+
+def open_lexical_index(vectorstore, vectorstore_dir: str):
+    """
+    The BM25 index of an opened generation (resolved dir). Directories written
+    before lexical indexes existed get one built from the docstore, once.
+    """
+    lexical = LexicalIndex.open(vectorstore_dir)
+    if lexical is None:
+        tmp = os.path.join(vectorstore_dir, f".{LEXICAL_DIR}-{os.getpid()}-{threading.get_ident()}")
+        _, docs = export_rows(vectorstore)
+        write_lexical_index(tmp, [doc.page_content for doc in docs])
+        try:
+            os.rename(tmp, os.path.join(vectorstore_dir, LEXICAL_DIR))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another worker got there first
+        lexical = LexicalIndex.open(vectorstore_dir)
+    if lexical.n_docs != vectorstore.index.ntotal:
+        raise ValueError(
+            f"{vectorstore_dir}: lexical index has {lexical.n_docs} rows, index has {vectorstore.index.ntotal} vectors"
+        )
+    return lexical
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    Exclusive lock held by one process of the host at a time (flock on `path`),
+    so uvicorn workers don't build or publish the same index concurrently.
+    Yields whether it was acquired; without `blocking` that is False when
+    another process holds it.
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def new_generation_dir(org_dir: str) -> str:
+    """Path for a new generation (not created yet); names sort by creation time."""
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return os.path.join(org_dir, f"{GENERATION_PREFIX}{stamp}-{os.getpid()}-{threading.get_ident()}")
+
+
+def list_generations(org_dir: str) -> list:
+    """Complete generations of an org, oldest first."""
+    if not os.path.isdir(org_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(org_dir)
+        if name.startswith(GENERATION_PREFIX) and index_files_present(os.path.join(org_dir, name))
+    )
+
+
+def activate_generation(org_dir: str, generation: str) -> None:
+    """Point CURRENT at `generation` with one atomic rename (publish and rollback)."""
+    if not index_files_present(os.path.join(org_dir, generation)):
+        raise FileNotFoundError(f"Generation {generation} of {org_dir} is missing or incomplete")
+    tmp_path = os.path.join(org_dir, f".{CURRENT_FILE}-{os.getpid()}-{threading.get_ident()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(org_dir, CURRENT_FILE))
+    _remove_flat_layout(org_dir)
+
+
+def _remove_flat_layout(org_dir: str) -> None:
+    # files of the pre-generation layout are dead once CURRENT exists
+    for name in (INDEX_FILE, LEGACY_DOCSTORE_FILE, BUILD_INFO_FILE, MANIFEST_FILE):
+        path = os.path.join(org_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(os.path.join(org_dir, DOCSTORE_DIR), ignore_errors=True)
+
+
+def prune_generations(org_dir: str, keep: int) -> list:
+    """
+    Delete all but the newest `keep` complete generations (never the current one)
+    and crash leftovers. Readers that still map files of a deleted generation are
+    unaffected: unlinked files live until their last map is closed.
+    """
+    current = current_generation(org_dir)
+    complete = list_generations(org_dir)
+    doomed = [g for g in complete[:max(len(complete) - keep, 0)] if g != current]
+    now = datetime.now().timestamp()
+    for name in os.listdir(org_dir):
+        path = os.path.join(org_dir, name)
+        if name.startswith(GENERATION_PREFIX) and name not in complete and name != current:
+            # could be a build in progress in another worker; only old ones are abandoned
+            if now - os.path.getmtime(path) > STALE_PARTIAL_GENERATION_S:
+                doomed.append(name)
+    for name in doomed:
+        shutil.rmtree(os.path.join(org_dir, name), ignore_errors=True)
+    return doomed
+
+
+def verify_same_results(expected, actual, probes: int = 20, k: int = 5) -> bool:
+    """Compare similarity_search_with_score_by_vector of two stores on random probe vectors."""
+    if expected.index.ntotal != actual.index.ntotal:
+        return False
+    if expected.index.ntotal == 0:
+        return True
+    rng = np.random.default_rng(0)
+    for _ in range(probes):
+        vector = rng.standard_normal(expected.index.d).astype(np.float32).tolist()
+        a = expected.similarity_search_with_score_by_vector(vector, k=k)
+        b = actual.similarity_search_with_score_by_vector(vector, k=k)
+        if [(d.page_content, d.metadata, float(s)) for d, s in a] != \
+                [(d.page_content, d.metadata, float(s)) for d, s in b]:
+            return False
+    return True
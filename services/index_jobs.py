@@ -0,0 +1,237 @@
+# services/index_jobs.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.constants import INDEX_JOB_WORKERS, INDEX_JOB_HISTORY, INCREMENTAL_INDEXING
+from utils.logger import log_error
+from utils.metrics import (
+    index_jobs_total,
+    index_job_uploads_coalesced,
+    index_job_queue_seconds,
+    index_job_run_seconds,
+    index_repairs_queued,
+)
+from services import file_service
+from services.mongo_client import index_jobs
+from services.index_inventory import repairable_orgs
+from services.vectorstore_loader import (
+    add_files_to_vectorstore,
+    remove_file_from_vectorstore,
+    retrain_for_files,
+    rollback_vectorstore,
+)
+from services.vectorstore_singleton import reload_vectorstore, invalidate_vectorstore
+
+# job_id -> job; finished jobs beyond INDEX_JOB_HISTORY are dropped oldest first
+_jobs = OrderedDict()
+_queued_by_org = {}  # org_id -> job_id of the org's job that has not started yet
+_active_orgs = set()  # orgs with a worker draining their queue; at most one per org
+_lock = threading.Lock()
+# Indexing runs here, never on the event loop; builds of one org are serialised by org_build_lock
+_executor = ThreadPoolExecutor(max_workers=INDEX_JOB_WORKERS, thread_name_prefix="index-job")
+
+
+def _snapshot(job: dict) -> dict:
+    # removed chunk ids stay in memory; the snapshot (and Mongo) lists file names only
+    return {**job, "files": list(job["files"]), "removed": list(job["removed"]), "chunks": dict(job["chunks"])}
+
+
+def _persist(job: dict) -> None:
+    # Mongo copy so any uvicorn worker can answer the status endpoint
+    try:
+        index_jobs.replace_one({"job_id": job["job_id"]}, job, upsert=True)
+    except Exception as e:
+        log_error(f"Could not persist index job {job['job_id']}: {e}")
+
+
+def enqueue_index_job(org_id: str, stored_filename: str) -> dict:
+    """
+    Queue indexing of an uploaded file and return the job. Each org has at most
+    one job running and one waiting; uploads arriving meanwhile join the waiting
+    job, so a burst of uploads is indexed (and published) once.
+    """
+    return _enqueue(org_id, "incremental" if INCREMENTAL_INDEXING else "full", stored_filename)
+
+
+def enqueue_delete_job(org_id: str, stored_filename: str, chunk_ids: list = None, files_left: bool = True) -> dict:
+    """
+    Queue removal of a deleted file's chunks (`chunk_ids` from its rag_files
+    document) and return the job. Joins the org's waiting job like an upload;
+    with no files left (`files_left`) the org is rebuilt from disk, which clears it.
+    """
+    mode = "incremental" if INCREMENTAL_INDEXING and files_left else "full"
+    return _enqueue(org_id, mode, removed_filename=stored_filename, chunk_ids=chunk_ids)
+
+
+def enqueue_repair_job(org_id: str, entry: dict) -> dict:
+    """
+    Queue the repair the index inventory proposed for an org (`entry` from
+    services/index_inventory.inspect_org): "rebuild" re-indexes the upload
+    folder, "rollback" serves the older good generation again. A job already
+    waiting for the org becomes a full rebuild, which repairs the index too.
+    """
+    index_repairs_queued.labels(action=entry["repair"]).inc()
+    if entry["repair"] == "rollback":
+        return _enqueue(org_id, "rollback", generation=entry["rollback_to"], reason=entry["reason"])
+    return _enqueue(org_id, "full", reason=entry["reason"])
+
+
+def queue_repairs(include_stale: bool = True) -> list:
+    """
+    Queue an index job for every org the inventory has a repair for; returns the
+    jobs. Without `include_stale` only orgs that can't be served are repaired.
+    """
+    jobs = []
+    for entry in repairable_orgs():
+        if entry["servable"] and not include_stale:
+            continue
+        try:
+            jobs.append(enqueue_repair_job(entry["org_id"], entry))
+        except Exception as e:
+            log_error(f"Could not queue index repair for org {entry['org_id']}: {e}")
+    return jobs
+
+
+def _enqueue(org_id: str, mode: str, stored_filename: str = None, generation: str = None,
+             reason: str = None, removed_filename: str = None, chunk_ids: list = None) -> dict:
+    with _lock:
+        job_id = _queued_by_org.get(org_id)
+        if job_id:
+            job = _jobs[job_id]
+            if job["mode"] != mode:
+                job["mode"] = "full"  # covers uploads and repairs alike
+            if stored_filename:
+                if stored_filename not in job["files"]:
+                    job["files"].append(stored_filename)
+                job["uploads"] += 1
+                index_job_uploads_coalesced.inc()
+            if removed_filename:
+                if removed_filename in job["files"]:
+                    job["files"].remove(removed_filename)  # deleted before it was indexed
+                else:
+                    job["removed"][removed_filename] = chunk_ids
+            job["reason"] = job["reason"] or reason
+            snapshot = _snapshot(job)
+            start_worker = False
+        else:
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "org_id": org_id,
+                "state": "queued",  # queued -> running -> succeeded | failed
+                "mode": mode,  # incremental | full | rollback
+                "files": [stored_filename] if stored_filename else [],
+                "uploads": 1 if stored_filename else 0,
+                "removed": {removed_filename: chunk_ids} if removed_filename else {},  # deleted file -> chunk ids
+                "generation": generation,  # rollback target
+                "reason": reason,  # why a repair was queued
+                "chunks": {},
+                "total_chunks": 0,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "queue_s": None,
+                "run_s": None,
+                "error": None,
+            }
+            _jobs[job["job_id"]] = job
+            _queued_by_org[org_id] = job["job_id"]
+            snapshot = _snapshot(job)
+            start_worker = org_id not in _active_orgs
+            _active_orgs.add(org_id)
+    _persist(snapshot)
+    if start_worker:
+        _executor.submit(_drain_org, org_id)
+    return snapshot
+
+
+def _drain_org(org_id: str) -> None:
+    """Run the org's waiting job until none is left."""
+    while True:
+        with _lock:
+            job_id = _queued_by_org.pop(org_id, None)  # later uploads start a new job
+            if job_id is None:
+                _active_orgs.discard(org_id)
+                return
+        _run_job(job_id)
+
+
+def _run_job(job_id: str) -> None:
+    with _lock:
+        job = _jobs[job_id]
+        org_id = job["org_id"]
+        job["state"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+        job["queue_s"] = round(
+            (datetime.fromisoformat(job["started_at"]) - datetime.fromisoformat(job["created_at"])).total_seconds(), 3
+        )
+        files = list(job["files"])
+        removed = dict(job["removed"])
+        mode = job["mode"]
+        snapshot = _snapshot(job)
+    _persist(snapshot)
+    index_job_queue_seconds.observe(snapshot["queue_s"])
+
+    start = time.perf_counter()
+    state, error, chunk_ids = "succeeded", None, {}
+    try:
+        if mode == "rollback":
+            rollback_vectorstore(org_id, job["generation"])
+        elif mode == "incremental":
+            # None: there was no index to remove from; rebuild it from the files left
+            missing = [name for name, ids in removed.items() if remove_file_from_vectorstore(org_id, name, ids) is None]
+            if files:
+                chunk_ids = add_files_to_vectorstore(org_id, files)
+            elif missing:
+                chunk_ids = retrain_for_files(org_id, [])
+        else:
+            chunk_ids = retrain_for_files(org_id, files)
+        for name, ids in chunk_ids.items():
+            file_service.set_file_chunk_ids(org_id, name, ids)
+        # load the new generation here so the first question after indexing doesn't pay for it
+        try:
+            reload_vectorstore(org_id)
+        except FileNotFoundError:
+            invalidate_vectorstore(org_id)  # nothing indexable in the org
+    except Exception as e:
+        log_error(f"Index job {job_id} (org {org_id}) failed: {e}")
+        state, error = "failed", str(e)
+    run_s = time.perf_counter() - start
+
+    with _lock:
+        job.update({
+            "state": state,
+            "error": error,
+            "chunks": {name: len(ids) for name, ids in chunk_ids.items()},
+            "total_chunks": sum(len(ids) for ids in chunk_ids.values()),
+            "finished_at": datetime.now().isoformat(),
+            "run_s": round(run_s, 3),
+        })
+        snapshot = _snapshot(job)
+        _trim_history()
+    _persist(snapshot)
+    index_jobs_total.labels(state=state).inc()
+    index_job_run_seconds.observe(run_s)
+    print(f"Index job {job_id} for org {org_id}: {state}, {snapshot['total_chunks']} chunks "
+          f"from {len(files)} file(s), {len(removed)} file(s) removed in {run_s:.2f}s")
+
+
+def _trim_history() -> None:
+    # caller holds _lock; queued and running jobs are never dropped
+    finished = [jid for jid, j in _jobs.items() if j["state"] in ("succeeded", "failed")]
+    for jid in finished[:max(len(finished) - INDEX_JOB_HISTORY, 0)]:
+        del _jobs[jid]
+
+
+def get_index_job(job_id: str):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            return _snapshot(job)
+    try:
+        return index_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    except Exception as e:
+        log_error(f"Could not read index job {job_id}: {e}")
+        return None
@@ -0,0 +1,118 @@
+# services/index_manifest.py
+import json
+import os
+from hashlib import sha256
+from datetime import datetime
+from utils.constants import (
+    UPLOAD_BASE,
+    VECTORSTORE_BASE,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMS,
+    CHUNK_DEDUPE_ENABLED,
+    CHUNK_DEDUPE_MAX_HAMMING,
+)
+from services.chunker import chunk_profile, profile_config
+from services.document_parser import list_source_files
+from services.index_builder import requested_factory
+from services.index_io import index_files_present, resolve_index_dir, MANIFEST_FILE
+from services.org_settings import get_vector_settings
+
+
+def org_chunk_profile(org_id: str):
+    """The chunk profile the org's index is built with (its `chunk_profile` setting or CHUNK_PROFILE)."""
+    return chunk_profile(get_vector_settings(org_id))
+
+
+def org_embedding_dims(org_id: str):
+    """Vector size of the org's next full build: `embedding_dims` setting, else EMBEDDING_DIMS; None = full size."""
+    return get_vector_settings(org_id).get("embedding_dims") or EMBEDDING_DIMS or None
+
+
+def build_config(org_id: str) -> dict:
+    """Settings that change the org's index contents or shape; a change forces a rebuild."""
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dims": org_embedding_dims(org_id),
+        "index_factory": requested_factory(get_vector_settings(org_id)),
+        **profile_config(org_chunk_profile(org_id)),
+        "dedupe_max_hamming": CHUNK_DEDUPE_MAX_HAMMING if CHUNK_DEDUPE_ENABLED else None,
+    }
+
+
+def file_sha256(path: str) -> str:
+    h = sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _manifest_path(org_id: str) -> str:
+    # the manifest belongs to the generation it describes
+    return os.path.join(resolve_index_dir(os.path.join(VECTORSTORE_BASE, f"org_{org_id}")), MANIFEST_FILE)
+
+
+def read_manifest(org_id: str):
+    try:
+        with open(_manifest_path(org_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(org_id: str, files: dict, directory: str) -> None:
+    """Write the manifest into `directory`, a generation being built; published generations are never rewritten."""
+    path = os.path.join(directory, MANIFEST_FILE)
+    manifest = {
+        "org_id": org_id,
+        "built_at": datetime.now().isoformat(),
+        "config": build_config(org_id),
+        "files": files,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def file_entry(path: str, previous: dict = None) -> dict:
+    """Hash entry for one source file; reuses the previous hash if size and mtime are unchanged."""
+    st = os.stat(path)
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return previous
+    return {"sha256": file_sha256(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def compute_source_files(org_id: str, previous: dict = None) -> dict:
+    """{stored_filename: {"sha256", "size", "mtime_ns"}} for every indexable file of the org."""
+    upload_dir = os.path.join(UPLOAD_BASE, f"org_{org_id}")
+    previous_files = (previous or {}).get("files", {})
+    return {
+        name: file_entry(os.path.join(upload_dir, name), previous_files.get(name))
+        for name in list_source_files(upload_dir)
+    }
+
+
+def index_is_complete(org_id: str) -> bool:
+    return index_files_present(os.path.join(VECTORSTORE_BASE, f"org_{org_id}"))
+
+
+def org_needs_rebuild(org_id: str) -> bool:
+    """
+    True when the org's index is missing, was built with different settings, or
+    its source files changed since the last build (compared by content hash).
+    """
+    if not os.path.isdir(os.path.join(UPLOAD_BASE, f"org_{org_id}")):
+        # index without an upload folder: left as-is, like the old batch retrain did
+        return False
+    manifest = read_manifest(org_id)
+    current = compute_source_files(org_id, manifest)
+    if not current:
+        # nothing to index; only an existing index needs clearing
+        return index_is_complete(org_id)
+    if not manifest or not index_is_complete(org_id):
+        return True
+    if manifest.get("config") != build_config(org_id):
+        return True
+    previous = {name: entry.get("sha256") for name, entry in manifest.get("files", {}).items()}
+    return previous != {name: entry["sha256"] for name, entry in current.items()}
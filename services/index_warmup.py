@@ -0,0 +1,150 @@
+# services/index_warmup.py
+import os
+import threading
+import time
+from datetime import datetime
+from utils.constants import (
+    VECTORSTORE_BASE,
+    INDEX_WARMUP_ENABLED,
+    INDEX_WARMUP_REBUILD,
+    INDEX_WARMUP_PRELOAD,
+    INDEX_AUTO_REPAIR,
+)
+from utils.logger import log_error
+from services.index_manifest import org_needs_rebuild
+from services.index_inventory import list_known_orgs, scan_inventory, get_inventory
+from services.index_io import LOCK_DIR, file_lock
+from services.index_jobs import queue_repairs
+from services.retrain_engine import retrain_orgs
+from services.vectorstore_singleton import get_vectorstore
+
+_state = {
+    "status": "idle",        # idle -> warming -> ready
+    "leader": None,          # this worker rebuilds and repairs; the others only load
+    "total": 0,
+    "done": 0,
+    "rebuilt": [],
+    "loaded": [],
+    "retrain_summary": None,
+    "failed": {},
+    "repairs_queued": [],
+    "started_at": None,
+    "finished_at": None,
+}
+_state_lock = threading.Lock()
+_thread = None
+# held by the one uvicorn worker that rebuilds changed orgs, so they are embedded and published once
+WARMUP_LOCK_PATH = os.path.join(VECTORSTORE_BASE, LOCK_DIR, "warmup.lock")
+
+
+def _rebuild_changed(orgs: list):
+    changed = []
+    for org_id in orgs:
+        try:
+            if org_needs_rebuild(org_id):
+                changed.append(org_id)
+        except Exception as e:
+            log_error(f"Index manifest check failed for org {org_id}: {e}")
+            changed.append(org_id)
+    if not changed:
+        return
+    print(f"Source files changed, rebuilding vectorstores for orgs: {changed}")
+    summary = retrain_orgs(changed)
+    with _state_lock:
+        _state["retrain_summary"] = {k: v for k, v in summary.items() if k != "orgs"}
+        _state["rebuilt"].extend(summary["succeeded"])
+        for org_id in summary["failed"]:
+            _state["failed"][org_id] = summary["orgs"][org_id]["error"]
+
+
+def _run_warmup():
+    start = time.perf_counter()
+    with file_lock(WARMUP_LOCK_PATH, blocking=False) as leader:
+        with _state_lock:
+            _state["leader"] = leader
+        _warm_up(leader)
+    print(f"Index warm-up finished in {time.perf_counter() - start:.1f}s: {get_warmup_state()}")
+
+
+def _warm_up(leader: bool):
+    orgs = list_known_orgs()
+    with _state_lock:
+        _state["total"] = len(orgs)
+    # first, so broken orgs fail fast while the rest warms up
+    try:
+        scan_inventory()
+    except Exception as e:
+        log_error(f"Index inventory scan failed: {e}")
+
+    if INDEX_WARMUP_REBUILD and leader:
+        try:
+            _rebuild_changed(orgs)
+        except Exception as e:
+            log_error(f"Index warm-up rebuild failed: {e}")
+
+    servable = {e["org_id"] for e in get_inventory()["orgs"] if e["servable"]}
+    for org_id in orgs:
+        try:
+            if INDEX_WARMUP_PRELOAD and org_id in servable:
+                get_vectorstore(org_id)
+                with _state_lock:
+                    _state["loaded"].append(org_id)
+        except Exception as e:
+            log_error(f"Index warm-up failed for org {org_id}: {e}")
+            with _state_lock:
+                _state["failed"][org_id] = str(e)
+        finally:
+            with _state_lock:
+                _state["done"] += 1
+
+    if INDEX_AUTO_REPAIR and leader:
+        # orgs still unservable after the rebuild above, e.g. corrupt ones with only an older good generation;
+        # stale orgs are left to INDEX_WARMUP_REBUILD
+        try:
+            scan_inventory()
+            jobs = queue_repairs(include_stale=False)
+            with _state_lock:
+                _state["repairs_queued"] = [job["org_id"] for job in jobs]
+        except Exception as e:
+            log_error(f"Index repair failed to start: {e}")
+
+    with _state_lock:
+        _state["status"] = "ready"
+        _state["finished_at"] = datetime.now().isoformat()
+
+
+def start_warmup():
+    """
+    Rebuild orgs whose sources changed (by manifest hash) and pre-load existing
+    indexes in a background thread, so the app starts serving immediately.
+    Only the worker holding WARMUP_LOCK_PATH rebuilds and queues repairs; the
+    other workers of the host load what is there and pick up the new
+    generations once published. Safe to call more than once; only the first
+    call starts the thread.
+    """
+    global _thread
+    with _state_lock:
+        if _thread is not None:
+            return
+        _state["status"] = "warming"
+        _state["started_at"] = datetime.now().isoformat()
+        _thread = threading.Thread(target=_run_warmup, name="index-warmup", daemon=True)
+    _thread.start()
+
+
+def get_warmup_state() -> dict:
+    with _state_lock:
+        return {
+            **_state,
+            "rebuilt": list(_state["rebuilt"]),
+            "loaded": list(_state["loaded"]),
+            "failed": dict(_state["failed"]),
+            "repairs_queued": list(_state["repairs_queued"]),
+        }
+
+
+def is_ready() -> bool:
+    if not INDEX_WARMUP_ENABLED:
+        return True  # indexes load lazily on first request
+    with _state_lock:
+        return _state["status"] == "ready"
@@ -0,0 +1,100 @@
+# services/ingest_pipeline.py
+"""
+Streaming ingestion: files -> pages -> chunks -> embedded batches.
+Pages of files parsed before come from the extracted-text cache (services/text_cache.py).
+
+Every stage is a generator. At any moment only a few pages (PAGE_TASKS_IN_FLIGHT
+extraction tasks), the chunk batches in flight to the embeddings API and the
+float32 vectors produced so far are held, instead of every page, a lowercased
+copy of it, every chunk and the vectors as Python float lists. What is left
+grows with the corpus only as the index itself does.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+from utils.constants import INGEST_PAGE_WORKERS, EMBED_BATCH_SIZE
+from utils.logger import log_error
+from services.document_parser import lowercase_pages, split_pages
+from services.text_cache import iter_cached_pages
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def get_page_pool():
+    """Shared process pool for PDF page extraction; None when INGEST_PAGE_WORKERS is 1 (read inline)."""
+    global _page_pool
+    if INGEST_PAGE_WORKERS <= 1:
+        return None
+    with _page_pool_lock:
+        if _page_pool is None:
+            # spawn: this runs in background threads of a uvicorn worker, where fork is unsafe
+            _page_pool = ProcessPoolExecutor(
+                max_workers=INGEST_PAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _page_pool
+
+
+def iter_source_chunks(upload_dir: str, filenames: list, pool=None, on_error=None, hashes: dict = None,
+                       profile=None):
+    """
+    Chunks of several files, file by file in the given order, split with chunk
+    `profile` (see split_pages). `hashes` maps filenames to known content
+    hashes (the manifest's) for the text cache. A file that can't be read is
+    logged and skipped (pages read before the error stay) and reported to
+    `on_error(filename, exc)`.
+    """
+    hashes = hashes or {}
+    for name in filenames:
+        try:
+            pages = iter_cached_pages(os.path.join(upload_dir, name), hashes.get(name), pool)
+            yield from split_pages(lowercase_pages(pages), name, profile)
+        except Exception as e:
+            print(f"❌ Error loading {name}: {e}")
+            log_error(f"❌ Error loading {name}: {e}")
+            if on_error is not None:
+                on_error(name, e)
+
+
+def batched(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_embedded_batches(chunks, embeddings, pool=None, max_in_flight: int = 1, batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Yield (chunk batch, float32 vectors) in order. With a thread `pool`, up to
+    `max_in_flight` embeddings requests run at once while the next batch is parsed.
+    """
+    if pool is None:
+        for batch in batched(chunks, batch_size):
+            yield batch, np.asarray(embeddings.embed_documents([d.page_content for d in batch]), dtype=np.float32)
+        return
+    pending = deque()
+    for batch in batched(chunks, batch_size):
+        if len(pending) >= max_in_flight:
+            done_batch, future = pending.popleft()
+            yield done_batch, np.asarray(future.result(), dtype=np.float32)
+        pending.append((batch, pool.submit(embeddings.embed_documents, [d.page_content for d in batch])))
+    while pending:
+        done_batch, future = pending.popleft()
+        yield done_batch, np.asarray(future.result(), dtype=np.float32)
+
+
+def embed_chunk_stream(chunks, embeddings, pool=None, max_in_flight: int = 1):
+    """Embed a chunk stream; returns (chunks, vectors) with vectors an (n, dim) float32 array."""
+    docs, parts = [], []
+    for batch, vectors in iter_embedded_batches(chunks, embeddings, pool, max_in_flight):
+        docs.extend(batch)
+        parts.append(vectors)
+    if not parts:
+        return docs, np.empty((0, 0), dtype=np.float32)
+    return docs, np.concatenate(parts)
@@ -0,0 +1,137 @@
+# services/lexical_index.py
+"""
+BM25 inverted index of an org's chunks, written into each index generation
+next to index.faiss:
+
+    lexical/
+        header.json        version, doc count, average length, k1 / b (written last)
+        terms.txt          vocabulary, one term per line, in term-id order
+        term_offsets.npy   int64[n_terms + 1]: postings of term t are [offsets[t], offsets[t+1])
+        postings_doc.npy   int32: row (= FAISS position) of each posting, ascending per term
+        postings_tf.npy    uint16: term frequency of each posting
+        doc_len.npy        int32[n_docs]: tokens per row
+
+Rows are FAISS positions, so a lexical hit maps to the same docstore entry as a
+vector hit. Exact names, scheme codes and ARN numbers that embeddings blur
+together score high here.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from utils.constants import BM25_K1, BM25_B
+
+LEXICAL_DIR = "lexical"
+HEADER_FILE = "header.json"
+FORMAT_VERSION = 1
+_TOKEN_RE = re.compile(r"\w+")
+# dropped from queries only: they match nearly every chunk and carry no signal
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or our please
+tell that the this to us was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def query_terms(text: str) -> list:
+    """Distinct non-stopword tokens of a query, in order."""
+    return list(dict.fromkeys(t for t in tokenize(text) if t not in STOPWORDS))
+
+
+def write_lexical_index(directory: str, texts: list) -> None:
+    """Build and write the index of `texts` (row i = FAISS position i) into a new directory."""
+    os.makedirs(directory, exist_ok=True)
+    postings = {}  # term -> ([rows], [tfs])
+    doc_len = np.zeros(len(texts), dtype=np.int32)
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len[row] = sum(counts.values())
+        for term, tf in counts.items():
+            rows, tfs = postings.setdefault(term, ([], []))
+            rows.append(row)
+            tfs.append(min(tf, 65535))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[t][0]) for t in terms])
+    postings_doc = np.fromiter((r for t in terms for r in postings[t][0]), dtype=np.int32, count=int(offsets[-1]))
+    postings_tf = np.fromiter((f for t in terms for f in postings[t][1]), dtype=np.uint16, count=int(offsets[-1]))
+
+    with open(os.path.join(directory, "terms.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+    np.save(os.path.join(directory, "term_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "postings_doc.npy"), postings_doc)
+    np.save(os.path.join(directory, "postings_tf.npy"), postings_tf)
+    np.save(os.path.join(directory, "doc_len.npy"), doc_len)
+    # header last: its presence marks a complete index
+    with open(os.path.join(directory, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "n_docs": len(texts),
+            "n_terms": len(terms),
+            "avgdl": float(doc_len.mean()) if len(texts) else 0.0,
+            "k1": BM25_K1,
+            "b": BM25_B,
+        }, f)
+
+
+class LexicalIndex:
+    """Read-only BM25 index; postings are memory-mapped, the vocabulary is a dict."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, HEADER_FILE), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version {self.header.get('version')} in {directory}")
+        with open(os.path.join(directory, "terms.txt"), "r", encoding="utf-8") as f:
+            text = f.read()
+        self.vocab = {term: i for i, term in enumerate(text.split("\n"))} if text else {}
+        self.offsets = np.load(os.path.join(directory, "term_offsets.npy"), mmap_mode="r")
+        self.postings_doc = np.load(os.path.join(directory, "postings_doc.npy"), mmap_mode="r")
+        self.postings_tf = np.load(os.path.join(directory, "postings_tf.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(directory, "doc_len.npy"), mmap_mode="r")
+        self.n_docs = self.header["n_docs"]
+        self.k1, self.b = self.header["k1"], self.header["b"]
+        avgdl = self.header["avgdl"] or 1.0
+        # per-row length normalisation of BM25, computed once
+        self._norm = (self.k1 * (1 - self.b + self.b * np.asarray(self.doc_len, dtype=np.float32) / avgdl))
+
+    @classmethod
+    def open(cls, vectorstore_dir: str):
+        """The index of a generation directory, or None if it was built before lexical indexes existed."""
+        directory = os.path.join(vectorstore_dir, LEXICAL_DIR)
+        if not os.path.exists(os.path.join(directory, HEADER_FILE)):
+            return None
+        return cls(directory)
+
+    def resident_bytes(self) -> int:
+        # postings are mapped from the page cache; the vocabulary dict and norms are private
+        return int(self._norm.nbytes + 100 * len(self.vocab))
+
+    def search(self, query: str, k: int) -> list:
+        """
+        [(row, score, matched_terms)] of the k best rows, best first. matched_terms
+        counts how many of the query's (non-stopword) terms the row contains.
+        """
+        terms = [self.vocab[t] for t in query_terms(query) if t in self.vocab]
+        if not terms or not self.n_docs:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.int16)
+        for t in terms:
+            start, end = int(self.offsets[t]), int(self.offsets[t + 1])
+            rows = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            idf = math.log(1 + (self.n_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+            matched[rows] += 1
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(r), float(scores[r]), int(matched[r])) for r in candidates]
@@ -1,4 +1,5 @@
 # this is my # services/llm/graph.py
+from functools import lru_cache
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
@@ -6,7 +7,9 @@ from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from services.llm.runtime_state import get_runtime
 from services.llm.tools import TOOLS
+from utils.constants import LLM_CLIENT_CACHE_SIZE
 import os
 from dotenv import load_dotenv
 
@@ -16,16 +19,43 @@ OPENAI_KEYS = os.getenv("OPENAI_KEYS_Demo", "[]")
 memory = MemorySaver()
 
 
+@lru_cache(maxsize=LLM_CLIENT_CACHE_SIZE)
+def tool_model(openai_key: str):
+    """The agent model bound to TOOLS for one OpenAI key; client and tool schemas are built once per key."""
+    llm = ChatOpenAI(
+        model="gpt-4.1-mini",
+        temperature=0,
+        api_key=openai_key,
+        output_version="responses/v1",
+    )
+    return llm.bind_tools(TOOLS)
+
+
+@lru_cache(maxsize=1)
+def summary_model():
+    return ChatOpenAI(
+        model="gpt-4.1-mini",
+        temperature=0,
+        api_key=OPENAI_KEYS,
+    )
+
+
 class GraphState(TypedDict):
     messages: Annotated[list, add_messages]
 
 
-def build_llm_graph(llm_with_tools):
+def build_llm_graph(llm_with_tools=None):
+    """
+    Compile the agent graph. Without `llm_with_tools` the llm node uses
+    tool_model() of the OpenAI key in the request's runtime state (set_runtime),
+    so one compiled graph serves every request; see get_llm_graph().
+    """
     # -----------------------------
     # NODE: main LLM
     # -----------------------------
     def llm_node(state: GraphState):
-        return {"messages": [llm_with_tools.invoke(state["messages"])]}
+        llm = llm_with_tools or tool_model(get_runtime()["openai_key"])
+        return {"messages": [llm.invoke(state["messages"])]}
 
     # -----------------------------
     # NODE: summarizer (≤100 words)
@@ -48,11 +78,7 @@ def build_llm_graph(llm_with_tools):
         elif not isinstance(content, str):
             content = str(content)
 
-        summarizer = ChatOpenAI(
-            model="gpt-4.1-mini",
-            temperature=0,
-            api_key=OPENAI_KEYS,
-        )
+        summarizer = summary_model()
 
         summary_prompt = [
             SystemMessage(
@@ -139,6 +165,12 @@ def build_llm_graph(llm_with_tools):
 
     return graph_new
 
+
+@lru_cache(maxsize=1)
+def get_llm_graph():
+    """The agent graph, compiled once per process; conversations are kept per thread_id in `memory`."""
+    return build_llm_graph()
+
 # The above code is a Python script that defines a graph structure for a language model (LLM) with
 # tools. Here is a summary of what the code does:
 
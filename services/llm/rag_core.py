@@ -5,7 +5,7 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import pytz
 
-from services.vectorstore_singleton import get_retriever
+from services.retrieval import retrieve
 from services.feedback_service import get_org_id_by_session_robot_test
 from services.llm.runtime_state import require_runtime, get_runtime
 from utils.helpers import get_user_info_prompt
@@ -32,8 +32,7 @@ def rag_answer(question: str) -> str:
         raise ValueError("Session not initialized or expired, no OpenAI key assigned. Please re-authenticate.")
 
     org_id = rt["org_id"] or get_org_id_by_session_robot_test(session_id)
-    retriever = get_retriever(org_id)
-    docs = retriever.invoke(question)
+    docs = retrieve(org_id, question)
     context = "\n".join(doc.page_content for doc in docs)
     ist = pytz.timezone("Asia/Kolkata")
     ist_time = datetime.now(ist)
@@ -1,6 +1,5 @@
 from dotenv import load_dotenv
 import openai
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from services.feedback_service import get_org_id_by_session_robot_test
 from services.fundpilot_prompt import prompt, Nyla_Prompt
@@ -11,8 +10,7 @@ import pytz
 from datetime import datetime
 import time
 from services.llm.runtime_state import set_runtime
-from services.llm.tools import TOOLS
-from services.llm.graph import build_llm_graph
+from services.llm.graph import get_llm_graph
 
 load_dotenv()
 
@@ -191,15 +189,8 @@ async def robot_ask_llm(session_id, question, user_info=None, openai_key=None):
    org_id = get_org_id_by_session_robot_test(session_id)
    set_runtime(session_id=session_id, org_id=org_id, openai_key=openai_key, user_info=user_info)
 
-   # LLM setup
-   llm = ChatOpenAI(
-      model="gpt-4.1-mini",
-      temperature=0,
-      api_key=openai_key,
-      output_version="responses/v1",
-   )
-   llm_with_tools = llm.bind_tools(TOOLS)
-   graph = build_llm_graph(llm_with_tools)
+   # Compiled once per process; the llm node takes the OpenAI key from the runtime state
+   graph = get_llm_graph()
 
    # State management
    config = {"configurable": {"thread_id": session_id}}
@@ -24,6 +24,7 @@ tokenValidations = db["tokenValidations"]
 tokenValidationsUser = db["tokenValidationsUser"]
 superAdmin = db["superAdmin"]
 face_images = db["face_images"]
+index_jobs = db["index_jobs"]
 
 
 """ Check session Id is present in rag"""
@@ -0,0 +1,101 @@
+# services/org_settings.py
+import threading
+import time
+from bson import ObjectId
+from utils.constants import ORG_SETTINGS_TTL_S
+from utils.logger import log_error
+from services.mongo_client import org_collection
+from services.rerank import RERANK_METHODS
+from services.chunker import CHUNK_PROFILES
+
+# Per-org vector index and retrieval settings, stored on the organization document as `vector_settings`.
+# Unset keys fall back to the global defaults in utils/constants.py.
+VECTOR_SETTING_TYPES = {
+    "index_factory": str,    # "auto" or a faiss.index_factory string, e.g. "HNSW32", "IVF{nlist},PQ{pq_m}"
+    "hnsw_ef_search": int,
+    "ivf_nprobe": int,
+    "retrieval_k": int,      # chunks handed to the LLM
+    "rerank": str,           # one of RERANK_METHODS
+    "mmr_lambda": float,
+    "merge_adjacent": bool,
+    "embedding_dims": int,   # stored vector size, e.g. 512 of text-embedding-3-small's 1536; next full rebuild
+    "use_global_kb": bool,   # also search the shared knowledge base (services/global_kb.py)
+    "chunk_profile": str,    # one of CHUNK_PROFILES (services/chunker.py); next full rebuild
+    "chunk_tokens": int,     # chunk size of a token profile
+    "chunk_overlap_tokens": int,
+}
+
+_cache = {}  # org_id -> (expires_at, settings)
+_cache_lock = threading.Lock()
+
+
+def get_vector_settings(org_id: str) -> dict:
+    """The org's `vector_settings`, cached for ORG_SETTINGS_TTL_S; {} if unset or unreadable."""
+    if not ObjectId.is_valid(org_id):
+        return {}  # not an organization document, e.g. the shared knowledge base
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(org_id)
+        if entry and entry[0] > now:
+            return dict(entry[1])
+
+    try:
+        doc = org_collection.find_one({"_id": ObjectId(org_id)}, {"vector_settings": 1})
+        settings = (doc or {}).get("vector_settings") or {}
+    except Exception as e:
+        # index builds must not fail on a settings lookup; cache the miss so we don't retry per call
+        log_error(f"Could not read vector settings for org {org_id}: {e}")
+        settings = {}
+
+    with _cache_lock:
+        _cache[org_id] = (now + ORG_SETTINGS_TTL_S, settings)
+    return dict(settings)
+
+
+def validate_vector_settings(updates: dict) -> dict:
+    """Raises ValueError on unknown keys or wrong types; None values mean "unset"."""
+    clean = {}
+    for key, value in updates.items():
+        if key not in VECTOR_SETTING_TYPES:
+            raise ValueError(f"Unknown vector setting: {key}")
+        if value is not None and not isinstance(value, VECTOR_SETTING_TYPES[key]):
+            raise ValueError(f"{key} must be {VECTOR_SETTING_TYPES[key].__name__}")
+        if key == "rerank" and value is not None and value not in RERANK_METHODS:
+            raise ValueError(f"rerank must be one of {', '.join(RERANK_METHODS)}")
+        if key == "mmr_lambda" and value is not None and not 0 <= value <= 1:
+            raise ValueError("mmr_lambda must be between 0 and 1")
+        if key == "embedding_dims" and value is not None and value < 1:
+            raise ValueError("embedding_dims must be at least 1")
+        if key == "retrieval_k" and value is not None and value < 1:
+            raise ValueError("retrieval_k must be at least 1")
+        if key == "chunk_profile" and value is not None and value not in CHUNK_PROFILES:
+            raise ValueError(f"chunk_profile must be one of {', '.join(CHUNK_PROFILES)}")
+        if key == "chunk_tokens" and value is not None and value < 32:
+            raise ValueError("chunk_tokens must be at least 32")
+        if key == "chunk_overlap_tokens" and value is not None and value < 0:
+            raise ValueError("chunk_overlap_tokens must not be negative")
+        clean[key] = value
+    return clean
+
+
+def set_vector_settings(org_id: str, updates: dict) -> dict:
+    """Merge `updates` into the org's settings (None unsets a key) and return the result."""
+    clean = validate_vector_settings(updates)
+    to_set = {f"vector_settings.{k}": v for k, v in clean.items() if v is not None}
+    to_unset = {f"vector_settings.{k}": "" for k, v in clean.items() if v is None}
+    update = {}
+    if to_set:
+        update["$set"] = to_set
+    if to_unset:
+        update["$unset"] = to_unset
+    if update:
+        result = org_collection.update_one({"_id": ObjectId(org_id)}, update)
+        if result.matched_count == 0:
+            raise LookupError(f"Organization {org_id} not found")
+    invalidate_vector_settings(org_id)
+    return get_vector_settings(org_id)
+
+
+def invalidate_vector_settings(org_id: str) -> None:
+    with _cache_lock:
+        _cache.pop(org_id, None)
@@ -0,0 +1,101 @@
+# services/query_embedder.py
+"""
+Micro-batching for query embeddings.
+
+Every /rag/ask used to send its own one-input embeddings request. Here,
+embed_query calls arriving within QUERY_EMBED_MAX_WAIT_MS of the first waiting
+one are sent as a single request of up to QUERY_EMBED_MAX_BATCH inputs, and the
+vectors are handed back to each caller. A query already waiting or in flight
+is not sent twice; later callers share its result.
+
+A dispatcher thread forms the batches and up to QUERY_EMBED_CONCURRENCY
+requests run at once, so a slow request doesn't hold up the next batch.
+Chunk embedding (embed_documents) is passed straight through.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from utils.constants import QUERY_EMBED_MAX_BATCH, QUERY_EMBED_MAX_WAIT_MS, QUERY_EMBED_CONCURRENCY
+from utils.metrics import query_embed_batch_size, query_embed_queue_seconds, query_embed_coalesced
+
+
+class QueryEmbeddingBatcher(Embeddings):
+
+    def __init__(self, underlying: Embeddings, max_batch: int = QUERY_EMBED_MAX_BATCH,
+                 max_wait_ms: float = QUERY_EMBED_MAX_WAIT_MS, concurrency: int = QUERY_EMBED_CONCURRENCY):
+        self.underlying = underlying
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.enabled = max_batch > 1 and max_wait_ms > 0
+        self._cond = threading.Condition()
+        self._pending = deque()  # (text, enqueued_at), oldest first
+        self._futures = {}       # text -> Future, from enqueue until the result is set
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="query-embed")
+        self._dispatcher = None
+
+    def submit(self, text: str) -> Future:
+        """Future of the vector of `text`, shared with other callers waiting for the same text."""
+        with self._cond:
+            future = self._futures.get(text)
+            if future is not None:
+                query_embed_coalesced.inc()
+                return future
+            future = self._futures[text] = Future()
+            self._pending.append((text, time.perf_counter()))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="query-embed-batcher", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+        return future
+
+    def embed_query(self, text: str) -> list:
+        if not self.enabled:
+            return self.underlying.embed_query(text)
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> list:
+        if not self.enabled:
+            return await self.underlying.aembed_query(text)
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_documents(self, texts: list) -> list:
+        return self.underlying.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list) -> list:
+        return await self.underlying.aembed_documents(texts)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # wait for company until the oldest query has waited max_wait_s or the batch is full
+                deadline = self._pending[0][1] + self.max_wait_s
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            now = time.perf_counter()
+            for _, enqueued_at in batch:
+                query_embed_queue_seconds.observe(now - enqueued_at)
+            query_embed_batch_size.observe(len(batch))
+            self._executor.submit(self._embed_batch, [text for text, _ in batch])
+
+    def _embed_batch(self, texts: list):
+        try:
+            vectors = self.underlying.embed_documents(texts)
+            error = None
+        except Exception as e:
+            vectors, error = None, e
+        with self._cond:
+            futures = [self._futures.pop(text) for text in texts]
+        for i, future in enumerate(futures):
+            if error is None:
+                future.set_result(vectors[i])
+            else:
+                future.set_exception(error)
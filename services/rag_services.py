@@ -2,7 +2,7 @@ from datetime import datetime
 from services.llm_model import ask_llm, robot_ask_llm
 from services.mongo_client import unique_question
 from utils.constants import SIMILARITY_THRESHOLD, BUFFER_SIZE
-from services.vectorstore_singleton import get_retriever
+from services.retrieval import retrieve_with_vectors
 from utils.helpers import similarity_score
 from utils.logger import log_error,log_data_dict
 from utils.key_manager import get_key_for_session, assign_key_to_session
@@ -10,6 +10,7 @@ from dotenv import load_dotenv
 import os
 import time
 from threading import Thread
+from starlette.concurrency import run_in_threadpool
 from services.org_service import get_unique_message_id,get_org_collection_name_from_session,async_get_org_collection_name_from_session
 from services.feedback_service import get_org_id_by_session, get_org_id_by_session_robot_test
 from utils.helpers import normalize_question
@@ -90,8 +91,10 @@ async def robot_rag_ask(session_id, question, user_info=None):
 
 async def rag_ask(session_id, question, user_info=None):
     org_id = get_org_id_by_session(session_id) # Implement this lookup
-    retriever = get_retriever(org_id)
-    docs = retriever.invoke(question)  # get relevant documents from the retriever
+    # get relevant documents (hybrid lexical + vector search); off the event loop so
+    # concurrent requests can share a query embeddings request
+    retrieval = await run_in_threadpool(retrieve_with_vectors, org_id, question)
+    docs = retrieval.docs
 
     context = "\n".join(doc.page_content for doc in docs) # context that the model will see
     # print(context)
@@ -127,7 +130,7 @@ async def rag_ask(session_id, question, user_info=None):
     answer = await ask_llm(context, chat_history, question, user_info=user_info, openai_key=openai_key) # get the answer from the model
     # print(answer)
 
-    similarity = similarity_score(question, context,org_id) # calculate the similarity score between the question and the context
+    similarity = similarity_score(retrieval.query_vector, retrieval.chunk_vectors) # similarity between the question and the retrieved chunks
     message_id = await get_unique_message_id()
     
     rag_log = {
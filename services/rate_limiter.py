@@ -0,0 +1,69 @@
+# services/rate_limiter.py
+import threading
+import time
+from functools import lru_cache
+from langchain_core.embeddings import Embeddings
+from utils.constants import EMBED_REQUESTS_PER_MIN, EMBED_TOKENS_PER_MIN
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for rate limiting
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter enforcing requests/min and tokens/min together.
+    acquire() blocks the calling thread until both buckets have room.
+    """
+
+    def __init__(self, requests_per_min: int, tokens_per_min: int):
+        self.capacity = {"requests": float(requests_per_min), "tokens": float(tokens_per_min)}
+        self.available = dict(self.capacity)
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for key, cap in self.capacity.items():
+            self.available[key] = min(cap, self.available[key] + cap * elapsed / 60.0)
+
+    def acquire(self, tokens: int = 0):
+        # a single batch larger than the per-minute budget waits for a full bucket
+        tokens = min(float(tokens), self.capacity["tokens"])
+        with self._cond:
+            while True:
+                self._refill()
+                if self.available["requests"] >= 1 and self.available["tokens"] >= tokens:
+                    self.available["requests"] -= 1
+                    self.available["tokens"] -= tokens
+                    return
+                wait = max(
+                    (1 - self.available["requests"]) * 60.0 / self.capacity["requests"],
+                    (tokens - self.available["tokens"]) * 60.0 / self.capacity["tokens"],
+                    0.01,
+                )
+                self._cond.wait(wait)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every index build."""
+    return RateLimiter(EMBED_REQUESTS_PER_MIN, EMBED_TOKENS_PER_MIN)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Passes embed_documents calls through the shared limiter before they reach the API."""
+
+    def __init__(self, underlying: Embeddings, limiter: RateLimiter = None):
+        self.underlying = underlying
+        self.limiter = limiter or get_embedding_rate_limiter()
+
+    def embed_documents(self, texts: list) -> list:
+        self.limiter.acquire(sum(estimate_tokens(t) for t in texts))
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.underlying.embed_query(text)
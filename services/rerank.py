@@ -0,0 +1,104 @@
+# services/rerank.py
+"""
+Reranking of retrieval candidates, from the vectors already in the index:
+
+    mmr_select       maximal marginal relevance: each pick maximises
+                     lambda * sim(query, c) - (1 - lambda) * max sim(c, picked),
+                     so near-copies of a chunk already picked lose to new content
+    merge_adjacent   consecutive chunks of the same page become one document,
+                     with the splitter's overlap between them removed
+
+With 300-character chunks, the top three results are often neighbours on one
+page; merging them hands the LLM the passage once instead of three overlapping
+fragments.
+"""
+import numpy as np
+from langchain.docstore.document import Document
+from services.document_parser import CHUNK_OVERLAP
+
+RERANK_METHODS = ("none", "mmr")
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(query_vector, candidate_vectors, k: int, lambda_mult: float, first: int = None) -> list:
+    """
+    Indices into `candidate_vectors` of the k MMR picks, in pick order.
+    `first` forces the first pick (e.g. the fused ranking's top hit).
+    """
+    candidates = _unit_rows(candidate_vectors)
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    relevance = candidates @ _unit_rows(query_vector)
+    similarity = candidates @ candidates.T
+    picked = [int(np.argmax(relevance)) if first is None else first]
+    max_sim = similarity[picked[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[picked[0]] = False
+    while len(picked) < min(k, n):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * max_sim, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+    return picked
+
+
+def _join(left: str, right: str, overlap: int = None) -> str:
+    # token chunks record how many characters of `left` they repeat (`overlap` metadata);
+    # the character splitter repeats up to CHUNK_OVERLAP characters of `left` at the start of `right`
+    if overlap is not None:
+        if overlap and left.endswith(right[:overlap]):
+            return left + right[overlap:]
+        return f"{left} {right}"
+    for n in range(min(len(left), len(right), CHUNK_OVERLAP), 0, -1):
+        if left.endswith(right[:n]):
+            return left + right[n:]
+    return f"{left} {right}"
+
+
+def merge_adjacent(docs: list) -> list:
+    """
+    Merge chunks that follow each other in the same file and page. A merged
+    document takes the rank of its best-ranked part and the metadata of its first.
+    """
+    def position(doc):
+        meta = doc.metadata
+        return meta.get("source_file"), meta.get("page"), meta.get("chunk_index")
+
+    groups = []  # [[rank, [docs in chunk order]]]
+    by_key = {}
+    for rank, doc in enumerate(docs):
+        source, page, index = position(doc)
+        if source is None or index is None:
+            groups.append([rank, [doc]])
+            continue
+        by_key.setdefault((source, page), []).append((index, rank, doc))
+    for parts in by_key.values():
+        parts.sort(key=lambda p: p[0])
+        run = [parts[0]]
+        for part in parts[1:]:
+            if part[0] == run[-1][0] + 1:
+                run.append(part)
+            else:
+                groups.append([min(p[1] for p in run), [p[2] for p in run]])
+                run = [part]
+        groups.append([min(p[1] for p in run), [p[2] for p in run]])
+
+    merged = []
+    for _, parts in sorted(groups, key=lambda g: g[0]):
+        if len(parts) == 1:
+            merged.append(parts[0])
+            continue
+        text = parts[0].page_content
+        for part in parts[1:]:
+            text = _join(text, part.page_content, part.metadata.get("overlap"))
+        metadata = dict(parts[0].metadata)
+        metadata["merged_chunk_ids"] = [p.metadata.get("chunk_id") for p in parts]
+        merged.append(Document(page_content=text, metadata=metadata))
+    return merged
@@ -0,0 +1,123 @@
+# services/retrain_engine.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from utils.constants import (
+    UPLOAD_BASE,
+    RETRAIN_PARSE_WORKERS,
+    RETRAIN_ORG_CONCURRENCY,
+    EMBED_CONCURRENCY,
+)
+from utils.logger import log_error
+from services.ingest_pipeline import iter_source_chunks, embed_chunk_stream
+from services.text_cache import prune_text_cache
+from services.chunk_dedupe import ChunkDeduper
+from services.index_manifest import read_manifest, compute_source_files, org_chunk_profile, org_embedding_dims
+from services.index_builder import build_vectorstore
+from services.vectorstore_loader import (
+    org_build_lock,
+    get_indexing_embeddings,
+    clear_vectorstore,
+    publish_vectorstore,
+)
+
+
+def build_org(org_id: str, parse_pool, embed_pool) -> dict:
+    """Rebuild one org's index; never raises, the outcome is in the returned report."""
+    report = {
+        "org_id": org_id,
+        "status": "ok",
+        "files": 0,
+        "chunks": 0,
+        "duplicates_dropped": 0,
+        "ingest_s": 0.0,
+        "index_s": 0.0,
+        "total_s": 0.0,
+        "index_factory": None,
+        "file_errors": {},
+        "error": None,
+    }
+
+    def file_failed(name: str, e: Exception):
+        report["file_errors"][name] = str(e)
+
+    start = time.perf_counter()
+    try:
+        with org_build_lock(org_id):
+            upload_dir = os.path.join(UPLOAD_BASE, f"org_{org_id}")
+            if not os.path.isdir(upload_dir):
+                clear_vectorstore(org_id)
+                report["status"] = "empty"
+                return report
+
+            source_files = compute_source_files(org_id, read_manifest(org_id))
+            report["files"] = len(source_files)
+
+            # PDF pages are extracted on the process pool while earlier batches are embedded;
+            # parsing, splitting and embedding overlap, so they share one timing
+            t = time.perf_counter()
+            hashes = {name: entry["sha256"] for name, entry in source_files.items()}
+            chunks = iter_source_chunks(upload_dir, source_files, parse_pool, on_error=file_failed, hashes=hashes,
+                                        profile=org_chunk_profile(org_id))
+            embeddings = get_indexing_embeddings(org_embedding_dims(org_id))
+            deduper = ChunkDeduper()
+            chunks, vectors = embed_chunk_stream(deduper.filter(chunks), embeddings, embed_pool, EMBED_CONCURRENCY)
+            report["ingest_s"] = round(time.perf_counter() - t, 3)
+            report["chunks"] = len(chunks)
+            report["duplicates_dropped"] = deduper.summary()["dropped"]
+            if not chunks:
+                clear_vectorstore(org_id)
+                report["status"] = "empty"
+                return report
+
+            t = time.perf_counter()
+            vectorstore, build_info = build_vectorstore(org_id, chunks, vectors, embeddings)
+            build_info["dedupe"] = deduper.summary()
+            report["index_factory"] = build_info["factory"]
+            publish_vectorstore(org_id, vectorstore, source_files, build_info=build_info)
+            prune_text_cache(upload_dir, hashes.values())
+            report["index_s"] = round(time.perf_counter() - t, 3)
+    except Exception as e:
+        log_error(f"❌ Error retraining org {org_id}: {e}")
+        report["status"] = "failed"
+        report["error"] = str(e)
+    finally:
+        report["total_s"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def retrain_orgs(org_ids: list) -> dict:
+    """
+    Rebuild several orgs concurrently. PDF pages are extracted in a process pool,
+    embedding batches run on a bounded thread pool under the global
+    requests/tokens per minute limit, and each org is built and published on
+    its own, so one slow or failing org does not hold up the rest.
+    """
+    started_at = datetime.now().isoformat()
+    start = time.perf_counter()
+    reports = {}
+    if org_ids:
+        # spawn: this may run from a background thread of a uvicorn worker, where fork is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=RETRAIN_PARSE_WORKERS, mp_context=ctx) as parse_pool, \
+                ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed") as embed_pool, \
+                ThreadPoolExecutor(max_workers=RETRAIN_ORG_CONCURRENCY, thread_name_prefix="retrain") as org_pool:
+            futures = {org_pool.submit(build_org, org_id, parse_pool, embed_pool): org_id for org_id in org_ids}
+            for future in as_completed(futures):
+                report = future.result()
+                reports[report["org_id"]] = report
+                print(f"Retrain {report['org_id']}: {report['status']} "
+                      f"({report['chunks']} chunks, {report['total_s']}s)")
+
+    summary = {
+        "started_at": started_at,
+        "finished_at": datetime.now().isoformat(),
+        "total_s": round(time.perf_counter() - start, 3),
+        "succeeded": sorted(o for o, r in reports.items() if r["status"] == "ok"),
+        "empty": sorted(o for o, r in reports.items() if r["status"] == "empty"),
+        "failed": sorted(o for o, r in reports.items() if r["status"] == "failed"),
+        "orgs": reports,
+    }
+    return summary
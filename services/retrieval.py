@@ -0,0 +1,268 @@
+# services/retrieval.py
+"""
+Hybrid retrieval: BM25 over the org's lexical index and FAISS similarity,
+fused with reciprocal rank fusion (RRF).
+
+Both searches address rows by FAISS position, so they are fused by row without
+touching the docstore; only the k returned rows are read from it. When the
+lexical result is decisive (the top hit contains every query term and clearly
+outscores the runner-up) and has at least k hits, the vector search is skipped,
+which saves the query embedding round-trip for lookups of exact names, codes
+and numbers. With fewer hits the vector search fills the list as usual.
+
+Results are cached per index generation (services/retrieval_cache.py): a
+repeated question skips both searches, a paraphrase close enough in embedding
+space skips the FAISS and BM25 searches.
+
+Per org (`vector_settings`), the k best candidates can instead be chosen by
+MMR among RETRIEVAL_FETCH_K, and adjacent chunks merged (services/rerank.py).
+
+Orgs that use the shared knowledge base (services/global_kb.py) have it
+searched as above in a second thread while their own index is searched. The
+two top-k lists are merged by the cosine between the question and each
+chunk's stored vector, a score both indexes share; each list keeps its own
+order (fusion, MMR) in the merge.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from langchain.docstore.document import Document
+from utils.constants import (
+    HYBRID_RETRIEVAL_ENABLED,
+    RETRIEVAL_K,
+    RETRIEVAL_FETCH_K,
+    RRF_K,
+    LEXICAL_SKIP_RATIO,
+    RETRIEVAL_RERANK,
+    MMR_LAMBDA,
+    MERGE_ADJACENT_CHUNKS,
+    GLOBAL_KB_ORG_ID,
+    GLOBAL_KB_SEARCH_THREADS,
+)
+from utils.logger import log_error
+from utils.metrics import retrieval_requests
+from services.embedding_cache import truncate_vectors
+from services.global_kb import uses_global_kb, global_kb_available
+from services.lexical_index import query_terms
+from services.org_settings import get_vector_settings
+from services.rerank import mmr_select, merge_adjacent
+from services.retrieval_cache import get_retrieval_cache, question_key
+from services.search_executor import get_search_executor
+from services.tiny_index import TinyIndex
+from services.vectorstore_singleton import get_search_indexes
+
+# searches of the shared knowledge base, running beside the org's search on the calling thread
+_global_pool = ThreadPoolExecutor(max_workers=GLOBAL_KB_SEARCH_THREADS, thread_name_prefix="global-kb")
+
+
+class Retrieval(NamedTuple):
+    docs: list
+    query_vector: np.ndarray   # None when the question was answered without embedding it
+    chunk_vectors: np.ndarray  # (n_chunks, dim) stored vectors of the retrieved chunks (before merging)
+
+
+class RetrievalOptions(NamedTuple):
+    k: int
+    rerank: str
+    mmr_lambda: float
+    merge_adjacent: bool
+    global_kb: bool
+
+
+def retrieval_options(org_id: str, k: int = None) -> RetrievalOptions:
+    """The org's retrieval settings over the global defaults; an explicit `k` wins."""
+    settings = get_vector_settings(org_id)
+    return RetrievalOptions(
+        k=k or settings.get("retrieval_k") or RETRIEVAL_K,
+        rerank=settings.get("rerank") or RETRIEVAL_RERANK,
+        mmr_lambda=settings.get("mmr_lambda", MMR_LAMBDA),
+        merge_adjacent=settings.get("merge_adjacent", MERGE_ADJACENT_CHUNKS),
+        global_kb=uses_global_kb(org_id) and global_kb_available(),
+    )
+
+
+def _docs(vectorstore, rows) -> list:
+    return [vectorstore.docstore.search(vectorstore.index_to_docstore_id[row]) for row in rows]
+
+
+def _embed(vectorstore, question: str) -> np.ndarray:
+    return np.asarray(vectorstore.embeddings.embed_query(question), dtype=np.float32)
+
+
+def _vector_rows(vectorstore, query_vector: np.ndarray, k: int) -> list:
+    if isinstance(vectorstore.index, TinyIndex):
+        # cheaper to search in place than to hand over to the search executor
+        rows = vectorstore.index.search(query_vector, k)[1][0]
+    else:
+        # batched with concurrent searches on the same index
+        _, rows = get_search_executor().search(vectorstore.index, query_vector, k)
+    return [int(r) for r in rows if r != -1]
+
+
+def _is_decisive(hits: list, n_terms: int) -> bool:
+    if LEXICAL_SKIP_RATIO <= 0 or not hits or hits[0][2] < n_terms:
+        return False
+    return len(hits) == 1 or hits[0][1] >= LEXICAL_SKIP_RATIO * hits[1][1]
+
+
+def rrf_fuse(rankings: list, k: int) -> list:
+    """Rows ranked by sum of 1 / (RRF_K + rank) over `rankings`; ties keep first-seen order."""
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def _select(vectorstore, candidates: list, query_vector, options: RetrievalOptions) -> list:
+    # the k rows to return out of the ranked candidates
+    if options.rerank != "mmr" or len(candidates) <= options.k:
+        return candidates[:options.k]
+    vectors = vectorstore.index.reconstruct_batch(np.asarray(candidates, dtype=np.int64))
+    # the top-ranked candidate always stays: it may be a lexical match the vectors rank low
+    picks = mmr_select(query_vector, vectors, options.k, options.mmr_lambda, first=0)
+    return [candidates[i] for i in picks]
+
+
+def _retrieve_rows(org_id: str, question: str, options: RetrievalOptions, need_query_vector: bool):
+    # -> (vectorstore, rows, query vector or None)
+    generation, vectorstore, lexical = get_search_indexes(org_id)
+    k = options.k
+    n_candidates = RETRIEVAL_FETCH_K if options.rerank == "mmr" else k
+    need_query_vector = need_query_vector or options.rerank == "mmr"
+    # the options that choose the rows; the shared index is cached once for orgs with different ones
+    variant = (options.k, options.rerank, options.mmr_lambda if options.rerank == "mmr" else None)
+    cache = get_retrieval_cache()
+    key = question_key(question)
+    cached = cache.get(org_id, generation, key, variant)
+    if cached is not None:
+        rows, query_vector = cached
+        if query_vector is None and need_query_vector:
+            query_vector = _embed(vectorstore, question)
+        return vectorstore, rows, query_vector
+
+    hits = None
+    if HYBRID_RETRIEVAL_ENABLED and lexical is not None:
+        hits = lexical.search(question, RETRIEVAL_FETCH_K)
+        # with fewer than k hits the shortcut would return fewer than k chunks
+        if len(hits) >= k and _is_decisive(hits, len(query_terms(question))):
+            retrieval_requests.labels(mode="lexical").inc()
+            query_vector = _embed(vectorstore, question) if need_query_vector else None
+            rows = _select(vectorstore, [row for row, _, _ in hits[:n_candidates]], query_vector, options)
+            cache.put(org_id, generation, key, rows, query_vector, variant)
+            return vectorstore, rows, query_vector
+
+    query_vector = _embed(vectorstore, question)
+    rows = cache.get_similar(org_id, generation, key, query_vector, variant)
+    if rows is not None:
+        return vectorstore, rows, query_vector
+
+    if hits is None:
+        retrieval_requests.labels(mode="vector").inc()
+        candidates = _vector_rows(vectorstore, query_vector, n_candidates)
+    else:
+        retrieval_requests.labels(mode="hybrid").inc()
+        vector_rows = _vector_rows(vectorstore, query_vector, RETRIEVAL_FETCH_K)
+        candidates = rrf_fuse([vector_rows, [row for row, _, _ in hits]], n_candidates)
+    rows = _select(vectorstore, candidates, query_vector, options)
+    cache.put(org_id, generation, key, rows, query_vector, variant)
+    return vectorstore, rows, query_vector
+
+
+def _cosine(query_vector: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    return vectors @ query_vector / np.where(norms == 0, 1, norms)
+
+
+def merge_by_score(rankings: list, k: int) -> list:
+    """
+    The k best items of several ranked lists of (score, item). Each list keeps
+    its order; at each step the list whose next item scores higher goes first
+    (the earlier list on a tie).
+    """
+    heads = [0] * len(rankings)
+    merged = []
+    while len(merged) < k:
+        best = None
+        for i, ranking in enumerate(rankings):
+            if heads[i] < len(ranking) and (best is None or ranking[heads[i]][0] > rankings[best][heads[best]][0]):
+                best = i
+        if best is None:
+            break
+        merged.append(rankings[best][heads[best]][1])
+        heads[best] += 1
+    return merged
+
+
+def _shared_doc(doc):
+    # a copy: in-memory docstores hand out their stored documents
+    return Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "knowledge_base": "global"})
+
+
+def _retrieve_with_global(org_id: str, question: str, options: RetrievalOptions):
+    # -> ([(doc, stored vector)] best first, query vector), vectors cut to the smaller index dimension
+    shared = _global_pool.submit(_retrieve_rows, GLOBAL_KB_ORG_ID, question, options, True)
+    results, org_missing = [], None
+    try:
+        results.append((_retrieve_rows(org_id, question, options, need_query_vector=True), False))
+    except FileNotFoundError as e:
+        org_missing = e  # e.g. an org whose documents all moved to the shared knowledge base
+    try:
+        results.append((shared.result(), True))
+    except FileNotFoundError:
+        pass  # removed since retrieval_options checked it
+    except Exception as e:
+        log_error(f"Shared knowledge base search failed for org {org_id}: {e}")
+    if not results:
+        raise org_missing
+
+    dims = min(query_vector.shape[-1] for (_, _, query_vector), _ in results)
+    rankings = []
+    for (vectorstore, rows, query_vector), is_shared in results:
+        if rows:
+            vectors = vectorstore.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+        else:
+            vectors = np.empty((0, vectorstore.index.d), dtype=np.float32)
+        docs = _docs(vectorstore, rows)
+        if is_shared:
+            docs = [_shared_doc(doc) for doc in docs]
+        scores = _cosine(query_vector, vectors)
+        rankings.append(list(zip(scores, zip(docs, truncate_vectors(vectors, dims)))))
+    retrieval_requests.labels(mode="global_kb").inc()
+    return merge_by_score(rankings, options.k), truncate_vectors(results[0][0][2], dims)
+
+
+def _result_docs(docs: list, options: RetrievalOptions) -> list:
+    return merge_adjacent(docs) if options.merge_adjacent else docs
+
+
+def retrieve(org_id: str, question: str, k: int = None) -> list:
+    """
+    Top-k chunks of the org's index, and of the shared knowledge base if the
+    org uses it, for `question` (k from the org's settings by default).
+    """
+    options = retrieval_options(org_id, k)
+    if options.global_kb:
+        picked, _ = _retrieve_with_global(org_id, question, options)
+        return _result_docs([doc for doc, _ in picked], options)
+    vectorstore, rows, _ = _retrieve_rows(org_id, question, options, need_query_vector=False)
+    return _result_docs(_docs(vectorstore, rows), options)
+
+
+def retrieve_with_vectors(org_id: str, question: str, k: int = None) -> Retrieval:
+    """
+    Like retrieve(), plus the query vector and the chunks' stored vectors, for
+    scoring the result locally. Embeds the question even when the lexical
+    index alone decided the result.
+    """
+    options = retrieval_options(org_id, k)
+    if options.global_kb:
+        picked, query_vector = _retrieve_with_global(org_id, question, options)
+        chunk_vectors = np.asarray([vector for _, vector in picked], dtype=np.float32).reshape(-1, query_vector.shape[-1])
+        return Retrieval(_result_docs([doc for doc, _ in picked], options), query_vector, chunk_vectors)
+    vectorstore, rows, query_vector = _retrieve_rows(org_id, question, options, need_query_vector=True)
+    if rows:
+        chunk_vectors = vectorstore.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+    else:
+        chunk_vectors = np.empty((0, vectorstore.index.d), dtype=np.float32)
+    return Retrieval(_result_docs(_docs(vectorstore, rows), options), query_vector, chunk_vectors)
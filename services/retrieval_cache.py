@@ -0,0 +1,189 @@
+# services/retrieval_cache.py
+"""
+Per-process cache of retrieval results: which rows of an org's index answered
+a question. Two tiers:
+
+    exact     (normalised question) -> rows and query vector; a hit skips
+              embedding and search
+    semantic  query vector -> rows of the most similar earlier question whose
+              cosine is at least RETRIEVAL_CACHE_SEMANTIC_THRESHOLD; a hit
+              skips the searches (the query still had to be embedded)
+
+Rows are FAISS positions, valid only for the generation they came from, so
+each org's entries are tagged with its index generation and dropped as soon as
+a lookup sees a newer one. Entries are also keyed by a `variant`, the retrieval
+options that chose the rows (k, reranking), so callers with different options
+share an index's cache without clearing each other's entries. At most RETRIEVAL_CACHE_MAX_ORGS orgs are kept,
+least recently queried dropped first, and an org's query vectors take memory
+for the questions it has cached, not for RETRIEVAL_CACHE_MAX_PER_ORG.
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from utils.constants import (
+    RETRIEVAL_CACHE_ENABLED,
+    RETRIEVAL_CACHE_MAX_PER_ORG,
+    RETRIEVAL_CACHE_MAX_ORGS,
+    RETRIEVAL_CACHE_SEMANTIC_THRESHOLD,
+)
+from utils.helpers import normalize_question
+from utils.metrics import retrieval_cache_hits, retrieval_cache_misses
+from services.lexical_index import tokenize
+
+
+def question_key(question: str) -> str:
+    """Aliases expanded, case, punctuation and spacing ignored."""
+    return " ".join(tokenize(normalize_question(question)))
+
+
+class _OrgEntries:
+    def __init__(self, generation, max_entries: int):
+        self.generation = generation
+        self.exact = OrderedDict()  # (variant, question key) -> (rows, query vector or None), least recently used first
+        self.max_entries = max_entries
+        self.vectors = None         # (up to max_entries, dim) unit query vectors, used as a ring once full
+        self.vector_rows = []
+        self.vector_variants = []
+        self.next_slot = 0
+
+    def add_vector(self, vector: np.ndarray, rows: list, variant) -> None:
+        filled = len(self.vector_rows)
+        if self.vectors is None or filled == len(self.vectors) < self.max_entries:
+            # grow with the fill (doubling), so an org asked a few questions holds a small array
+            grown = np.zeros((min(self.max_entries, max(16, 2 * filled)), vector.shape[0]), dtype=np.float32)
+            if filled:
+                grown[:filled] = self.vectors[:filled]
+            self.vectors = grown
+        self.vectors[self.next_slot] = vector
+        if self.next_slot < len(self.vector_rows):
+            self.vector_rows[self.next_slot] = rows
+            self.vector_variants[self.next_slot] = variant
+        else:
+            self.vector_rows.append(rows)
+            self.vector_variants.append(variant)
+        self.next_slot = (self.next_slot + 1) % self.max_entries
+
+    def nearest(self, vector: np.ndarray, variant):
+        if not self.vector_rows or self.vectors.shape[1] != vector.shape[0]:
+            return None, 0.0
+        n = len(self.vector_rows)
+        sims = self.vectors[:n] @ vector
+        sims[np.fromiter((v != variant for v in self.vector_variants), dtype=bool, count=n)] = -np.inf
+        best = int(np.argmax(sims))
+        return self.vector_rows[best], float(sims[best])
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class RetrievalCache:
+    def __init__(self, max_per_org: int = RETRIEVAL_CACHE_MAX_PER_ORG,
+                 semantic_threshold: float = RETRIEVAL_CACHE_SEMANTIC_THRESHOLD,
+                 enabled: bool = RETRIEVAL_CACHE_ENABLED,
+                 max_orgs: int = RETRIEVAL_CACHE_MAX_ORGS):
+        self.enabled = enabled and max_per_org > 0 and max_orgs > 0
+        self.max_per_org = max_per_org
+        self.max_orgs = max_orgs
+        self.semantic_threshold = semantic_threshold
+        self._orgs = OrderedDict()  # org_id -> _OrgEntries, least recently queried first
+        self._lock = threading.Lock()
+        self._hits = {"exact": 0, "semantic": 0}
+        self._misses = 0
+
+    def _entries(self, org_id: str, generation) -> _OrgEntries:
+        # caller holds the lock; a republished index invalidates everything cached for the org
+        entries = self._orgs.get(org_id)
+        if entries is None or entries.generation != generation:
+            entries = self._orgs[org_id] = _OrgEntries(generation, self.max_per_org)
+        self._orgs.move_to_end(org_id)
+        while len(self._orgs) > self.max_orgs:
+            self._orgs.popitem(last=False)
+        return entries
+
+    def get(self, org_id: str, generation, key: str, variant=None):
+        """(rows, query vector or None) cached for exactly this question and variant, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entries = self._entries(org_id, generation)
+            cached = entries.exact.get((variant, key))
+            if cached is not None:
+                entries.exact.move_to_end((variant, key))
+                self._hits["exact"] += 1
+        if cached is not None:
+            retrieval_cache_hits.labels(tier="exact").inc()
+        return cached
+
+    def get_similar(self, org_id: str, generation, key: str, query_vector, variant=None):
+        """
+        Rows of a cached question of the same variant whose query vector is close
+        enough to this one, or None. A hit is also stored under `key`.
+        """
+        if not self.enabled:
+            return None
+        rows = None
+        with self._lock:
+            entries = self._entries(org_id, generation)
+            if self.semantic_threshold > 0:
+                rows, similarity = entries.nearest(_unit(query_vector), variant)
+                if similarity < self.semantic_threshold:
+                    rows = None
+            if rows is not None:
+                self._hits["semantic"] += 1
+                self._put_exact(entries, (variant, key), rows, query_vector)
+        if rows is not None:
+            retrieval_cache_hits.labels(tier="semantic").inc()
+        return rows
+
+    def put(self, org_id: str, generation, key: str, rows: list, query_vector=None, variant=None) -> None:
+        """Store the result of a retrieval that missed both tiers."""
+        if not self.enabled:
+            return
+        retrieval_cache_misses.inc()
+        with self._lock:
+            self._misses += 1
+            entries = self._entries(org_id, generation)
+            self._put_exact(entries, (variant, key), rows, query_vector)
+            if query_vector is not None and self.semantic_threshold > 0:
+                entries.add_vector(_unit(query_vector), rows, variant)
+
+    def _put_exact(self, entries: _OrgEntries, key: tuple, rows: list, query_vector) -> None:
+        entries.exact[key] = (rows, query_vector)
+        entries.exact.move_to_end(key)
+        while len(entries.exact) > self.max_per_org:
+            entries.exact.popitem(last=False)
+
+    def invalidate(self, org_id: str = None) -> None:
+        with self._lock:
+            if org_id is None:
+                self._orgs.clear()
+            else:
+                self._orgs.pop(org_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            orgs = {
+                org_id: {"questions": len(e.exact), "query_vectors": len(e.vector_rows)}
+                for org_id, e in self._orgs.items()
+            }
+            hits, misses = dict(self._hits), self._misses
+        total = sum(hits.values()) + misses
+        return {
+            "enabled": self.enabled,
+            "max_per_org": self.max_per_org,
+            "max_orgs": self.max_orgs,
+            "semantic_threshold": self.semantic_threshold,
+            "orgs": orgs,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (sum(hits.values()) / total) if total else 0.0,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_cache() -> RetrievalCache:
+    return RetrievalCache()
@@ -0,0 +1,97 @@
+# services/search_executor.py
+"""
+Batched FAISS search. Concurrent retrievals against the same index are
+stacked into one query matrix and searched with a single index.search call,
+which FAISS parallelises internally, instead of one call per request.
+
+FAISS_SEARCH_THREADS worker threads serve a shared queue. A free worker takes
+the oldest waiting search plus every other waiting search on the same index
+(up to FAISS_SEARCH_MAX_BATCH) and runs them together. No request waits to be
+batched: a batch is whatever queued up while the workers were busy, so an idle
+server searches immediately and a loaded one batches more.
+
+OpenMP threads per process are set once to FAISS_OMP_THREADS, so uvicorn
+workers don't each start a thread per core and oversubscribe the machine.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+import faiss
+import numpy as np
+from utils.constants import FAISS_OMP_THREADS, FAISS_SEARCH_THREADS, FAISS_SEARCH_MAX_BATCH
+from utils.metrics import faiss_search_batch_size, faiss_search_queue_seconds
+
+faiss.omp_set_num_threads(FAISS_OMP_THREADS)
+
+
+class SearchExecutor:
+
+    def __init__(self, workers: int = FAISS_SEARCH_THREADS, max_batch: int = FAISS_SEARCH_MAX_BATCH):
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = deque()  # (index, query vector, k, future, enqueued_at), oldest first
+        self._threads = [
+            threading.Thread(target=self._work, name=f"faiss-search-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, index, query_vector: np.ndarray, k: int) -> Future:
+        """Future of (distances, rows) of `query_vector`'s k nearest rows, as 1-d arrays."""
+        future = Future()
+        with self._cond:
+            self._pending.append((index, np.asarray(query_vector, dtype=np.float32).ravel(), k, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def search(self, index, query_vector: np.ndarray, k: int):
+        return self.submit(index, query_vector, k).result()
+
+    async def asearch(self, index, query_vector: np.ndarray, k: int):
+        return await asyncio.wrap_future(self.submit(index, query_vector, k))
+
+    def _take_batch(self) -> list:
+        # caller holds the lock; the oldest request and the others waiting on its index
+        index = self._pending[0][0]
+        batch, rest = [], deque()
+        while self._pending:
+            request = self._pending.popleft()
+            if request[0] is index and len(batch) < self.max_batch:
+                batch.append(request)
+            else:
+                rest.append(request)
+        self._pending = rest
+        return batch
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                batch = self._take_batch()
+            now = time.perf_counter()
+            for request in batch:
+                faiss_search_queue_seconds.observe(now - request[4])
+            faiss_search_batch_size.observe(len(batch))
+            index = batch[0][0]
+            try:
+                k = min(max(request[2] for request in batch), index.ntotal)
+                queries = np.stack([request[1] for request in batch])
+                if k > 0:
+                    distances, rows = index.search(queries, k)
+                else:
+                    distances, rows = np.empty((len(batch), 0), dtype=np.float32), np.empty((len(batch), 0), dtype=np.int64)
+            except Exception as e:
+                for request in batch:
+                    request[3].set_exception(e)
+                continue
+            for i, request in enumerate(batch):
+                request[3].set_result((distances[i, :request[2]], rows[i, :request[2]]))
+
+
+@lru_cache(maxsize=1)
+def get_search_executor() -> SearchExecutor:
+    return SearchExecutor()
@@ -0,0 +1,102 @@
+# services/text_cache.py
+"""
+Extracted page text of uploaded files, cached next to the uploads:
+
+    pdf_files/org_<id>/.text_cache/<sha256>.<EXTRACTOR_VERSION>.jsonl.gz
+
+One gzipped JSON line per page ({"text", "metadata"}), exactly as the loader
+returned it (before lowercasing). Entries are keyed by file content, so a
+re-upload of the same bytes under another name hits too, and by extractor
+version, so a loader change or PyMuPDF upgrade never serves stale text.
+A rebuild only re-runs PyMuPDF / docx2txt for files whose bytes changed.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import pymupdf
+from langchain.docstore.document import Document
+from utils.constants import TEXT_CACHE_ENABLED
+from utils.logger import log_error
+from utils.metrics import text_cache_hits, text_cache_misses
+from services.document_parser import iter_raw_pages
+from services.index_manifest import file_sha256
+
+TEXT_CACHE_DIR = ".text_cache"
+# bump the leading number whenever extraction output changes (loader options, page metadata)
+EXTRACTOR_VERSION = f"v2-pymupdf{pymupdf.VersionBind}"
+_PATH_KEYS = ("source", "file_path")  # loader metadata naming the file; refreshed on every read
+STALE_TMP_S = 3600  # unfinished entries older than this are crash leftovers
+
+
+def cache_path(upload_dir: str, sha256: str) -> str:
+    return os.path.join(upload_dir, TEXT_CACHE_DIR, f"{sha256}.{EXTRACTOR_VERSION}.jsonl.gz")
+
+
+def _read_pages(path: str, file_path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            metadata = page["metadata"]
+            for key in _PATH_KEYS:
+                if key in metadata:
+                    metadata[key] = file_path
+            yield Document(page_content=page["text"], metadata=metadata)
+
+
+def _extract_and_store(path: str, file_path: str, pool=None):
+    # pages are written as they are extracted; the entry only appears once complete
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    complete = False
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            for page in iter_raw_pages(file_path, pool):
+                f.write(json.dumps({"text": page.page_content, "metadata": page.metadata}, ensure_ascii=False))
+                f.write("\n")
+                yield page
+        os.replace(tmp_path, path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def iter_cached_pages(file_path: str, sha256: str = None, pool=None):
+    """
+    Raw page documents of one file, from the cache when its content was
+    extracted before, otherwise extracted (see iter_raw_pages) and cached.
+    `sha256` saves hashing the file again when the manifest already has it.
+    """
+    if not TEXT_CACHE_ENABLED:
+        return iter_raw_pages(file_path, pool)
+    path = cache_path(os.path.dirname(file_path), sha256 or file_sha256(file_path))
+    if os.path.exists(path):
+        text_cache_hits.inc()
+        return _read_pages(path, file_path)
+    text_cache_misses.inc()
+    return _extract_and_store(path, file_path, pool)
+
+
+def prune_text_cache(upload_dir: str, live_hashes) -> int:
+    """Delete entries of files no longer in the org folder and of older extractor versions."""
+    cache_dir = os.path.join(upload_dir, TEXT_CACHE_DIR)
+    if not os.path.isdir(cache_dir):
+        return 0
+    keep = {os.path.basename(cache_path(upload_dir, sha)) for sha in live_hashes}
+    removed = 0
+    now = time.time()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name in keep:
+            continue
+        try:
+            # a recent .tmp may be an extraction in progress in another worker
+            if name.endswith(".tmp") and now - os.path.getmtime(path) < STALE_TMP_S:
+                continue
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            log_error(f"Could not remove text cache entry {name}: {e}")
+    return removed
@@ -0,0 +1,74 @@
+# services/tiny_index.py
+"""
+Exact search for small org indexes with plain NumPy.
+
+Below TINY_INDEX_MAX_VECTORS rows, a FAISS search costs more in call overhead
+than in arithmetic. TinyIndex keeps the vectors as one contiguous float32
+matrix and ranks all rows with a single matrix product and argpartition.
+For L2 indexes the score is q.x - |x|^2 / 2, which orders rows exactly as L2
+distance does (and as cosine does for the unit-length vectors OpenAI returns).
+It has the faiss.Index methods retrieval and LangChain use (search,
+reconstruct*, ntotal, d), so it replaces vectorstore.index when an org is loaded.
+"""
+import faiss
+import numpy as np
+
+
+class TinyIndex:
+    """Read-only stand-in for a small faiss index; search results match IndexFlat's."""
+
+    def __init__(self, vectors: np.ndarray, metric_type: int = faiss.METRIC_L2):
+        if metric_type not in (faiss.METRIC_L2, faiss.METRIC_INNER_PRODUCT):
+            raise ValueError(f"Unsupported metric {metric_type}")
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ntotal, self.d = self.vectors.shape
+        self.metric_type = metric_type
+        self.is_trained = True
+        self._half_sq_norms = None
+        if metric_type == faiss.METRIC_L2:
+            self._half_sq_norms = 0.5 * np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    @classmethod
+    def from_faiss(cls, index):
+        return cls(index.reconstruct_n(0, index.ntotal), index.metric_type)
+
+    def search(self, queries, k: int):
+        """(distances, rows), each (n_queries, k); like faiss, missing results are row -1."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.d)
+        n_found = min(k, self.ntotal)
+        if len(queries) == 1 and n_found == k:
+            return self._search_one(queries[0], k)
+        l2 = self._half_sq_norms is not None
+        distances = np.full((len(queries), k), np.inf if l2 else -np.inf, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        if n_found == 0:
+            return distances, rows
+        for i, query in enumerate(queries):
+            d, r = self._search_one(query, n_found)
+            distances[i, :n_found], rows[i, :n_found] = d[0], r[0]
+        return distances, rows
+
+    def _search_one(self, query: np.ndarray, k: int):
+        scores = self.vectors @ query
+        if self._half_sq_norms is not None:
+            scores -= self._half_sq_norms
+        top = np.argpartition(scores, self.ntotal - k)[self.ntotal - k:] if k < self.ntotal else np.arange(self.ntotal)
+        top = top[np.lexsort((top, -scores[top]))]  # best first, lower row on ties
+        best = scores[top]
+        if self._half_sq_norms is not None:
+            # |q - x|^2 = |q|^2 - 2 (q.x - |x|^2 / 2)
+            best = np.maximum(query @ query - 2 * best, 0)
+        return best[None, :].astype(np.float32), top[None, :].astype(np.int64)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return self.vectors[key].copy()
+
+    def reconstruct_n(self, i0: int, n: int) -> np.ndarray:
+        return self.vectors[i0:i0 + n].copy()
+
+    def reconstruct_batch(self, keys) -> np.ndarray:
+        return self.vectors[np.asarray(keys, dtype=np.int64)]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.vectors.nbytes)
@@ -1,14 +1,42 @@
 import os
 import shutil
-from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from utils.constants import VECTOR_DIR, EMBEDDING_MODEL
+from utils.constants import VECTOR_DIR, VECTORSTORE_BASE, EMBEDDING_MODEL, INDEX_KEEP_GENERATIONS
 from dotenv import load_dotenv
-from utils.logger import log_error
 from services import file_service
+from services.ingest_pipeline import get_page_pool, iter_source_chunks, iter_embedded_batches, embed_chunk_stream
+from services.text_cache import prune_text_cache
+from services.chunk_dedupe import ChunkDeduper, foreign_sources
+from services.embedding_cache import CachedEmbeddings, TruncatedEmbeddings
+from services.rate_limiter import RateLimitedEmbeddings
+from services.index_manifest import (
+    read_manifest,
+    write_manifest,
+    compute_source_files,
+    file_entry,
+    build_config,
+    org_chunk_profile,
+    org_embedding_dims,
+)
+from services.index_inventory import refresh_org
+from services.index_io import (
+    LOCK_DIR,
+    file_lock,
+    read_vectorstore,
+    write_vectorstore,
+    index_files_present,
+    read_build_info,
+    new_generation_dir,
+    activate_generation,
+    prune_generations,
+    list_generations,
+    current_generation,
+)
+from services.index_builder import build_vectorstore, needs_full_rebuild
 
 load_dotenv()
 
@@ -19,88 +47,326 @@ def get_openai_api_key():
     return key
 
 UPLOAD_DIR = "pdf_files"
-FAISS_INDEX_FACTORY = "HNSW32" 
+
+# Serialises every write to one org's index (full retrain or incremental update):
+# the thread lock within this process, the lock file across uvicorn workers, so
+# no two writers load the same generation and the second publish drops the first's change
+_org_build_locks = defaultdict(threading.Lock)
+
+
+@contextmanager
+def org_build_lock(org_id: str):
+    with _org_build_locks[org_id], file_lock(os.path.join(VECTORSTORE_BASE, LOCK_DIR, f"org_{org_id}.lock")):
+        yield
+
+
+def get_indexing_embeddings(dims: int = None):
+    # Chunk vectors come from the shared embedding cache; only misses reach the
+    # API, and those go through the process-wide requests/tokens per minute limiter.
+    # The cache holds full-size vectors; `dims` cuts them down for the index.
+    embeddings = CachedEmbeddings(
+        RateLimitedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=get_openai_api_key())),
+        model_key=EMBEDDING_MODEL,
+    )
+    return TruncatedEmbeddings(embeddings, dims) if dims else embeddings
+
 
 def batch_retrain_all_orgs():
+    """Rebuild every org in pdf_files/ in parallel; returns the engine's per-org summary."""
+    from services.retrain_engine import retrain_orgs
     pdf_base = "pdf_files"
     # Get all org folders in pdf_files (they start with "org_")
-    org_dirs = [
-        name for name in os.listdir(pdf_base)
+    org_ids = [
+        name.replace("org_", "", 1) for name in os.listdir(pdf_base)
         if os.path.isdir(os.path.join(pdf_base, name)) and name.startswith("org_")
     ]
-    print(f"Found {len(org_dirs)} orgs: {org_dirs}")
+    print(f"Found {len(org_ids)} orgs: {org_ids}")
+    return retrain_orgs(org_ids)
+
+
+def clear_vectorstore(org_id: str):
+    shutil.rmtree(os.path.join("vectorstores", f"org_{org_id}"), ignore_errors=True)
+    refresh_org(org_id)
+
+
+def publish_vectorstore(org_id: str, vectorstore, source_files: dict = None, build_info: dict = None):
+    """
+    Write an org's index as a new generation and switch readers to it atomically;
+    queries keep using the previous generation until the switch. `source_files`
+    becomes the new manifest and `build_info` the new build.json; without
+    build_info (incremental updates) the current build.json carries over.
+    Returns the generation name.
+    """
+    org_dir = os.path.join("vectorstores", f"org_{org_id}")
+    if build_info is None:
+        build_info = read_build_info(org_dir)
+    gen_dir = new_generation_dir(org_dir)
+    try:
+        write_vectorstore(vectorstore, gen_dir, build_info)
+        if source_files is not None:
+            write_manifest(org_id, source_files, directory=gen_dir)
+        activate_generation(org_dir, os.path.basename(gen_dir))
+    except Exception:
+        shutil.rmtree(gen_dir, ignore_errors=True)
+        raise
+    prune_generations(org_dir, INDEX_KEEP_GENERATIONS)
+    refresh_org(org_id, verify=False)  # just written; readers may use it again
+    return os.path.basename(gen_dir)
+
+
+def list_vectorstore_generations(org_id: str) -> dict:
+    org_dir = os.path.join("vectorstores", f"org_{org_id}")
+    return {
+        "current": current_generation(org_dir),
+        "generations": [
+            {"generation": g, "build": read_build_info(os.path.join(org_dir, g))}
+            for g in list_generations(org_dir)
+        ],
+    }
 
-    for org_folder in org_dirs:
-        org_id = org_folder.replace("org_", "")
-        print(f"Retraining vectorstore for org: {org_id}")
-        try:
-            retrain_and_replace_vectorstore(org_id)
-        except Exception as e:
-            print(f"❌ Error retraining org {org_id}: {e}")
-    return 'trained'
+
+def rollback_vectorstore(org_id: str, generation: str = None) -> str:
+    """
+    Serve an older generation again: `generation`, or the one published before
+    the current one. Raises LookupError if there is nothing to roll back to.
+    """
+    with org_build_lock(org_id):
+        org_dir = os.path.join("vectorstores", f"org_{org_id}")
+        generations = list_generations(org_dir)
+        current = current_generation(org_dir)
+        if generation is None:
+            older = [g for g in generations if current and g < current]
+            if not older:
+                raise LookupError(f"No older generation to roll back to for org {org_id}")
+            generation = older[-1]
+        elif generation not in generations:
+            raise LookupError(f"Generation {generation} not found for org {org_id}")
+        activate_generation(org_dir, generation)
+        refresh_org(org_id)
+        print(f"Rolled back org {org_id} to {generation}")
+        return generation
 
 
 def retrain_and_replace_vectorstore(org_id: str):
+    with org_build_lock(org_id):
+        return _retrain_and_replace_vectorstore(org_id)
+
+
+def _retrain_and_replace_vectorstore(org_id: str):
     upload_dir = os.path.join("pdf_files", f"org_{org_id}")
-    vectorstore_dir = os.path.join("vectorstores", f"org_{org_id}")
-    all_documents = []
 
     # NEW: if no upload dir, clear any existing index and stop
     if not os.path.isdir(upload_dir):
-        shutil.rmtree(vectorstore_dir, ignore_errors=True)
+        clear_vectorstore(org_id)
         print(f"No upload dir for org: {org_id}; cleared index.")
         return False  # <-- return a boolean
 
-    for filename in os.listdir(upload_dir):
-        # NEW: skip hidden files and folders
-        if filename.startswith("."):
-            continue
-        file_path = os.path.join(upload_dir, filename)
-        if os.path.isdir(file_path):
-            continue
-
-        ext = os.path.splitext(filename)[1].lower()
-        if ext == ".pdf":
-            loader = PyMuPDFLoader(file_path)
-        elif ext == ".txt":
-            loader = TextLoader(file_path)
-        elif ext == ".docx":
-            loader = Docx2txtLoader(file_path)
-        else:
-            continue
-
-        try:
-            docs = loader.load()
-            lower_docs = [
-                Document(page_content=doc.page_content.lower(), metadata=doc.metadata)
-                for doc in docs
-            ]
-            all_documents.extend(lower_docs)
-        except Exception as e:
-            print(f"❌ Error loading {filename}: {e}")
-            log_error(f"❌ Error loading {filename}: {e}")
+    source_files = compute_source_files(org_id, read_manifest(org_id))
+    # pages are extracted, split and embedded in batches; only chunks and vectors are kept
+    hashes = {name: entry["sha256"] for name, entry in source_files.items()}
+    chunks = iter_source_chunks(upload_dir, source_files, get_page_pool(), hashes=hashes,
+                                profile=org_chunk_profile(org_id))
+    first = next(chunks, None)
 
     # NEW: if no docs, remove any existing index dir and stop
-    if not all_documents:
-        shutil.rmtree(vectorstore_dir, ignore_errors=True)
+    if first is None:
+        clear_vectorstore(org_id)
         print(f"No valid documents found to index for org: {org_id}; cleared index.")
         return False
 
+    embeddings = get_indexing_embeddings(org_embedding_dims(org_id))
+    deduper = ChunkDeduper()
+    docs, vectors = embed_chunk_stream(deduper.filter(chain([first], chunks)), embeddings)
+    vectorstore, build_info = build_vectorstore(org_id, docs, vectors, embeddings)
+    build_info["dedupe"] = deduper.summary()
     # Recreate index dir only when we actually have docs
-    if os.path.exists(vectorstore_dir):
-        shutil.rmtree(vectorstore_dir, ignore_errors=True)
-    os.makedirs(vectorstore_dir, exist_ok=True)
+    publish_vectorstore(org_id, vectorstore, source_files, build_info=build_info)
+    prune_text_cache(upload_dir, hashes.values())
+    print(f"Vectorstore saved for org: {org_id} ({build_info['factory']}, {build_info['n_vectors']} vectors, "
+          f"{build_info['dedupe']['dropped']} duplicate chunks dropped)")
+    return True  # <-- indicate success
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
-    docs = splitter.split_documents(all_documents)
 
-    embedding_model = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=get_openai_api_key()
-    )
-    vectorstore = FAISS.from_documents(docs, embedding_model)
-    vectorstore.save_local(vectorstore_dir)
-    print(f"Vectorstore saved for org: {org_id}")
-    return True  # <-- indicate success
+# ----------------------
+# Incremental updates
+# ----------------------
+def _load_writable_vectorstore(org_id: str):
+    """Private, mutable copy of the org's index, or None if it has no complete index."""
+    vectorstore_dir = os.path.join("vectorstores", f"org_{org_id}")
+    if not index_files_present(vectorstore_dir):
+        return None
+    vectorstore = read_vectorstore(vectorstore_dir, get_indexing_embeddings(), writable=True)
+    # chunks added to it must have the index's size, whatever the org's setting is now
+    vectorstore.embedding_function = get_indexing_embeddings(vectorstore.index.d)
+    return vectorstore
 
 
+def _updated_source_files(org_id: str, stored_filename: str, removed: bool = False):
+    # Legacy indexes without a manifest get none (None); the next warm-up rebuilds them
+    manifest = read_manifest(org_id)
+    if manifest is None:
+        return None
+    files = manifest.get("files", {})
+    if removed:
+        files.pop(stored_filename, None)
+    else:
+        path = os.path.join("pdf_files", f"org_{org_id}", stored_filename)
+        files[stored_filename] = file_entry(path)
+    return files
+
+
+def _delete_chunks(vectorstore, ids: list) -> bool:
+    """Remove ids in place; False when the index type can't delete (HNSW) and a rebuild is needed."""
+    try:
+        vectorstore.delete(ids)
+        return True
+    except RuntimeError as e:
+        print(f"Index does not support removal ({e}); rebuilding instead")
+        return False
+
+
+def retrain_for_files(org_id: str, stored_filenames: list) -> dict:
+    """Full rebuild of the org; returns {stored_filename: chunk ids} for the given files."""
+    with org_build_lock(org_id):
+        return _rebuilt_chunk_ids(org_id, stored_filenames)
+
+
+def _rebuilt_chunk_ids(org_id: str, stored_filenames: list) -> dict:
+    if not _retrain_and_replace_vectorstore(org_id):
+        return {name: [] for name in stored_filenames}
+    vectorstore = _load_writable_vectorstore(org_id)
+    return {name: get_file_chunk_ids(vectorstore, name) for name in stored_filenames}
+
+
+def _stored_docs(vectorstore, ids=None):
+    return [vectorstore.docstore.search(i) for i in (vectorstore.index_to_docstore_id.values() if ids is None else ids)]
+
+
+def _drop_source(vectorstore, stored_filename: str) -> int:
+    """Forget `stored_filename` in the provenance of chunks it shared with other files."""
+    changed = 0
+    for doc in _stored_docs(vectorstore):
+        sources = doc.metadata.get("sources")
+        if sources and stored_filename in sources:
+            sources.remove(stored_filename)
+            changed += 1
+    return changed
+
+
+def get_file_chunk_ids(vectorstore, stored_filename: str) -> list:
+    """Docstore ids of every chunk that came from `stored_filename`."""
+    ids = []
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        if getattr(doc, "metadata", {}).get("source_file") == stored_filename:
+            ids.append(doc_id)
+    return ids
+
+
+def add_files_to_vectorstore(org_id: str, stored_filenames: list) -> dict:
+    """
+    Append the chunks of several uploaded files to the org's index and publish
+    once. Returns {stored_filename: chunk ids indexed for it}.
+    """
+    with org_build_lock(org_id):
+        upload_dir = os.path.join("pdf_files", f"org_{org_id}")
+
+        vectorstore = _load_writable_vectorstore(org_id)
+        if vectorstore is None:
+            return _rebuilt_chunk_ids(org_id, stored_filenames)
+        manifest = read_manifest(org_id)
+        if manifest is not None and manifest.get("config") != build_config(org_id):
+            # chunking or model settings changed since the build: don't mix two kinds of chunks
+            return _rebuilt_chunk_ids(org_id, stored_filenames)
+
+        # Re-upload under the same name: replace the old chunks instead of duplicating them.
+        # Chunks that also stand in for other files' duplicates can't simply go: rebuild.
+        stale_ids = [i for name in stored_filenames for i in get_file_chunk_ids(vectorstore, name)]
+        if stale_ids and (foreign_sources(_stored_docs(vectorstore, stale_ids), stored_filenames)
+                          or not _delete_chunks(vectorstore, stale_ids)):
+            return _rebuilt_chunk_ids(org_id, stored_filenames)
+        for name in stored_filenames:
+            _drop_source(vectorstore, name)
+
+        # new chunks repeating indexed text only add their file to that chunk's `sources`
+        deduper = ChunkDeduper()
+        if deduper.enabled:
+            for doc in _stored_docs(vectorstore):
+                deduper.add_existing(doc)
+
+        # stream the new files into the private copy batch by batch; nothing is published yet
+        result = {name: [] for name in stored_filenames}
+        chunks = deduper.filter(iter_source_chunks(upload_dir, stored_filenames, get_page_pool(),
+                                                   profile=org_chunk_profile(org_id)))
+        for batch, vectors in iter_embedded_batches(chunks, vectorstore.embeddings):
+            ids = [doc.metadata["chunk_id"] for doc in batch]
+            vectorstore.add_embeddings(
+                zip([doc.page_content for doc in batch], vectors),
+                metadatas=[doc.metadata for doc in batch],
+                ids=ids,
+            )
+            for doc, chunk_id in zip(batch, ids):
+                result[doc.metadata["source_file"]].append(chunk_id)
+        # the docstore holds copies: provenance gained after a chunk was added is written back
+        for chunk_id, kept in deduper.merged.items():
+            vectorstore.docstore.search(chunk_id).metadata["sources"] = list(kept.metadata["sources"])
+
+        build_info = read_build_info(os.path.join("vectorstores", f"org_{org_id}"))
+        if needs_full_rebuild(build_info, org_id, vectorstore.index.ntotal):
+            # the org outgrew its index type (e.g. Flat -> HNSW); cached embeddings keep this cheap
+            return _rebuilt_chunk_ids(org_id, stored_filenames)
+
+        manifest = read_manifest(org_id)
+        source_files = None
+        if manifest is not None:
+            source_files = manifest.get("files", {})
+            for name in stored_filenames:
+                source_files[name] = file_entry(os.path.join(upload_dir, name))
+
+        if any(result.values()) or stale_ids or deduper.merged:
+            publish_vectorstore(org_id, vectorstore, source_files)
+        for name, chunk_ids in result.items():
+            print(f"Added {len(chunk_ids)} chunks from {name} to org: {org_id}")
+        if deduper.summary()["dropped"]:
+            print(f"Skipped {deduper.summary()['dropped']} duplicate chunks already indexed for org: {org_id}")
+        return result
+
+
+def remove_file_from_vectorstore(org_id: str, stored_filename: str, chunk_ids: list = None):
+    """
+    Remove one file's vectors from the org's index without re-embedding the rest.
+    `chunk_ids` comes from the rag_files document; when it is missing (file indexed
+    before ids were tracked) the chunks are found by their `source_file` metadata.
+    Returns {"removed": n, "remaining": m}, or None if the org has no index to update.
+    """
+    with org_build_lock(org_id):
+        vectorstore = _load_writable_vectorstore(org_id)
+        if vectorstore is None:
+            return None
+
+        known_ids = set(vectorstore.index_to_docstore_id.values())
+        ids = [i for i in (chunk_ids or []) if i in known_ids] or get_file_chunk_ids(vectorstore, stored_filename)
+        remaining = vectorstore.index.ntotal - len(ids)
+        if ids and remaining > 0:
+            build_info = read_build_info(os.path.join("vectorstores", f"org_{org_id}"))
+            # shrinking may call for a simpler index type, HNSW can't delete in place, and
+            # chunks standing in for other files' duplicates must be re-homed by a rebuild
+            if needs_full_rebuild(build_info, org_id, remaining) \
+                    or foreign_sources(_stored_docs(vectorstore, ids), [stored_filename]) \
+                    or not _delete_chunks(vectorstore, ids):
+                before = vectorstore.index.ntotal
+                rebuilt = _retrain_and_replace_vectorstore(org_id)
+                # re-homed duplicates come back under their other files, so count what the rebuild kept
+                remaining = read_build_info(os.path.join("vectorstores", f"org_{org_id}"))["n_vectors"] if rebuilt else 0
+                print(f"Removed {before - remaining} chunks of {stored_filename} from org: {org_id} (rebuilt)")
+                return {"removed": before - remaining, "remaining": remaining}
+
+        if remaining == 0:
+            clear_vectorstore(org_id)
+        else:
+            source_files = _updated_source_files(org_id, stored_filename, removed=True)
+            # generations are immutable: even a manifest-only change (a file that gave no chunks) is published
+            if _drop_source(vectorstore, stored_filename) or ids or source_files is not None:
+                publish_vectorstore(org_id, vectorstore, source_files)
+        print(f"Removed {len(ids)} chunks of {stored_filename} from org: {org_id}")
+        return {"removed": len(ids), "remaining": remaining}
@@ -1,39 +1,196 @@
 # services/vectorstore_singleton.py
-import os 
-from langchain_community.vectorstores import FAISS
+import os
+import threading
+import faiss
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
 from langchain_openai import OpenAIEmbeddings
-from utils.constants import VECTOR_DIR, EMBEDDING_MODEL,VECTORSTORE_BASE
+from utils.constants import VECTOR_DIR, EMBEDDING_MODEL,VECTORSTORE_BASE,VECTORSTORE_CACHE_MAX_MB,VECTORSTORE_MMAP,TINY_INDEX_MAX_VECTORS,RETRIEVAL_K
+from utils.metrics import (
+    vectorstore_cache_hits,
+    vectorstore_cache_misses,
+    vectorstore_cache_evictions,
+    vectorstore_cache_bytes,
+)
 from dotenv import load_dotenv
 from services import file_service
 from services.vectorstore_loader import get_openai_api_key
+from services.query_embedder import QueryEmbeddingBatcher
+from services.tiny_index import TinyIndex
+from services.embedding_cache import TruncatedEmbeddings
+from services.index_io import read_vectorstore, index_fingerprint, resolve_index_dir, open_lexical_index
+from services.index_inventory import check_servable, refresh_org
+from utils.logger import log_error
 load_dotenv()
 EMBEDDING = os.getenv("EMBEDDING")
 vectorstore = None
 retriever = None
 
+# org_id -> {"generation": str, "vectorstore": FAISS, "lexical": LexicalIndex, "size": int}, least recently used first
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_load_locks = defaultdict(threading.Lock)  # one loader per org at a time
+
+
+@lru_cache(maxsize=1)
 def get_embedding_model():
+    # One shared client per process; OpenAIEmbeddings is safe to reuse across requests
     return OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=get_openai_api_key())
 
+
+@lru_cache(maxsize=1)
+def get_query_embeddings():
+    # what loaded vectorstores embed questions with: concurrent questions share requests
+    return QueryEmbeddingBatcher(get_embedding_model())
+
 def get_vectorstore_for_org(org_id):
     vectorstore_dir = os.path.join(VECTORSTORE_BASE, f"org_{org_id}")
     embeddings = get_embedding_model()
-    return FAISS.load_local(vectorstore_dir, embeddings)
+    return read_vectorstore(vectorstore_dir, embeddings)
+
+
+def load_mmap_vectorstore(vectorstore_dir: str):
+    """
+    Open index.faiss read-only and memory-mapped. The vectors stay in the OS page
+    cache, shared by every worker that maps the same file, and loading touches no
+    vector data. The result must not be mutated (incremental updates load their own copy).
+    """
+    return read_vectorstore(vectorstore_dir, get_query_embeddings(), mmap=True)
+
+
+def load_org_indexes(org_id: str, mmap: bool = None):
+    """
+    (vectorstore, lexical index) of the org's current generation, both read
+    from the same resolved directory so their rows line up. The lexical index
+    is None if it can't be opened; retrieval then uses vectors only.
+    Indexes of up to TINY_INDEX_MAX_VECTORS rows are searched with NumPy.
+    Questions are embedded at the index's dimension (see embedding_dims).
+    `mmap` (VECTORSTORE_MMAP by default) maps index.faiss read-only; the
+    columnar docstore is memory-mapped either way.
+    """
+    index_dir = resolve_index_dir(file_service.get_org_vectorstore_dir(org_id))
+    if VECTORSTORE_MMAP if mmap is None else mmap:
+        store = load_mmap_vectorstore(index_dir)
+    else:
+        store = read_vectorstore(index_dir, get_query_embeddings())
+    store.embedding_function = TruncatedEmbeddings(get_query_embeddings(), store.index.d)
+    if 0 < store.index.ntotal <= TINY_INDEX_MAX_VECTORS and store.index.metric_type in (
+        faiss.METRIC_L2, faiss.METRIC_INNER_PRODUCT
+    ):
+        store.index = TinyIndex.from_faiss(store.index)
+    try:
+        lexical = open_lexical_index(store, index_dir)
+    except Exception as e:
+        log_error(f"Lexical index unavailable for org {org_id}: {e}")
+        lexical = None
+    return store, lexical
+
+
+def get_index_generation(org_id: str):
+    """
+    Fingerprint of the index currently on disk for an org: (generation, size_bytes).
+    The generation changes whenever index.faiss or the docstore is rewritten.
+    Raises FileNotFoundError if the org has no complete index.
+    """
+    vectorstore_dir = os.path.join(VECTORSTORE_BASE, f"org_{org_id}")
+    return index_fingerprint(vectorstore_dir, VECTORSTORE_MMAP)
+
+
+def _evict_over_budget():
+    # caller holds _cache_lock; always keep the most recently used entry
+    budget = VECTORSTORE_CACHE_MAX_MB * 1024 * 1024
+    total = sum(entry["size"] for entry in _cache.values())
+    while total > budget and len(_cache) > 1:
+        _, entry = _cache.popitem(last=False)
+        total -= entry["size"]
+        vectorstore_cache_evictions.inc()
+    vectorstore_cache_bytes.set(total)
+
+
+def get_vectorstore(org_id: str):
+    """
+    Return the org's FAISS vectorstore from the process-wide LRU cache.
+    Loads from disk only on first use or when the on-disk generation changed.
+    """
+    return _get_entry(org_id)["vectorstore"]
+
+
+def get_search_indexes(org_id: str):
+    """(generation, vectorstore, lexical index or None), all of one generation, from the cache."""
+    entry = _get_entry(org_id)
+    return entry["generation"], entry["vectorstore"], entry["lexical"]
+
+
+def _get_entry(org_id: str) -> dict:
+    # orgs known to have no servable index fail here, without touching the disk
+    check_servable(org_id)
+    try:
+        generation, size = get_index_generation(org_id)
+    except FileNotFoundError:
+        refresh_org(org_id)  # later requests fail fast
+        raise
+
+    with _cache_lock:
+        entry = _cache.get(org_id)
+        if entry and entry["generation"] == generation:
+            _cache.move_to_end(org_id)
+            vectorstore_cache_hits.inc()
+            return entry
+
+    with _load_locks[org_id]:
+        # another request may have loaded it while we waited
+        with _cache_lock:
+            entry = _cache.get(org_id)
+            if entry and entry["generation"] == generation:
+                _cache.move_to_end(org_id)
+                vectorstore_cache_hits.inc()
+                return entry
+
+        vectorstore_cache_misses.inc()
+        try:
+            try:
+                store, lexical = load_org_indexes(org_id)
+            except FileNotFoundError:
+                # the generation we resolved was published over and pruned meanwhile; load the new one
+                generation, size = get_index_generation(org_id)
+                store, lexical = load_org_indexes(org_id)
+        except Exception:
+            refresh_org(org_id)  # unreadable index: record it so later requests fail fast
+            raise
+
+        entry = {
+            "generation": generation,
+            "vectorstore": store,
+            "lexical": lexical,
+            "size": size + (lexical.resident_bytes() if lexical is not None else 0),
+        }
+        with _cache_lock:
+            _cache[org_id] = entry
+            _cache.move_to_end(org_id)
+            _evict_over_budget()
+    return entry
+
+
+def invalidate_vectorstore(org_id: str):
+    with _cache_lock:
+        _cache.pop(org_id, None)
+        _evict_over_budget()
+
 
-def load_faiss_vectorstore(org_id: str):
-    vectorstore_dir = file_service.get_org_vectorstore_dir(org_id)
-    embedding_model = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=get_openai_api_key()
-    )
-    return FAISS.load_local(vectorstore_dir, embedding_model, allow_dangerous_deserialization=True)
+def get_vectorstore_cache_stats():
+    with _cache_lock:
+        return {
+            "orgs": list(_cache.keys()),
+            "size_bytes": sum(entry["size"] for entry in _cache.values()),
+            "max_bytes": VECTORSTORE_CACHE_MAX_MB * 1024 * 1024,
+        }
 
 
 # Helper to get retriever for an org
 def get_retriever(org_id: str):
-    vectorstore = load_faiss_vectorstore(org_id)
-    return vectorstore.as_retriever(search_kwargs={"k": 3})
+    return get_vectorstore(org_id).as_retriever(search_kwargs={"k": RETRIEVAL_K})
 
-# If you want reload functionality:
+# Drop the cached copy and load the freshly written index (call after retrain)
 def reload_vectorstore(org_id: str):
-    # Optionally, just reload the vectorstore for the org
-    return load_faiss_vectorstore(org_id)
+    invalidate_vectorstore(org_id)
+    return get_vectorstore(org_id)
@@ -9,12 +9,81 @@ MAX_TOKEN = 250
 VECTOR_DIR = "memory_index"
 MAX_FILE_SIZE_MB = 100
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
-SIMILARITY_THRESHOLD = 0.30
+# /rag/ask saves questions scoring below this to unique_question. The score is the cosine between
+# the question and the centroid of the retrieved chunks' vectors (utils/helpers.similarity_score),
+# not the embedding of the joined context as before, and runs differently; recalibrate with
+# benchmarks/bench_similarity_threshold.py, which prints the value gating the same share of questions
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.30"))
 TOKEN_EXPIRE  = 180 #in minutes
 SUPER_ADMIN_TOKEN_EXPIRE = 180
 TOKEN_EXPIRE_ROBOT  = 15000
 UPLOAD_BASE = "pdf_files"
 VECTORSTORE_BASE = "vectorstores"
+VECTORSTORE_CACHE_MAX_MB = int(os.getenv("VECTORSTORE_CACHE_MAX_MB", "512"))  # memory budget for loaded org indexes
+VECTORSTORE_MMAP = os.getenv("VECTORSTORE_MMAP", "false").lower() == "true"  # open index.faiss read-only + memory-mapped
+INCREMENTAL_INDEXING = os.getenv("INCREMENTAL_INDEXING", "true").lower() == "true"  # embed only the changed file on upload/delete
+EMBEDDING_DIMS = int(os.getenv("EMBEDDING_DIMS", "0"))  # stored vector size for new builds, e.g. 512; 0 = the model's full size
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+INDEX_WARMUP_ENABLED = os.getenv("INDEX_WARMUP_ENABLED", "true").lower() == "true"
+INDEX_WARMUP_REBUILD = os.getenv("INDEX_WARMUP_REBUILD", "true").lower() == "true"  # rebuild orgs whose files changed
+INDEX_WARMUP_PRELOAD = os.getenv("INDEX_WARMUP_PRELOAD", "true").lower() == "true"  # load indexes into the cache
+# Retraining engine (services/retrain_engine.py)
+RETRAIN_PARSE_WORKERS = int(os.getenv("RETRAIN_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+RETRAIN_ORG_CONCURRENCY = int(os.getenv("RETRAIN_ORG_CONCURRENCY", "4"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # embedding requests in flight
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))  # chunks per embeddings request
+EMBED_REQUESTS_PER_MIN = int(os.getenv("EMBED_REQUESTS_PER_MIN", "3000"))
+EMBED_TOKENS_PER_MIN = int(os.getenv("EMBED_TOKENS_PER_MIN", "1000000"))
+# Streaming ingestion (services/ingest_pipeline.py)
+INGEST_PAGE_WORKERS = int(os.getenv("INGEST_PAGE_WORKERS", str(min(4, os.cpu_count() or 1))))  # 1 = read pages inline
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))  # PDF pages per extraction task
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() == "true"  # reuse extracted page text of unchanged files
+CHUNK_DEDUPE_ENABLED = os.getenv("CHUNK_DEDUPE_ENABLED", "true").lower() == "true"  # drop duplicate chunks at build time
+CHUNK_DEDUPE_MAX_HAMMING = int(os.getenv("CHUNK_DEDUPE_MAX_HAMMING", "3"))  # SimHash bits two near-duplicates may differ in
+CHUNK_PROFILE = os.getenv("CHUNK_PROFILE", "legacy")  # default chunk profile (services/chunker.py); per-org `chunk_profile` overrides
+# Hybrid retrieval (services/retrieval.py)
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"  # false = vector search only
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))  # chunks handed to the LLM
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))  # candidates per search before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))  # reciprocal rank fusion damping
+LEXICAL_SKIP_RATIO = float(os.getenv("LEXICAL_SKIP_RATIO", "2.0"))  # top BM25 score vs runner-up to skip vector search; 0 = never skip
+RETRIEVAL_RERANK = os.getenv("RETRIEVAL_RERANK", "none")  # "none" or "mmr" (services/rerank.py); per-org `rerank` overrides
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = relevance only, 0 = diversity only
+MERGE_ADJACENT_CHUNKS = os.getenv("MERGE_ADJACENT_CHUNKS", "false").lower() == "true"  # join neighbouring chunks of a page; per-org `merge_adjacent` overrides
+GLOBAL_KB_ORG_ID = os.getenv("GLOBAL_KB_ORG_ID", "global")  # org folder of the shared knowledge base (services/global_kb.py)
+GLOBAL_KB_ENABLED = os.getenv("GLOBAL_KB_ENABLED", "true").lower() == "true"  # search it with every org; per-org `use_global_kb` overrides
+GLOBAL_KB_SEARCH_THREADS = int(os.getenv("GLOBAL_KB_SEARCH_THREADS", "4"))  # shared-index searches running beside org searches
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"  # services/retrieval_cache.py
+RETRIEVAL_CACHE_MAX_PER_ORG = int(os.getenv("RETRIEVAL_CACHE_MAX_PER_ORG", "1024"))  # cached questions per org
+RETRIEVAL_CACHE_MAX_ORGS = int(os.getenv("RETRIEVAL_CACHE_MAX_ORGS", "256"))  # orgs with cached questions, least recently queried dropped
+RETRIEVAL_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RETRIEVAL_CACHE_SEMANTIC_THRESHOLD", "0.95"))  # query cosine to reuse a result; 0 = exact only
+QUERY_EMBED_MAX_BATCH = int(os.getenv("QUERY_EMBED_MAX_BATCH", "64"))  # questions per embeddings request (services/query_embedder.py)
+QUERY_EMBED_MAX_WAIT_MS = float(os.getenv("QUERY_EMBED_MAX_WAIT_MS", "5"))  # longest a question waits for others; 0 = no batching
+QUERY_EMBED_CONCURRENCY = int(os.getenv("QUERY_EMBED_CONCURRENCY", "8"))  # query embedding requests in flight
+TINY_INDEX_MAX_VECTORS = int(os.getenv("TINY_INDEX_MAX_VECTORS", "1000"))  # search smaller orgs with NumPy (services/tiny_index.py); 0 = never
+FAISS_SEARCH_THREADS = int(os.getenv("FAISS_SEARCH_THREADS", "2"))  # searches running at once (services/search_executor.py)
+FAISS_SEARCH_MAX_BATCH = int(os.getenv("FAISS_SEARCH_MAX_BATCH", "64"))  # queries per index.search call
+# OpenMP threads of FAISS per process; default splits the cores among uvicorn workers (WEB_CONCURRENCY)
+FAISS_OMP_THREADS = int(os.getenv(
+    "FAISS_OMP_THREADS", str(max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1")))))
+))
+FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "auto")  # "auto" picks by org size, or any faiss.index_factory string
+FAISS_FLAT_MAX_VECTORS = int(os.getenv("FAISS_FLAT_MAX_VECTORS", "20000"))  # exact search up to here
+FAISS_HNSW_MAX_VECTORS = int(os.getenv("FAISS_HNSW_MAX_VECTORS", "500000"))  # HNSW up to here, IVF above
+FAISS_HNSW_FACTORY = os.getenv("FAISS_HNSW_FACTORY", "HNSW32")
+FAISS_IVF_FACTORY = os.getenv("FAISS_IVF_FACTORY", "IVF{nlist},SQ8")  # {nlist} / {pq_m} are filled in at build time
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+ORG_SETTINGS_TTL_S = int(os.getenv("ORG_SETTINGS_TTL_S", "60"))
+INDEX_KEEP_GENERATIONS = int(os.getenv("INDEX_KEEP_GENERATIONS", "3"))  # published builds kept per org for rollback
+INDEX_INVENTORY_RECHECK_S = float(os.getenv("INDEX_INVENTORY_RECHECK_S", "60"))  # how long a missing/corrupt org fails from memory
+INDEX_AUTO_REPAIR = os.getenv("INDEX_AUTO_REPAIR", "true").lower() == "true"  # queue inventory repairs at warm-up
+INDEX_JOB_WORKERS = int(os.getenv("INDEX_JOB_WORKERS", "2"))  # upload indexing jobs running at once (one per org)
+INDEX_JOB_HISTORY = int(os.getenv("INDEX_JOB_HISTORY", "1000"))  # finished jobs kept in memory for the status API
+LLM_CLIENT_CACHE_SIZE = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "64"))  # OpenAI keys whose tool-bound chat model is kept (services/llm/graph.py)
 ALLOWED_EXTENSIONS = [".pdf", ".txt", ".docx"]
 IMAGE_STORAGE_BASE_PATH = "face_images"
 FACE_AUTH_TIME_RESET = 10
@@ -26,12 +95,16 @@ class HTTP_STATUS:
     NOT_FOUND = 404
     TOO_MANY_REQUESTS = 429
     INTERNAL_SERVER_ERROR = 500
+    SERVICE_UNAVAILABLE = 503
     
 
 #MESSAGE FOR ERROR AND RESPONSE
 class MESSAGE:
     # General errors
     FILE_TOO_LARGE = f"File too large. Maximum allowed size is {MAX_FILE_SIZE_MB}MB."
+    INDEX_JOB_QUEUED = "File uploaded. Indexing has been queued."
+    DELETE_INDEX_JOB_QUEUED = "File deleted. Removing it from the index has been queued."
+    INDEX_JOB_NOT_FOUND = "Index job not found."
     INVALID_AUDIO_FORMAT = "Unsupported audio format."
     UNAUTHORIZED = "Invalid or missing token."
     USER_NOT_FOUND = "User not registered."
@@ -101,6 +174,10 @@ class MESSAGE:
     
 
     
+    #HEALTH
+    READY = "Ready"
+    WARMING_UP = "Vectorstores are still warming up"
+
     #SIGNUP 
     def failed_org(e):
        return f"Failed to create organization: {str(e)}"
@@ -1,7 +1,6 @@
 import secrets
 import numpy as np
 from fastapi.responses import JSONResponse
-from sklearn.metrics.pairwise import cosine_similarity
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 import base64
@@ -18,12 +17,8 @@ import string
 from bson import ObjectId
 from datetime import datetime
 import re
-from services.vectorstore_singleton import get_embedding_model
-from services.vectorstore_loader import batch_retrain_all_orgs
 from typing import Dict, Any, List
 from secrets import randbelow
-load = batch_retrain_all_orgs()
-print(load)
 
 def generate_4digit_pin() -> str:
     return f"{randbelow(10000):04d}"
@@ -188,15 +183,22 @@ def get_user_info_prompt(user_info):
       return ""
   
   
-def similarity_score(query, context_text, org_id):
-    if not context_text.strip():
+def similarity_score(query_vector, chunk_vectors):
+    """
+    Cosine between the question and the centroid of the retrieved chunks, from
+    the vectors retrieval already has (no embedding calls). The centroid of the
+    unit chunk vectors stands in for the embedding of the joined context.
+    """
+    chunks = np.asarray(chunk_vectors, dtype=np.float32)
+    if chunks.size == 0:
         return 0.0
-    embeddings = get_embedding_model()
-    query_vec = embeddings.embed_query(query)
-    context_vec = embeddings.embed_query(context_text)
-    if np.linalg.norm(query_vec) == 0 or np.linalg.norm(context_vec) == 0:
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(chunks, axis=1, keepdims=True)
+    centroid = (chunks / np.where(norms == 0, 1, norms)).mean(axis=0)
+    denom = np.linalg.norm(query) * np.linalg.norm(centroid)
+    if denom == 0:
         return 0.0
-    return cosine_similarity([query_vec], [context_vec])[0][0]
+    return float(query @ centroid / denom)
 
 # --- minimal helpers ---
 def _to_float(x):
@@ -3,7 +3,7 @@ import logging
 import sys
 import json
 
-LOG_DIR = "logs"
+LOG_DIR = os.getenv("LOG_DIR", "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
 file_handler = logging.FileHandler(os.path.join(LOG_DIR, "error.log"),encoding='utf-8')
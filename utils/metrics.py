@@ -28,4 +28,138 @@ rag_ask_latency = Histogram(
 org_auth_requests = Counter(
     "org_auth_total",
     "Number of /org/auth endpoint calls"
-)
\ No newline at end of file
+)
+
+# Per-org vectorstore cache (services/vectorstore_singleton.py)
+vectorstore_cache_hits = Counter(
+    "vectorstore_cache_hits_total",
+    "Vectorstore lookups served from the in-process cache"
+)
+vectorstore_cache_misses = Counter(
+    "vectorstore_cache_misses_total",
+    "Vectorstore lookups that had to load the index from disk"
+)
+vectorstore_cache_evictions = Counter(
+    "vectorstore_cache_evictions_total",
+    "Vectorstores evicted from the cache to stay within the memory budget"
+)
+vectorstore_cache_bytes = Gauge(
+    "vectorstore_cache_bytes",
+    "Approximate bytes held by cached vectorstores"
+)
+
+
+# Content-addressed chunk embedding cache (services/embedding_cache.py)
+embedding_cache_hits = Counter(
+    "embedding_cache_hits_total",
+    "Chunk embeddings served from the on-disk embedding cache"
+)
+embedding_cache_misses = Counter(
+    "embedding_cache_misses_total",
+    "Chunk embeddings that had to be requested from the embeddings API"
+)
+embedding_cache_hit_ratio = Gauge(
+    "embedding_cache_hit_ratio",
+    "Share of chunk embeddings served from cache since process start"
+)
+embedding_cache_bytes = Gauge(
+    "embedding_cache_bytes",
+    "Live bytes in the embedding cache database"
+)
+
+
+# Extracted page text cache (services/text_cache.py)
+text_cache_hits = Counter(
+    "text_cache_hits_total",
+    "Files whose page text was read from the extracted-text cache"
+)
+text_cache_misses = Counter(
+    "text_cache_misses_total",
+    "Files that had to be parsed (PyMuPDF / docx2txt / text loader)"
+)
+
+
+# Upload indexing jobs (services/index_jobs.py)
+index_jobs_total = Counter(
+    "index_jobs_total",
+    "Upload indexing jobs by final state",
+    ["state"]
+)
+index_job_uploads_coalesced = Counter(
+    "index_job_uploads_coalesced_total",
+    "Uploads folded into an already queued job for the same org"
+)
+index_job_queue_seconds = Histogram(
+    "index_job_queue_seconds",
+    "Time an indexing job waited before a worker picked it up"
+)
+index_job_run_seconds = Histogram(
+    "index_job_run_seconds",
+    "Time spent running an indexing job"
+)
+
+
+# Hybrid retrieval (services/retrieval.py)
+retrieval_requests = Counter(
+    "retrieval_requests_total",
+    "Retrievals by path taken: hybrid, lexical (vector search skipped) or vector (no lexical index); "
+    "global_kb counts those also merged with the shared knowledge base",
+    ["mode"]
+)
+retrieval_cache_hits = Counter(
+    "retrieval_cache_hits_total",
+    "Retrievals answered from the result cache, by tier (exact question or similar query vector)",
+    ["tier"]
+)
+retrieval_cache_misses = Counter(
+    "retrieval_cache_misses_total",
+    "Retrievals that missed both result cache tiers"
+)
+
+
+# Query embedding micro-batcher (services/query_embedder.py)
+query_embed_batch_size = Histogram(
+    "query_embed_batch_size",
+    "Questions per query embeddings request",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+query_embed_queue_seconds = Histogram(
+    "query_embed_queue_seconds",
+    "Time a question waited to be batched",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+query_embed_coalesced = Counter(
+    "query_embed_coalesced_total",
+    "embed_query calls that shared an identical question already waiting or in flight"
+)
+
+
+# Batched FAISS search (services/search_executor.py)
+faiss_search_batch_size = Histogram(
+    "faiss_search_batch_size",
+    "Queries per index.search call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+faiss_search_queue_seconds = Histogram(
+    "faiss_search_queue_seconds",
+    "Time a search waited for a free worker",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+
+# Index inventory (services/index_inventory.py)
+index_inventory_orgs = Gauge(
+    "index_inventory_orgs",
+    "Orgs per index status at the last inventory check",
+    ["status"]
+)
+index_unavailable_requests = Counter(
+    "index_unavailable_requests_total",
+    "Requests refused from the inventory because the org has no servable index",
+    ["status"]
+)
+index_repairs_queued = Counter(
+    "index_repairs_queued_total",
+    "Repair jobs queued from the index inventory",
+    ["action"]
+)